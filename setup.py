@@ -8,6 +8,17 @@ setup(
     description="Paquete para análisis y predicción de acciones del grupo AVAL usando datos de Yahoo Finance",
     packages=find_packages(where="src"),  # Busca paquetes en la carpeta src
     package_dir={"": "src"},              # Indica que los paquetes están en src
+    py_modules=[                          # Los módulos del pipeline son archivos sueltos en src
+        "adjustments", "arima_model", "artifacts", "backtester", "benchmark", "cli", "collector",
+        "conformal", "correlation", "csv_logger", "dashboard", "dashboard_data", "data_io", "data_service",
+        "downsampling", "drift", "enricher", "history_merge", "intraday", "logger", "modeller", "plots", "prediction_service",
+        "profiling", "run_store", "scheduler", "shared_matrix", "validation"
+    ],
+    entry_points={
+        "console_scripts": [
+            "aval-tracker=cli:main",      # Subcomandos con importación diferida de cada etapa
+        ],
+    },
     install_requires=[
         "pandas>=2.2.3",
         "numpy",
@@ -20,6 +31,6 @@ setup(
         "seaborn",
         "statsmodels"
     ],
-    python_requires=">=3.8",  # Mejor usar 3.8+ para compatibilidad
+    python_requires=">=3.9",  # pandas 2.2 y tracemalloc.reset_peak requieren 3.9+
     include_package_data=True,
 )
\ No newline at end of file
@@ -0,0 +1,132 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from history_merge import sort_by_date
+from data_io import atomic_path
+
+# Rangos pendientes de recalcular por el enriquecedor. El colector los agrega y el enriquecedor
+# los consume mientras tienen bloqueado historical.csv (exclusivo y compartido, respectivamente)
+RECOMPUTE_PATH = os.path.join('src', 'static', 'data', 'recompute_ranges.json')
+
+PRICE_COLUMNS = ['Open AVAL', 'High AVAL', 'Low AVAL', 'Close AVAL']
+ADJ_COLUMN = 'Adj Close AVAL'
+VOLUME_COLUMN = 'Volume AVAL'
+
+# Tolerancia relativa para considerar constante el factor de ajuste entre filas
+FACTOR_RTOL = 1e-6
+
+def _event_value(row, col):
+    value = row.get(col, 0.0)
+    return 0.0 if pd.isna(value) else float(value)
+
+def detect_adjustment(old_df, new_df, date_col='Date', rtol=FACTOR_RTOL):
+    """Compara el factor de ajuste (precio nuevo / guardado) en las fechas solapadas.
+
+    Un dividendo o split reescala por un factor constante todas las filas anteriores a su fecha.
+    Devuelve None si no cambió nada; si no, un dict con la fecha desde la que hay que recalcular
+    ('desde'), los factores (None si el cambio no es un reescalado uniforme) y el motivo.
+    """
+    old_df = sort_by_date(old_df, date_col)
+    new_df = sort_by_date(new_df, date_col)
+    old_dates = old_df[date_col].to_numpy()
+    new_dates = new_df[date_col].to_numpy()
+
+    positions = np.searchsorted(old_dates, new_dates, side='left')
+    inside = positions < len(old_dates)
+    matched = np.zeros(len(new_dates), dtype=bool)
+    matched[inside] = old_dates[positions[inside]] == new_dates[inside]
+    if not matched.any():
+        return None
+    old_idx = positions[matched]
+    new_idx = np.flatnonzero(matched)
+
+    ratio_adj = new_df[ADJ_COLUMN].to_numpy()[new_idx] / old_df[ADJ_COLUMN].to_numpy()[old_idx]
+    ratio_close = new_df['Close AVAL'].to_numpy()[new_idx] / old_df['Close AVAL'].to_numpy()[old_idx]
+    changed = ~(np.isclose(ratio_adj, 1.0, rtol=rtol, atol=0.0, equal_nan=True)
+                & np.isclose(ratio_close, 1.0, rtol=rtol, atol=0.0, equal_nan=True))
+    if not changed.any():
+        return None
+
+    # Última fila solapada que cambió: el evento cae en la fecha siguiente
+    last = int(np.flatnonzero(changed)[-1])
+    following = new_idx[last] + 1
+    event_date = new_dates[following] if following < len(new_dates) else None
+
+    factor_adj, factor_close = ratio_adj[last], ratio_close[last]
+    uniform = (
+        event_date is not None
+        and np.allclose(ratio_adj[:last + 1], factor_adj, rtol=rtol, atol=0.0)
+        and np.allclose(ratio_close[:last + 1], factor_close, rtol=rtol, atol=0.0)
+    )
+    if not uniform:
+        first_changed = new_dates[new_idx[int(np.argmax(changed))]]
+        return {'desde': pd.Timestamp(first_changed), 'factores': None, 'motivo': 'revision', 'filas_previas': 0}
+
+    # El evento está en la fecha siguiente o, si el cambio llega hasta la última fila guardada,
+    # en alguna de las filas nuevas de la descarga
+    reason = 'reescalado'
+    candidates = [following] if matched[following] else range(following, len(new_df))
+    for row in candidates:
+        event_row = new_df.iloc[row]
+        if _event_value(event_row, 'Stock Splits AVAL'):
+            reason = 'split'
+        elif _event_value(event_row, 'Dividends AVAL'):
+            reason = 'dividendo'
+        if reason != 'reescalado':
+            break
+
+    return {
+        'desde': pd.Timestamp(event_date),
+        'factores': {'ajustado': float(factor_adj), 'precio': float(factor_close)},
+        'motivo': reason,
+        # Filas guardadas anteriores a la descarga: solo se corrigen localmente
+        'filas_previas': int(np.searchsorted(old_dates, new_dates[0], side='left'))
+    }
+
+def rescale_prefix(df, n_rows, factors):
+    """Aplica los factores de ajuste a las primeras n_rows filas de forma vectorizada."""
+    if n_rows <= 0:
+        return df
+    df = df.copy()
+    head = slice(0, n_rows)
+    adj = df[ADJ_COLUMN].to_numpy(dtype='float64', copy=True)
+    adj[head] *= factors['ajustado']
+    df[ADJ_COLUMN] = adj
+    if factors['precio'] != 1.0:
+        for col in PRICE_COLUMNS:
+            values = df[col].to_numpy(dtype='float64', copy=True)
+            values[head] *= factors['precio']
+            df[col] = values
+        # Un split multiplica las acciones en circulación en el inverso del factor de precio
+        volume = df[VOLUME_COLUMN].to_numpy(dtype='float64', copy=True)
+        volume[head] = np.round(volume[head] / factors['precio'])
+        df[VOLUME_COLUMN] = volume.astype(df[VOLUME_COLUMN].dtype)
+    return df
+
+def pending_ranges(path=RECOMPUTE_PATH):
+    """Rangos marcados para recalcular, en el orden en que se registraron."""
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding='utf-8') as file:
+        ranges = json.load(file)
+    for entry in ranges:
+        entry['desde'] = pd.Timestamp(entry['desde'])
+    return ranges
+
+def mark_range(desde, factors=None, reason='revision', path=RECOMPUTE_PATH):
+    """Marca que el enriquecedor debe recalcular desde la fecha dada (y reescalar lo anterior con los factores)."""
+    ranges = pending_ranges(path)
+    ranges.append({'desde': pd.Timestamp(desde), 'factores': factors, 'motivo': reason})
+    with atomic_path(path) as tmp_path, open(tmp_path, 'w', encoding='utf-8') as file:
+        json.dump(
+            [dict(entry, desde=entry['desde'].strftime('%Y-%m-%d')) for entry in ranges],
+            file, indent=2, ensure_ascii=False
+        )
+
+def clear_ranges(path=RECOMPUTE_PATH):
+    """Elimina las marcas una vez aplicadas."""
+    if os.path.exists(path):
+        os.remove(path)
\ No newline at end of file
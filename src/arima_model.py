@@ -1,18 +1,25 @@
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-from statsmodels.tsa.arima.model import ARIMA
-from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
+import argparse
 import warnings
+from data_io import read_columns
+from profiling import profiler
+import plots
+import os
+
+# Datos de entrada por defecto
+HISTORICAL_PATH = os.path.join('src', 'static', 'data', 'historical.csv')
+
+# Ruta por defecto del gráfico ARIMA (renderizado sin ventana, backend Agg)
+ARIMA_PLOT_PATH = os.path.join('src', 'static', 'models', 'plots', 'arima_forecast.png')
 
 warnings.filterwarnings("ignore")
 
 # --- Funciones principales ---
 
-def cargar_datos(ruta_archivo='historical.csv'):
-    """Carga y prepara los datos desde un archivo CSV."""
-    df = pd.read_csv(ruta_archivo)
-    df['Date'] = pd.to_datetime(df['Date'])
+def cargar_datos(ruta_archivo='historical.csv', columnas=None, tipos=None):
+    """Carga y prepara los datos desde un archivo CSV (solo las columnas indicadas)."""
+    df = read_columns(ruta_archivo, columns=columnas, dtype=tipos)
     df.set_index('Date', inplace=True)
     return df
 
@@ -22,49 +29,54 @@ def obtener_serie(df, columna='Adj Close AVAL'):
 
 def entrenar_arima(serie, order=(3,1,1)):
     """Entrena un modelo ARIMA con los parámetros especificados."""
-    model = ARIMA(serie, order=order)
+    from statsmodels.tsa.arima.model import ARIMA  # Importación diferida: statsmodels tarda en cargar
+
+    # Las fechas bursátiles no tienen frecuencia fija; se ajusta sobre posiciones
+    model = ARIMA(serie.reset_index(drop=True), order=order)
     return model.fit()
 
 def predecir_arima(fit, serie):
     """Realiza predicciones dentro de muestra y para el siguiente día."""
-    pred = fit.predict(start=serie.index[1], end=serie.index[-1], typ='levels')
+    pred = fit.predict(start=1, end=len(serie) - 1, typ='levels')
     pred.index = serie.index[1:]
     forecast = fit.forecast(steps=1)
     next_date = serie.index[-1] + pd.Timedelta(days=1)
+    forecast.index = [next_date]
     return pred, forecast, next_date
 
 def calcular_metricas(y_true, y_pred):
     """Calcula MAE, RMSE, MAPE y R²."""
+    from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
+
     mae = mean_absolute_error(y_true, y_pred)
     rmse = np.sqrt(mean_squared_error(y_true, y_pred))
     mape = np.mean(np.abs((y_true - y_pred) / y_true)) * 100
     r2 = r2_score(y_true, y_pred)
     return mae, rmse, mape, r2
 
-def graficar_arima(serie, pred, forecast, next_date, order=(3,1,1)):
-    """Grafica los resultados del modelo ARIMA."""
-    plt.figure(figsize=(16,6))
-    plt.plot(serie, label='Precio Real', color='blue')
-    plt.plot(pred, label='Predicción ARIMA', color='orange', linestyle='--')
-    plt.scatter(next_date, forecast.values[0], color='red', label=f'Predicción siguiente día ({next_date.date()})', zorder=5)
-    plt.axvline(x=serie.index[-1], color='gray', linestyle=':', label='Último dato')
-    plt.title(f'Precio Real vs Ajuste ARIMA{order} y Predicción del Siguiente Día')
-    plt.xlabel('Fecha')
-    plt.ylabel('Adj Close AVAL')
-    plt.legend()
-    plt.grid(True)
-    plt.tight_layout()
-    plt.show()
+def graficar_arima(serie, pred, forecast, next_date, order=(3,1,1), ruta_salida=ARIMA_PLOT_PATH):
+    """Grafica los resultados del modelo ARIMA en un PNG (omite si las entradas no cambiaron)."""
+    return plots.render_arima_plot(
+        serie.index.to_numpy(), serie.to_numpy(),
+        pred.index.to_numpy(), pred.to_numpy(),
+        next_date, forecast.values[0], order, ruta_salida
+    )
 
+@profiler.profile('arima.ejecutar_arima_completo')
 def ejecutar_arima_completo(ruta_archivo='historical.csv', columna='Adj Close AVAL', order=(3,1,1), graficar=True):
     """Ejecuta el flujo completo de ARIMA y retorna resultados y métricas."""
-    df = cargar_datos(ruta_archivo)
-    serie = obtener_serie(df, columna)
-    modelo = entrenar_arima(serie, order)
-    pred, forecast, next_date = predecir_arima(modelo, serie)
-    mae, rmse, mape, r2 = calcular_metricas(serie[1:], pred)
+    with profiler.stage('cargar_datos'):
+        df = cargar_datos(ruta_archivo, columnas=[columna], tipos={columna: 'float64'})
+        serie = obtener_serie(df, columna)
+    with profiler.stage('entrenar'):
+        modelo = entrenar_arima(serie, order)
+    with profiler.stage('predecir'):
+        pred, forecast, next_date = predecir_arima(modelo, serie)
+    with profiler.stage('metricas'):
+        mae, rmse, mape, r2 = calcular_metricas(serie[1:], pred)
     if graficar:
-        graficar_arima(serie, pred, forecast, next_date, order)
+        with profiler.stage('graficar'):
+            graficar_arima(serie, pred, forecast, next_date, order)
     print("📈 Métricas de Evaluación:")
     print(f"MAE  = {mae:.4f}")
     print(f"RMSE = {rmse:.4f}")
@@ -83,6 +95,17 @@ def ejecutar_arima_completo(ruta_archivo='historical.csv', columna='Adj Close AV
         'r2': r2
     }
 
+def main():
+    parser = argparse.ArgumentParser(description="Ajusta ARIMA y predice el siguiente día")
+    parser.add_argument('--archivo', default=HISTORICAL_PATH, help="CSV histórico de entrada")
+    parser.add_argument('--sin-graficos', action='store_true', help="Omite el gráfico ARIMA")
+    args = parser.parse_args()
+
+    try:
+        ejecutar_arima_completo(ruta_archivo=args.archivo, graficar=not args.sin_graficos)
+    finally:
+        profiler.write('arima')
+
 # Si ejecutas este archivo directamente, muestra el resultado
 if __name__ == "__main__":
-    ejecutar_arima_completo()
\ No newline at end of file
+    main()
\ No newline at end of file
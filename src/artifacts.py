@@ -0,0 +1,98 @@
+import os
+import shutil
+from contextlib import contextmanager
+from datetime import datetime
+
+import joblib
+import pandas as pd
+
+from data_io import atomic_path, file_lock, fsync_path
+
+# Cada entrenamiento publica sus artefactos en versions/<versión>/ y luego mueve el puntero `current`
+VERSIONS_DIR = 'versions'
+CURRENT_FILE = 'current'
+KEEP_VERSIONS = 3
+
+ARTIFACT_FILES = {
+    'model': 'model.pkl',
+    'scaler': 'scaler.pkl',
+    'selector': 'feature_selector.pkl',
+    'features': 'selected_features.csv',
+    'metrics': 'metrics.csv',
+    'reference': 'drift_reference.json',
+    'calibration': 'conformal_calibration.csv'
+}
+
+class ModelNotTrainedError(FileNotFoundError):
+    """No hay una versión publicada del modelo (p.ej. un clon nuevo antes del primer entrenamiento)."""
+
+def current_version(model_dir):
+    """Versión publicada (None si el directorio aún tiene el diseño plano anterior)."""
+    path = os.path.join(model_dir, CURRENT_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding='utf-8') as file:
+        return file.read().strip() or None
+
+def artifact_paths(model_dir, version=None):
+    """Rutas de los artefactos de la versión indicada o de la vigente."""
+    version = version or current_version(model_dir)
+    base = os.path.join(model_dir, VERSIONS_DIR, version) if version else model_dir
+    return {key: os.path.join(base, name) for key, name in ARTIFACT_FILES.items()}
+
+@contextmanager
+def publish(model_dir):
+    """Entrega las rutas de una versión nueva en preparación; al salir sin error la publica como vigente.
+
+    Los lectores ven la versión anterior completa o la nueva completa, nunca una mezcla de modelo y escalador.
+    """
+    versions_dir = os.path.join(model_dir, VERSIONS_DIR)
+    version = datetime.now().strftime('%Y%m%d_%H%M%S_%f')
+    staging = os.path.join(versions_dir, f".{version}.tmp")
+    os.makedirs(staging)
+    try:
+        yield {key: os.path.join(staging, name) for key, name in ARTIFACT_FILES.items()}
+        for name in os.listdir(staging):
+            fsync_path(os.path.join(staging, name))
+        os.replace(staging, os.path.join(versions_dir, version))
+        fsync_path(versions_dir)
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+    # Mover el puntero y podar con bloqueo exclusivo: ningún lector está cargando una versión a borrar
+    with file_lock(os.path.join(model_dir, CURRENT_FILE)):
+        with atomic_path(os.path.join(model_dir, CURRENT_FILE)) as tmp_path:
+            with open(tmp_path, 'w', encoding='utf-8') as file:
+                file.write(version)
+        prune(model_dir, keep=KEEP_VERSIONS)
+
+def prune(model_dir, keep=KEEP_VERSIONS):
+    """Elimina las versiones más antiguas conservando las keep últimas y la vigente."""
+    versions_dir = os.path.join(model_dir, VERSIONS_DIR)
+    current = current_version(model_dir)
+    versions = sorted(name for name in os.listdir(versions_dir) if not name.startswith('.'))
+    for name in versions[:-keep] if keep else versions:
+        if name != current:
+            shutil.rmtree(os.path.join(versions_dir, name), ignore_errors=True)
+
+def load_artifacts(model_dir):
+    """Carga con bloqueo compartido el modelo, el escalador, el selector, las características y las métricas vigentes."""
+    with file_lock(os.path.join(model_dir, CURRENT_FILE), shared=True):
+        version = current_version(model_dir)
+        paths = artifact_paths(model_dir, version)
+        missing = [name for name in ('model', 'scaler', 'selector', 'features') if not os.path.exists(paths[name])]
+        if missing:
+            raise ModelNotTrainedError(
+                f"Modelo no entrenado en {model_dir} (faltan {', '.join(missing)}): "
+                "ejecute `aval-tracker entrenar` para publicar una versión"
+            )
+        loaded = {
+            'version': version,
+            'model': joblib.load(paths['model']),
+            'scaler': joblib.load(paths['scaler']),
+            'selector': joblib.load(paths['selector']),
+            'features': pd.read_csv(paths['features'])['0'].tolist()
+        }
+        loaded['metrics'] = pd.read_csv(paths['metrics']) if os.path.exists(paths['metrics']) else None
+    return loaded
\ No newline at end of file
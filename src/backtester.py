@@ -0,0 +1,210 @@
+import argparse
+import itertools
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import shared_matrix
+from data_io import write_csv
+
+MODEL_DIR = os.path.join('src', 'static', 'models')
+BACKTEST_DIR = os.path.join('src', 'static', 'backtests')
+
+# Días bursátiles por año para anualizar el Sharpe
+PERIODS_PER_YEAR = 252
+# Combinaciones por bloque del barrido (acota la memoria: bloque × días por arreglo)
+SWEEP_BLOCK = 512
+
+METRIC_COLUMNS = ['Retorno total', 'Máx. drawdown', 'Tasa de acierto', 'Sharpe', 'Operaciones', 'Días en mercado']
+
+def prediction_history(data_file='enriched_historical.csv', model_dir=MODEL_DIR, test_only=True):
+    """Predicciones del modelo vigente para cada día (por defecto solo el tramo de prueba, fuera de muestra)."""
+    import artifacts
+    from modeller import StockPredictor
+
+    predictor = StockPredictor(data_file)
+    X_train, X_test, y_train, y_test, _ = predictor.prepare_data()
+    loaded = artifacts.load_artifacts(model_dir)
+    X = X_test if test_only else pd.concat([X_train, X_test])
+    # Una sola llamada escalador → selector → modelo para toda la historia
+    prediction = loaded['model'].predict(loaded['selector'].transform(loaded['scaler'].transform(X)))
+
+    rows = predictor.df.loc[X.index]
+    last_value = rows[predictor.target_col].to_numpy(dtype='float64')
+    return pd.DataFrame({
+        'Date': rows['Date'].to_numpy(),
+        'Último valor conocido': last_value,
+        'Predicción': prediction,
+        'Cambio porcentual': (prediction - last_value) / last_value * 100
+    })
+
+def next_day_returns(prices):
+    """Retorno de mantener la posición del cierre t al cierre t+1 (el último día no tiene retorno)."""
+    prices = np.asarray(prices, dtype='float64')
+    return prices[1:] / prices[:-1] - 1
+
+def positions(percent_change, buy, sell, fraction=1.0, scale=None, allow_short=False):
+    """Posición por combinación (filas) y día (columnas).
+
+    COMPRA si el cambio esperado supera buy, VENTA si cae por debajo de -sell (corto si allow_short,
+    si no, fuera del mercado) y MANTENER conserva la posición anterior. El tamaño es fraction o,
+    con scale, fraction · min(|cambio| / scale, 1).
+    """
+    pct = np.asarray(percent_change, dtype='float64')[np.newaxis, :]
+    buy, sell, fraction = (np.asarray(v, dtype='float64').reshape(-1, 1) for v in (buy, sell, fraction))
+    size = fraction if scale is None else fraction * np.minimum(np.abs(pct) / scale, 1.0)
+    size = np.broadcast_to(size, (max(len(buy), len(sell), len(fraction)), pct.shape[1]))
+
+    target = np.where(pct > buy, size, np.where(pct < -sell, -size if allow_short else 0.0, np.nan))
+
+    # MANTENER: arrastrar la última posición decidida (índice de la última columna válida, vectorizado)
+    target = np.concatenate([np.zeros((len(target), 1)), target], axis=1)
+    last_valid = np.where(np.isnan(target), 0, np.arange(target.shape[1]))
+    np.maximum.accumulate(last_valid, axis=1, out=last_valid)
+    return np.take_along_axis(target, last_valid, axis=1)[:, 1:]
+
+def simulate(percent_change, returns, buy, sell, cost, fraction=1.0, scale=None, allow_short=False,
+             periods=PERIODS_PER_YEAR, curves=False):
+    """Simula todas las combinaciones a la vez; costos en % del valor operado. Devuelve métricas por combinación."""
+    returns = np.asarray(returns, dtype='float64')[np.newaxis, :]
+    pct = np.asarray(percent_change, dtype='float64')[:returns.shape[1]]
+    cost = np.asarray(cost, dtype='float64').reshape(-1, 1) / 100
+
+    position = positions(pct, buy, sell, fraction, scale, allow_short)
+    turnover = np.abs(np.diff(position, axis=1, prepend=0.0))
+    strategy = position * returns - cost * turnover
+
+    equity = np.cumprod(1 + strategy, axis=1)
+    drawdown = equity / np.maximum.accumulate(equity, axis=1) - 1
+
+    in_market = position != 0
+    days_in_market = in_market.sum(axis=1)
+    hits = ((position * returns > 0) & in_market).sum(axis=1)
+    std = strategy.std(axis=1, ddof=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        hit_rate = np.where(days_in_market > 0, hits / days_in_market, np.nan)
+        sharpe = np.where(std > 0, strategy.mean(axis=1) / std * np.sqrt(periods), np.nan)
+
+    result = {
+        'Retorno total': equity[:, -1] - 1,
+        'Máx. drawdown': drawdown.min(axis=1),
+        'Tasa de acierto': hit_rate,
+        'Sharpe': sharpe,
+        'Operaciones': (turnover > 0).sum(axis=1),
+        'Días en mercado': days_in_market
+    }
+    if curves:
+        result.update(posicion=position, retorno=strategy, equity=equity, drawdown=drawdown)
+    return result
+
+def backtest(history, buy=0.0, sell=0.0, cost=0.1, fraction=1.0, scale=None, allow_short=False):
+    """Backtest de una configuración: (curva diaria, métricas)."""
+    returns = next_day_returns(history['Último valor conocido'])
+    result = simulate(history['Cambio porcentual'], returns, [buy], [sell], [cost], [fraction],
+                      scale, allow_short, curves=True)
+    curve = pd.DataFrame({
+        'Date': history['Date'].to_numpy()[:len(returns)],
+        'Cambio porcentual': history['Cambio porcentual'].to_numpy()[:len(returns)],
+        'Posición': result['posicion'][0],
+        'Retorno estrategia': result['retorno'][0],
+        'Retorno activo': returns,
+        'Equity': result['equity'][0],
+        'Drawdown': result['drawdown'][0]
+    })
+    metrics = {name: float(result[name][0]) for name in METRIC_COLUMNS}
+    return curve, metrics
+
+def parameter_grid(buy, sell, cost, fraction):
+    """Producto cartesiano de los valores de cada parámetro como arreglos alineados."""
+    combos = np.array(list(itertools.product(buy, sell, cost, fraction)), dtype='float64').reshape(-1, 4)
+    return pd.DataFrame(combos, columns=['Umbral compra', 'Umbral venta', 'Costo %', 'Fracción'])
+
+def _block_metrics(pct, returns, params, scale, allow_short):
+    """Métricas de un bloque de combinaciones (columnas de params: compra, venta, costo, fracción)."""
+    result = simulate(pct, returns, params[:, 0], params[:, 1], params[:, 2], params[:, 3], scale, allow_short)
+    return {name: result[name] for name in METRIC_COLUMNS}
+
+def _sweep_block(task):
+    """Simula un bloque en un proceso de trabajo sobre las series compartidas."""
+    return _block_metrics(shared_matrix.get('pct'), shared_matrix.get('ret'), *task)
+
+def sweep(history, grid, scale=None, allow_short=False, workers=None, block=SWEEP_BLOCK):
+    """Evalúa todas las combinaciones de grid en bloques repartidos entre procesos."""
+    returns = next_day_returns(history['Último valor conocido'])
+    pct = history['Cambio porcentual'].to_numpy(dtype='float64')[:len(returns)]
+    params = grid.to_numpy(dtype='float64')
+    tasks = [(params[i:i + block], scale, allow_short) for i in range(0, len(params), block)]
+
+    if workers == 1 or len(tasks) == 1:
+        results = [_block_metrics(pct, returns, *task) for task in tasks]
+    else:
+        with shared_matrix.SharedArrays({'pct': pct, 'ret': returns}) as shared:
+            with ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=shared_matrix.init_worker,
+                initargs=(shared.handles,)
+            ) as pool:
+                results = list(pool.map(_sweep_block, tasks))
+
+    metrics = {name: np.concatenate([result[name] for result in results]) for name in METRIC_COLUMNS}
+    return pd.concat([grid.reset_index(drop=True), pd.DataFrame(metrics)], axis=1)
+
+def parse_values(spec):
+    """Lista de valores: '0.1,0.2' o un rango 'inicio:fin:paso' (fin incluido)."""
+    if ':' in spec:
+        start, stop, step = (float(part) for part in spec.split(':'))
+        return list(np.round(np.arange(start, stop + step / 2, step), 10))
+    return [float(value) for value in spec.split(',')]
+
+def main():
+    parser = argparse.ArgumentParser(description="Backtest vectorizado de las señales COMPRA/VENTA del modelo")
+    sub = parser.add_subparsers(dest='comando', required=True)
+
+    def common(command):
+        command.add_argument('--escala', type=float, default=None,
+                             help="Tamaño proporcional: fracción · min(|cambio %%| / escala, 1)")
+        command.add_argument('--cortos', action='store_true', help="VENTA abre un corto en lugar de cerrar la posición")
+        command.add_argument('--todo', action='store_true', help="Incluye el tramo de entrenamiento (dentro de muestra)")
+
+    single = sub.add_parser('simular', help="Curva de capital y métricas de una configuración")
+    single.add_argument('--compra', type=float, default=0.0, help="Umbral de compra en %% de cambio esperado")
+    single.add_argument('--venta', type=float, default=0.0, help="Umbral de venta en %%")
+    single.add_argument('--costo', type=float, default=0.1, help="Costo por operación en %% del valor operado")
+    single.add_argument('--fraccion', type=float, default=1.0, help="Fracción del capital por posición")
+    common(single)
+
+    grid = sub.add_parser('barrer', help="Barrido paralelo de umbrales, costos y tamaños")
+    grid.add_argument('--compra', default='0:2:0.05', help="Valores o rango inicio:fin:paso")
+    grid.add_argument('--venta', default='0:2:0.05')
+    grid.add_argument('--costo', default='0,0.05,0.1,0.2')
+    grid.add_argument('--fraccion', default='0.5,1')
+    grid.add_argument('--procesos', type=int, default=None)
+    grid.add_argument('--top', type=int, default=10)
+    common(grid)
+    args = parser.parse_args()
+
+    history = prediction_history(test_only=not args.todo)
+    if args.comando == 'simular':
+        curve, metrics = backtest(history, args.compra, args.venta, args.costo, args.fraccion, args.escala, args.cortos)
+        path = os.path.join(BACKTEST_DIR, 'backtest_curve.csv')
+        write_csv(curve, path)
+        for name, value in metrics.items():
+            print(f"{name}: {value:.4f}")
+        print(f"\nCurva de capital en {path}")
+    else:
+        combos = parameter_grid(parse_values(args.compra), parse_values(args.venta),
+                                parse_values(args.costo), parse_values(args.fraccion))
+        results = sweep(history, combos, args.escala, args.cortos, args.procesos)
+        results = results.sort_values('Sharpe', ascending=False, na_position='last')
+        path = os.path.join(BACKTEST_DIR, 'backtest_sweep.csv')
+        write_csv(results, path)
+        print(f"{len(results)} combinaciones sobre {len(history) - 1} días")
+        print(results.head(args.top).to_string(index=False))
+        print(f"\nResultados completos en {path}")
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,305 @@
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+import logger
+
+# Tamaños de historia sintética por defecto
+SIZES = [3_000, 100_000, 1_000_000]
+
+# Límite de filas por paso (los pasos más costosos se omiten por encima del límite salvo --sin-limites)
+STEP_LIMITS = {
+    'train': 100_000,
+    'predict_next_day': 100_000,
+    'arima': 100_000
+}
+
+RESULTS_DIR = os.path.join('src', 'static', 'benchmarks')
+
+# Módulos cuyo tiempo de importación se mide en un intérprete limpio
+IMPORT_MODULES = ['cli', 'collector', 'enricher', 'modeller', 'arima_model', 'data_service', 'dashboard_data']
+
+def synthetic_ohlcv(n_rows, seed=42):
+    """Genera una historia OHLCV sintética con las mismas columnas que historical.csv."""
+    rng = np.random.default_rng(seed)
+    # Días hábiles mientras quepan en el rango de fechas de pandas; por encima, barras de minuto
+    freq = 'B' if n_rows <= 60_000 else 'min'
+    dates = pd.date_range('1990-01-01', periods=n_rows, freq=freq)
+
+    close = 10 * np.exp(np.cumsum(rng.normal(0, 0.01, n_rows)))
+    open_ = close * (1 + rng.normal(0, 0.003, n_rows))
+    high = np.maximum(open_, close) * (1 + np.abs(rng.normal(0, 0.004, n_rows)))
+    low = np.minimum(open_, close) * (1 - np.abs(rng.normal(0, 0.004, n_rows)))
+    return pd.DataFrame({
+        'Date': dates,
+        'Adj Close AVAL': close * 0.8,
+        'Close AVAL': close,
+        'Dividends AVAL': 0.0,
+        'High AVAL': high,
+        'Low AVAL': low,
+        'Open AVAL': open_,
+        'Stock Splits AVAL': 0.0,
+        'Volume AVAL': rng.integers(100_000, 5_000_000, n_rows)
+    })
+
+def machine_info():
+    """Describe la máquina y las versiones para poder comparar ejecuciones."""
+    info = {
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'processor': platform.processor(),
+        'cpu_count': os.cpu_count(),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__
+    }
+    try:
+        pages = os.sysconf('SC_PHYS_PAGES') * os.sysconf('SC_PAGE_SIZE')
+        info['memory_gb'] = round(pages / 1024 ** 3, 2)
+    except (ValueError, OSError, AttributeError):
+        info['memory_gb'] = None
+    return info
+
+def _timed(func, repeats=1, setup=None):
+    """Ejecuta func repeats veces y devuelve el mejor tiempo de reloj, su CPU y el último resultado."""
+    best = None
+    result = None
+    for _ in range(repeats):
+        if setup is not None:
+            setup()
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        result = func()
+        wall = time.perf_counter() - wall_start
+        cpu = time.process_time() - cpu_start
+        if best is None or wall < best['wall_s']:
+            best = {'wall_s': round(wall, 6), 'cpu_s': round(cpu, 6)}
+    return best, result
+
+def import_time(module, top=5):
+    """Resume `python -X importtime -c "import module"`: tiempo acumulado y dependencias más costosas."""
+    src_dir = os.path.dirname(os.path.abspath(__file__))
+    env = dict(os.environ, PYTHONPATH=src_dir + os.pathsep + os.environ.get('PYTHONPATH', ''))
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        capture_output=True, text=True, env=env
+    )
+    # Formato: "import time: self [us] | cumulative | imported package"; el nivel es la sangría del nombre
+    entries = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        entries.append((name.strip(), int(cumulative), len(name) - len(name.lstrip()) - 1))
+
+    # Las líneas salen en postorden: las dependencias del módulo preceden a su propia línea
+    total, direct = None, []
+    for index, (name, cumulative, level) in enumerate(entries):
+        if name == module and level == 0:
+            total = cumulative
+            for child, child_cumulative, child_level in reversed(entries[:index]):
+                if child_level == 0:
+                    break
+                if child_level == 2:
+                    direct.append((child, child_cumulative))
+            break
+    direct.sort(key=lambda item: item[1], reverse=True)
+    return {
+        'ok': proc.returncode == 0,
+        'total_ms': round(total / 1000, 1) if total is not None else None,
+        'top': [{'module': name, 'ms': round(cum / 1000, 1)} for name, cum in direct[:top]]
+    }
+
+def run_size(n_rows, repeats=1, limits=STEP_LIMITS):
+    """Mide cada ruta de datos sobre una historia sintética de n_rows filas en un directorio temporal."""
+    from collector import DataCollector
+    from enricher import DataEnricher
+    from modeller import StockPredictor
+    from arima_model import ejecutar_arima_completo
+    from data_service import DataService
+    import dashboard_data
+
+    results = {}
+
+    def skipped(step):
+        limit = limits.get(step)
+        if limit is not None and n_rows > limit:
+            results[step] = {'skipped': f"{n_rows} filas > límite {limit}"}
+            return True
+        return False
+
+    history = synthetic_ohlcv(n_rows)
+    # Historia previa (95%) y descarga nueva con solapamiento (último 10%)
+    old_part = history.iloc[:int(n_rows * 0.95)]
+    new_part = history.iloc[int(n_rows * 0.90):]
+
+    workdir = tempfile.mkdtemp(prefix='aval_bench_')
+    cwd = os.getcwd()
+    try:
+        os.chdir(workdir)
+        data_dir = os.path.join('src', 'static', 'data')
+        model_dir = os.path.join('src', 'static', 'models')
+        os.makedirs(data_dir)
+        historical_path = os.path.join(data_dir, 'historical.csv')
+
+        # Fusión incremental del colector
+        collector = DataCollector('AVAL', historical_path)
+        results['collector_save_data'], _ = _timed(
+            lambda: collector.save_data(new_part.copy()),
+            repeats,
+            setup=lambda: old_part.to_csv(historical_path, index=False)
+        )
+
+        # Enriquecimiento
+        results['enrich_data'], _ = _timed(
+            lambda: DataEnricher('historical.csv').enrich_data('enriched_historical.csv'),
+            repeats
+        )
+
+        # Entrenamiento y predicción
+        if not skipped('train'):
+            predictor = StockPredictor('enriched_historical.csv')
+            results['train'], _ = _timed(lambda: predictor.train(model_dir=model_dir), repeats)
+            if not skipped('predict_next_day'):
+                results['predict_next_day'], _ = _timed(lambda: predictor.predict_next_day(model_dir=model_dir), repeats)
+
+        # ARIMA completo
+        if not skipped('arima'):
+            results['arima'], _ = _timed(
+                lambda: ejecutar_arima_completo(ruta_archivo=historical_path, graficar=False),
+                repeats
+            )
+
+        # Carga y filtrado del dashboard con sus propios cargadores (dashboard_data, sin la caché de Streamlit)
+        enriched_path = os.path.join(data_dir, 'enriched_historical.csv')
+        db_path = os.path.join(data_dir, 'enriched_historical.sqlite')
+        service = DataService(enriched_path, db_path)
+
+        def render(service, year_range):
+            df = dashboard_data.load_data(service, dashboard_data.KPI_COLUMNS, year_range)
+            zoom_range = (df['Date'].min(), df['Date'].max())
+            return dashboard_data.get_chart_data(service, year_range, zoom_range, dashboard_data.DEFAULT_MAX_POINTS)
+
+        def first_render():
+            # Primera sesión tras publicar datos: reconstruir la vista y pintar todos los años
+            service.refresh()
+            render(service, service.year_bounds())
+
+        results['dashboard_load'], _ = _timed(
+            first_render,
+            repeats,
+            setup=lambda: os.path.exists(db_path) and os.remove(db_path)
+        )
+        first_year, last_year = service.year_bounds()
+        results['dashboard_filter'], _ = _timed(
+            lambda: render(service, (max(first_year, last_year - 1), last_year)),
+            repeats
+        )
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+def run(sizes, repeats=1, limits=STEP_LIMITS, output=None):
+    """Ejecuta el benchmark para cada tamaño y guarda los resultados en JSON. Devuelve la ruta."""
+    # Los logs del pipeline no deben escribirse en el repositorio durante el benchmark
+    os.environ[logger.QUIET_ENV_VAR] = '1'
+    logger.Logger()
+
+    report = {
+        'started': datetime.now().isoformat(timespec='seconds'),
+        'machine': machine_info(),
+        'repeats': repeats,
+        'results': {}
+    }
+    for n_rows in sizes:
+        print(f"Midiendo {n_rows} filas...")
+        report['results'][str(n_rows)] = run_size(n_rows, repeats, limits)
+
+    print("Midiendo tiempos de importación...")
+    report['import_time'] = {module: import_time(module) for module in IMPORT_MODULES}
+    print_import_times(report['import_time'])
+
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, f"bench_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    with open(output, 'w', encoding='utf-8') as file:
+        json.dump(report, file, indent=2, ensure_ascii=False)
+    return output
+
+def print_import_times(times):
+    """Imprime el resumen de tiempos de importación."""
+    print(f"{'Módulo':<14}{'Importación (ms)':>18}  Dependencias más costosas")
+    for module, summary in times.items():
+        total = f"{summary['total_ms']:.1f}" if summary['total_ms'] is not None else 'error'
+        heaviest = ', '.join(f"{item['module']} {item['ms']:.0f}" for item in summary['top'][:3])
+        print(f"{module:<14}{total:>18}  {heaviest}")
+
+def compare(base_path, new_path, threshold=0.10):
+    """Compara dos ejecuciones y devuelve (filas de comparación, regresiones) según el umbral relativo."""
+    with open(base_path, encoding='utf-8') as file:
+        base = json.load(file)
+    with open(new_path, encoding='utf-8') as file:
+        new = json.load(file)
+
+    rows, regressions = [], []
+    for size, steps in new['results'].items():
+        for step, metrics in steps.items():
+            before = base['results'].get(size, {}).get(step, {})
+            if 'wall_s' not in metrics or 'wall_s' not in before:
+                continue
+            change = (metrics['wall_s'] - before['wall_s']) / max(before['wall_s'], 1e-9)
+            row = (size, step, before['wall_s'], metrics['wall_s'], change)
+            rows.append(row)
+            if change > threshold:
+                regressions.append(row)
+    return rows, regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de las rutas de datos del pipeline AVAL")
+    sub = parser.add_subparsers(dest='comando', required=True)
+
+    run_parser = sub.add_parser('ejecutar', help="Ejecuta el benchmark sobre historias sintéticas")
+    run_parser.add_argument('--tamanos', type=int, nargs='+', default=SIZES, help="Filas de cada historia")
+    run_parser.add_argument('--repeticiones', type=int, default=1)
+    run_parser.add_argument('--sin-limites', action='store_true', help="No omitir los pasos costosos en historias grandes")
+    run_parser.add_argument('--salida', help="Ruta del JSON de resultados")
+
+    sub.add_parser('importtime', help="Solo mide el tiempo de importación de los módulos")
+
+    compare_parser = sub.add_parser('comparar', help="Compara dos ejecuciones y marca regresiones")
+    compare_parser.add_argument('base')
+    compare_parser.add_argument('nuevo')
+    compare_parser.add_argument('--umbral', type=float, default=0.10, help="Aumento relativo tolerado (0.10 = 10%%)")
+
+    args = parser.parse_args()
+
+    if args.comando == 'ejecutar':
+        limits = {} if args.sin_limites else STEP_LIMITS
+        path = run(args.tamanos, args.repeticiones, limits, args.salida)
+        print(f"Resultados guardados en {path}")
+    elif args.comando == 'importtime':
+        print_import_times({module: import_time(module) for module in IMPORT_MODULES})
+    else:
+        rows, regressions = compare(args.base, args.nuevo, args.umbral)
+        print(f"{'Filas':>10}  {'Paso':<22}{'Base (s)':>10}{'Nuevo (s)':>11}{'Cambio':>9}")
+        for size, step, before, after, change in rows:
+            mark = '  <-- regresión' if change > args.umbral else ''
+            print(f"{size:>10}  {step:<22}{before:>10.3f}{after:>11.3f}{change:>+9.1%}{mark}")
+        if regressions:
+            print(f"\n{len(regressions)} regresiones por encima del {args.umbral:.0%}")
+            sys.exit(1)
+        print("\nSin regresiones")
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,51 @@
+import argparse
+import importlib
+import subprocess
+import sys
+import os
+
+# Subcomando -> (módulo, ayuda). Cada módulo se importa solo al ejecutar su subcomando,
+# así statsmodels, sklearn o yfinance no se cargan en procesos que no los usan.
+COMMANDS = {
+    'colectar': ('collector', "Descarga y fusiona el histórico de precios"),
+    'enriquecer': ('enricher', "Calcula los indicadores técnicos"),
+    'intradia': ('intraday', "Remuestrea barras intradía y calcula indicadores por frecuencia"),
+    'entrenar': ('modeller', "Entrena el modelo y predice el siguiente día"),
+    'deriva': ('drift', "Monitor de deriva de las características frente al entrenamiento"),
+    'arima': ('arima_model', "Ajusta ARIMA y predice el siguiente día"),
+    'correlacion': ('correlation', "Correlación y covarianza móviles entre símbolos"),
+    'backtest': ('backtester', "Backtest vectorizado de las señales COMPRA/VENTA"),
+    'servir': ('prediction_service', "Servicio HTTP local de predicción con micro-lotes"),
+    'validar': ('validation', "Revisa el histórico con las reglas de calidad de datos"),
+    'programar': ('scheduler', "Programador local que ejecuta el pipeline tras cada cierre"),
+    'historial': ('run_store', "Consulta y mantenimiento del historial de ejecuciones"),
+    'benchmark': ('benchmark', "Benchmark de las rutas de datos")
+}
+
+def run_module(command, args):
+    """Importa el módulo del subcomando y ejecuta su main con los argumentos restantes."""
+    module_name = COMMANDS[command][0]
+    module = importlib.import_module(module_name)
+    sys.argv = [f"aval-tracker {command}"] + list(args)
+    return module.main()
+
+def run_dashboard(args):
+    """Lanza el dashboard de Streamlit."""
+    dashboard = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'dashboard.py')
+    return subprocess.call([sys.executable, '-m', 'streamlit', 'run', dashboard] + list(args))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='aval-tracker', description="Pipeline de análisis y predicción de Grupo Aval")
+    sub = parser.add_subparsers(dest='comando', required=True)
+    for command, (_, help_text) in COMMANDS.items():
+        # Sin -h propio: la ayuda y los argumentos los resuelve el main del módulo
+        sub.add_parser(command, help=help_text, add_help=False)
+    sub.add_parser('dashboard', help="Abre el dashboard de Streamlit", add_help=False)
+
+    args, rest = parser.parse_known_args(argv)
+    if args.comando == 'dashboard':
+        return run_dashboard(rest)
+    return run_module(args.comando, rest)
+
+if __name__ == "__main__":
+    sys.exit(main())
\ No newline at end of file
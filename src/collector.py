@@ -1,9 +1,15 @@
-import yfinance as yf
 import pandas as pd
 import os
+import argparse
 from logger import Logger  # Importar la clase Logger
 from datetime import datetime
 import csv_logger  # Este es el archivo para escribir el log en formato CSV
+from profiling import profiler
+from history_merge import upsert_sorted
+from data_io import file_lock, write_csv, append_csv
+from adjustments import detect_adjustment, rescale_prefix, mark_range
+from intraday import INTRADAY_PERIODS, IntradayStore, bars_from_frame
+import validation
 
 class DataCollector:
     def __init__(self, symbol, filepath):
@@ -12,9 +18,11 @@ class DataCollector:
         self.filepath = filepath
         self.logger = Logger()  # Instanciar Logger
 
+    @profiler.profile('collector.fetch_data')
     def fetch_data(self):
         """Descarga los datos de un símbolo usando yfinance."""
         self.logger.info('DataCollector', 'fetch_data', f"Descargando datos para {self.symbol}")
+        import yfinance as yf  # Importación diferida: solo se necesita al descargar
         df = yf.download(self.symbol, progress=False, auto_adjust=False, actions=True)
         df.reset_index(inplace=True)
 
@@ -22,6 +30,26 @@ class DataCollector:
         df.columns = [col if isinstance(col, str) else ' '.join(col).strip() for col in df.columns]
         return df
 
+    @profiler.profile('collector.fetch_intraday')
+    def fetch_intraday(self, interval):
+        """Descarga barras intradía (1m, 5m o 1h) del periodo máximo que ofrece Yahoo para el intervalo."""
+        self.logger.info('DataCollector', 'fetch_intraday', f"Descargando barras {interval} para {self.symbol}")
+        import yfinance as yf
+        df = yf.download(self.symbol, period=INTRADAY_PERIODS[interval], interval=interval,
+                         progress=False, auto_adjust=False)
+        df.reset_index(inplace=True)
+        df.columns = [col if isinstance(col, str) else ' '.join(col).strip() for col in df.columns]
+        return df
+
+    @profiler.profile('collector.save_intraday')
+    def save_intraday(self, df, interval):
+        """Anexa al almacén intradía las barras cerradas posteriores a la última guardada."""
+        store = IntradayStore(self.symbol, interval)
+        added = store.append(bars_from_frame(df, self.symbol))
+        self.logger.info('DataCollector', 'save_intraday', f"Barras {interval} descargadas: {len(df)}, agregadas: {added}")
+        return added
+
+    @profiler.profile('collector.save_data')
     def save_data(self, df):
         """Guarda los datos descargados en un archivo CSV y registra detalles."""
         # Crear el directorio si no existe
@@ -31,34 +59,91 @@ class DataCollector:
 
         downloaded_count = len(df)
 
-        # Leer archivo histórico si existe
-        if os.path.exists(self.filepath) and os.path.getsize(self.filepath) > 0:
-            old_df = pd.read_csv(self.filepath, parse_dates=["Date"])
-
-            # LIMPIAR columnas del archivo viejo
-            old_df.columns = [col if isinstance(col, str) else ' '.join(col).strip() for col in old_df.columns]
+        # LIMPIAR columnas por si vienen jerárquicas
+        df.columns = [col if isinstance(col, str) else ' '.join(col).strip() for col in df.columns]
 
-            before_merge_count = len(old_df)
-            # Combinar datos antiguos con los nuevos, eliminando duplicados por fecha
-            merged_df = pd.concat([old_df, df]).drop_duplicates(subset="Date").sort_values("Date")
-            after_merge_count = len(merged_df)
-            new_rows_added = after_merge_count - before_merge_count
-        else:
-            merged_df = df
-            new_rows_added = len(df)
+        # Leer, fusionar y escribir con bloqueo exclusivo: otro colector no puede intercalarse
+        # y el enriquecedor o el dashboard nunca leen un archivo a medias
+        with file_lock(self.filepath):
+            merged_df, new_rows_added, revised_rows, checked = self._merge_into_history(df)
 
-        # LIMPIAR columnas antes de guardar para evitar multi-index accidental
-        merged_df.columns = [col if isinstance(col, str) else ' '.join(col).strip() for col in merged_df.columns]
+        # Las filas rechazadas quedan en el archivo de cuarentena y los conteos por regla en el historial
+        quarantined = validation.quarantine_rows(checked['cuarentena'], self.symbol)
+        validation.record_result(self.symbol, checked, 'incremental')
+        self.logger.info('DataCollector', 'save_data', f"Validación: {validation.summary_text(checked)}")
+        if quarantined:
+            self.logger.warning('DataCollector', 'save_data',
+                                f"Filas nuevas en cuarentena: {quarantined} ({validation.QUARANTINE_PATH})")
 
-        # Guardar datos en el archivo CSV
-        merged_df.to_csv(self.filepath, index=False)
         self.logger.info('DataCollector', 'save_data', f"Datos guardados en {self.filepath}")
         self.logger.info('DataCollector', 'save_data', f"Registros descargados: {downloaded_count}")
         self.logger.info('DataCollector', 'save_data', f"Nuevos registros agregados: {new_rows_added}")
+        self.logger.info('DataCollector', 'save_data', f"Registros revisados: {revised_rows}")
         self.logger.info('DataCollector', 'save_data', f"Total de registros en el archivo: {len(merged_df)}")
 
         # Registrar en archivo CSV centralizado
-        csv_logger.write_csv_log(self.symbol, downloaded_count, new_rows_added, len(merged_df), "Éxito")
+        csv_logger.write_csv_log(self.symbol, downloaded_count, new_rows_added, len(merged_df), "Éxito", revised_rows,
+                                 len(checked['cuarentena']))
+
+    def _merge_into_history(self, df):
+        """Valida y fusiona la descarga con el histórico y lo guarda.
+
+        Devuelve (histórico, filas agregadas, filas revisadas, resultado de la validación).
+        """
+        # Leer archivo histórico si existe
+        if os.path.exists(self.filepath) and os.path.getsize(self.filepath) > 0:
+            old_df = pd.read_csv(self.filepath, parse_dates=["Date"])
+
+            # LIMPIAR columnas del archivo viejo
+            old_df.columns = [col if isinstance(col, str) else ' '.join(col).strip() for col in old_df.columns]
+
+            # Validar solo las filas nuevas o cambiadas: las que fallan no llegan al histórico,
+            # así un dato malo nunca obliga a re-enriquecer y reentrenar todo para limpiarlo
+            checked = validation.validate(df, old_df)
+            df = checked['validas']
+
+            # Ambas historias están ordenadas por fecha: las fechas repetidas toman el valor
+            # descargado (p.ej. Adj Close ajustado por un dividendo) y las nuevas se agregan al final
+            merged_df, summary = upsert_sorted(old_df, df)
+            new_rows_added = summary['added']
+            revised_rows = summary['revised']
+
+            # Un dividendo o split nuevo reescala el Adj Close (y en splits los precios) anterior a su fecha
+            adjustment = detect_adjustment(old_df, df)
+            if adjustment is not None:
+                if adjustment['factores'] is not None:
+                    # Las filas guardadas que la descarga no cubre se corrigen localmente con el mismo factor
+                    merged_df = rescale_prefix(merged_df, adjustment['filas_previas'], adjustment['factores'])
+                    revised_rows += adjustment['filas_previas']
+                    self.logger.info('DataCollector', 'save_data',
+                                     f"Ajuste por {adjustment['motivo']} desde {adjustment['desde'].date()}: {adjustment['factores']}")
+                # El enriquecedor reescala lo anterior y recalcula solo desde esa fecha
+                mark = (adjustment['desde'], adjustment['factores'], adjustment['motivo'])
+            elif summary['changed_from'] is not None:
+                mark = (summary['changed_from'], None, 'revision')
+            else:
+                mark = None
+
+            append_only = summary['append_only'] and adjustment is None and list(merged_df.columns) == list(old_df.columns)
+        else:
+            checked = validation.validate(df)
+            merged_df = checked['validas']
+            new_rows_added = len(merged_df)
+            revised_rows = 0
+            append_only = False
+            mark = None
+
+        # Guardar datos en el archivo CSV (sin revisiones basta con anexar las filas nuevas)
+        if append_only:
+            if new_rows_added:
+                append_csv(merged_df.iloc[-new_rows_added:], self.filepath)
+        else:
+            write_csv(merged_df, self.filepath)
+
+        # Marcar el rango solo cuando el histórico ya quedó escrito
+        if mark is not None:
+            mark_range(*mark)
+        return merged_df, new_rows_added, revised_rows, checked
 
     def handle_error(self, error_message):
         """Maneja errores y los registra en el log."""
@@ -76,11 +161,25 @@ class DataCollector:
         csv_logger.write_csv_log(self.symbol, 0, 0, "Error", f"Error: {error_message}")
 
 
-if __name__ == "__main__":
+def main():
+    parser = argparse.ArgumentParser(description="Descarga y fusiona el histórico de precios")
+    parser.add_argument('--intradia', nargs='*', default=[], choices=sorted(INTRADAY_PERIODS),
+                        help="Intervalos intradía a guardar además de las barras diarias")
+    args = parser.parse_args()
+
     collector = DataCollector("AVAL", "src/static/data/historical.csv")
     try:
         data = collector.fetch_data()
         collector.save_data(data)
+        for interval in args.intradia:
+            collector.save_intraday(collector.fetch_intraday(interval), interval)
 
     except Exception as e:
-        collector.handle_error(str(e))
\ No newline at end of file
+        collector.handle_error(str(e))
+
+    finally:
+        profiler.write('collector')
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
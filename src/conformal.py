@@ -0,0 +1,122 @@
+import json
+import math
+import os
+
+import numpy as np
+import pandas as pd
+
+import artifacts
+from data_io import atomic_path, file_lock
+
+MODEL_DIR = os.path.join('src', 'static', 'models')
+STATE_FILE = 'conformal_state.json'
+
+# Residuos de calibración que se conservan (los más recientes) y niveles de cobertura de los intervalos
+RING_SIZE = 250
+LEVELS = (0.8, 0.95)
+
+def interval_columns(level):
+    percent = f"{level * 100:g}%"
+    return f'Límite inferior {percent}', f'Límite superior {percent}'
+
+class ResidualRing:
+    """Búfer circular de residuos absolutos con una copia ordenada para leer cuantiles sin reordenar.
+
+    Cada residuo nuevo reemplaza al más antiguo: se ubica por búsqueda binaria en la copia ordenada.
+    """
+
+    def __init__(self, size=RING_SIZE, values=()):
+        self.size = size
+        self.values = np.zeros(size)
+        self.sorted = np.empty(0)
+        self.position = 0
+        self.count = 0
+        for value in values:
+            self.push(value)
+
+    def push(self, value):
+        if self.count == self.size:
+            old = self.values[self.position]
+            self.sorted = np.delete(self.sorted, np.searchsorted(self.sorted, old))
+        else:
+            self.count += 1
+        self.values[self.position] = value
+        self.position = (self.position + 1) % self.size
+        self.sorted = np.insert(self.sorted, np.searchsorted(self.sorted, value), value)
+
+    def chronological(self):
+        """Residuos del más antiguo al más reciente."""
+        if self.count < self.size:
+            return self.values[:self.count]
+        return np.roll(self.values, -self.position)
+
+    def quantile(self, level):
+        """Cuantil conformal: el residuo ⌈(n+1)·nivel⌉-ésimo (infinito si no hay residuos suficientes)."""
+        rank = math.ceil((self.count + 1) * level)
+        return self.sorted[rank - 1] if rank <= self.count else np.inf
+
+class ConformalIntervals:
+    """Intervalos de predicción conformales (split + en línea) para el modelo vigente.
+
+    La calibración parte de los residuos del tramo de prueba publicados con el modelo y se actualiza con los
+    valores reales que van llegando, sin reentrenar. El estado se guarda junto a los modelos por versión.
+    """
+
+    def __init__(self, model_dir=MODEL_DIR, size=RING_SIZE):
+        self.model_dir = model_dir
+        self.state_path = os.path.join(model_dir, STATE_FILE)
+        self.version = artifacts.current_version(model_dir)
+        self.last_date = None
+        self.ring = ResidualRing(size)
+        self._load(size)
+
+    def _load(self, size):
+        if os.path.exists(self.state_path):
+            with open(self.state_path, encoding='utf-8') as file:
+                state = json.load(file)
+            # Un entrenamiento nuevo reinicia la calibración con sus propios residuos de prueba
+            if state.get('version') == self.version:
+                self.ring = ResidualRing(size, state['residuos'])
+                self.last_date = pd.Timestamp(state['ultima_fecha'])
+                return
+        path = artifacts.artifact_paths(self.model_dir, self.version)['calibration']
+        if os.path.exists(path):
+            calibration = pd.read_csv(path, parse_dates=['Date'])
+            self.ring = ResidualRing(size, calibration['Residuo'].tail(size))
+            self.last_date = calibration['Date'].iloc[-1]
+
+    def update(self, df, predict, features, target_col):
+        """Agrega los residuos de las filas con valor real posteriores a la última calibrada. Devuelve cuántas."""
+        if self.last_date is None:
+            return 0
+        new = df[df['Date'] > self.last_date].dropna(subset=list(features) + [target_col])
+        if len(new):
+            # Una sola predicción por lote para todas las filas nuevas
+            residuals = np.abs(new[target_col].to_numpy(dtype='float64') - predict(new[features]))
+            for residual in residuals:
+                self.ring.push(residual)
+            self.last_date = new['Date'].iloc[-1]
+            self.save()
+        return len(new)
+
+    def save(self):
+        state = {
+            'version': self.version,
+            'ultima_fecha': str(self.last_date),
+            'residuos': self.ring.chronological().tolist()
+        }
+        with file_lock(self.state_path):
+            with atomic_path(self.state_path) as tmp_path:
+                with open(tmp_path, 'w', encoding='utf-8') as file:
+                    json.dump(state, file)
+
+    def intervals(self, prediction, levels=LEVELS):
+        """Columnas de límites inferior y superior para cada nivel (NaN sin residuos suficientes)."""
+        result = {}
+        for level in levels:
+            radius = self.ring.quantile(level)
+            lower, upper = interval_columns(level)
+            finite = np.isfinite(radius)
+            result[lower] = prediction - radius if finite else np.nan
+            result[upper] = prediction + radius if finite else np.nan
+        return result
\ No newline at end of file
@@ -0,0 +1,254 @@
+import argparse
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from data_io import atomic_path, file_lock, fsync_path, write_csv
+
+# Panel de precios y matrices: src/static/data/correlation/
+CORRELATION_DIR = os.path.join('src', 'static', 'data', 'correlation')
+PRICES_PATH = os.path.join(CORRELATION_DIR, 'prices.csv')
+
+DEFAULT_SYMBOLS = ['AVAL', 'CIB', 'EC']
+DEFAULT_BENCHMARK = 'SPY'
+DEFAULT_WINDOW = 60
+
+def record_dtype(n_symbols):
+    """Registro de ancho fijo por día: ts en nanosegundos y triángulo superior (con diagonal) en float32."""
+    return np.dtype([('ts', '<i8'), ('tri', '<f4', (n_symbols * (n_symbols + 1) // 2,))])
+
+def download_prices(symbols, path=PRICES_PATH):
+    """Descarga el Adj Close de todos los símbolos y lo fusiona con el panel guardado (una columna por símbolo)."""
+    import yfinance as yf  # Importación diferida: solo se necesita al descargar
+    df = yf.download(symbols, progress=False, auto_adjust=False)['Adj Close']
+    df = df.reindex(columns=symbols)
+    df.index = pd.DatetimeIndex(df.index).tz_localize(None)
+    df.index.name = 'Date'
+
+    with file_lock(path):
+        if os.path.exists(path):
+            stored = pd.read_csv(path, parse_dates=['Date'], index_col='Date')
+            # La descarga manda en las fechas repetidas (p.ej. Adj Close reajustado por un dividendo)
+            df = df.combine_first(stored)
+        write_csv(df.sort_index().reset_index(), path)
+    return df
+
+def load_returns(symbols, path=PRICES_PATH):
+    """Log-retornos diarios en las fechas en que todos los símbolos cotizan."""
+    prices = pd.read_csv(path, parse_dates=['Date'], index_col='Date')
+    missing = [symbol for symbol in symbols if symbol not in prices.columns]
+    if missing:
+        raise ValueError(f"Símbolos sin precios en {path}: {missing}")
+    prices = prices[symbols].dropna().sort_index()
+    returns = np.log(prices).diff().iloc[1:]
+    return returns.index.as_unit('ns').asi8, returns.to_numpy(dtype='float64')
+
+class RollingCovariance:
+    """Covarianza móvil de N series con actualizaciones de rango uno.
+
+    Guarda la suma de los retornos y la suma de productos cruzados solo del triángulo superior: agregar un día
+    suma r_i·r_j y quitar el que sale de la ventana lo resta, O(N²) por día en lugar de O(N²·ventana).
+    """
+
+    def __init__(self, n_symbols, window, refresh=None):
+        self.window = window
+        self.rows, self.cols = np.triu_indices(n_symbols)
+        self.buffer = np.zeros((window, n_symbols))
+        self.sums = np.zeros(n_symbols)
+        self.cross = np.zeros(len(self.rows))
+        self.count = 0
+        self.pushed = 0
+        # Cada refresh días se recalculan las sumas desde la ventana para que no acumulen error de redondeo
+        self.refresh = refresh or window
+
+    def push(self, returns):
+        slot = self.pushed % self.window
+        if self.count == self.window:
+            old = self.buffer[slot]
+            self.sums -= old
+            self.cross -= old[self.rows] * old[self.cols]
+        else:
+            self.count += 1
+        self.buffer[slot] = returns
+        self.sums += returns
+        self.cross += returns[self.rows] * returns[self.cols]
+        self.pushed += 1
+        if self.pushed % self.refresh == 0:
+            self._recompute()
+
+    def _recompute(self):
+        window = self.buffer[:self.count]
+        self.sums = window.sum(axis=0)
+        self.cross = np.einsum('ti,ti->i', window[:, self.rows], window[:, self.cols])
+
+    def covariance(self):
+        """Triángulo superior de la matriz de covarianza muestral de la ventana actual."""
+        n = self.count
+        return (self.cross - self.sums[self.rows] * self.sums[self.cols] / n) / (n - 1)
+
+def unpack(tri, n_symbols):
+    """Matriz simétrica completa a partir del triángulo superior."""
+    rows, cols = np.triu_indices(n_symbols)
+    matrix = np.empty((n_symbols, n_symbols), dtype='float64')
+    matrix[rows, cols] = tri
+    matrix[cols, rows] = tri
+    return matrix
+
+def correlation_from_covariance(cov):
+    std = np.sqrt(np.diag(cov))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return cov / np.outer(std, std)
+
+def tri_index(i, j, n_symbols):
+    """Posición del par (i, j) en el triángulo superior guardado."""
+    i, j = min(i, j), max(i, j)
+    return i * n_symbols - i * (i - 1) // 2 + (j - i)
+
+class CorrelationStore:
+    """Covarianzas móviles por día en un archivo binario de solo anexado, con metadatos JSON al lado."""
+
+    def __init__(self, window=DEFAULT_WINDOW, root=CORRELATION_DIR):
+        self.window = window
+        self.path = os.path.join(root, f'cov_{window}.bin')
+        self.meta_path = os.path.join(root, f'cov_{window}.json')
+
+    def meta(self):
+        if not os.path.exists(self.meta_path):
+            return None
+        with open(self.meta_path, encoding='utf-8') as file:
+            return json.load(file)
+
+    def records(self):
+        """Registros guardados mapeados en memoria (solo se leen las páginas que se consultan)."""
+        meta = self.meta()
+        if meta is None or not os.path.exists(self.path):
+            return None, None
+        dtype = record_dtype(len(meta['simbolos']))
+        count = os.path.getsize(self.path) // dtype.itemsize
+        if not count:
+            return meta, np.empty(0, dtype=dtype)
+        return meta, np.memmap(self.path, dtype=dtype, mode='r', shape=(count,))
+
+    def _write_meta(self, meta):
+        with atomic_path(self.meta_path) as tmp_path:
+            with open(tmp_path, 'w', encoding='utf-8') as file:
+                json.dump(meta, file, ensure_ascii=False)
+
+    def update(self, symbols, benchmark, timestamps, returns, full=False):
+        """Calcula y anexa las matrices de los días posteriores al último guardado. Devuelve cuántas se agregaron."""
+        symbols = list(symbols)
+        dtype = record_dtype(len(symbols))
+        with file_lock(self.path):
+            meta, stored = self.records()
+            start, mode = self.window - 1, 'wb'
+            if not full and meta is not None and meta['simbolos'] == symbols and len(stored):
+                last = int(stored['ts'][-1])
+                position = int(np.searchsorted(timestamps, last))
+                if position < len(timestamps) and timestamps[position] == last and position >= start:
+                    # Si el último día guardado ya no coincide (precios revisados), se recalcula todo
+                    window = returns[position - self.window + 1:position + 1]
+                    check = np.cov(window, rowvar=False)[np.triu_indices(len(symbols))]
+                    if np.allclose(check, stored['tri'][-1], rtol=1e-4, atol=1e-10):
+                        start, mode = position + 1, 'ab'
+            del stored
+
+            engine = RollingCovariance(len(symbols), self.window)
+            first = max(start - self.window + 1, 0)
+            for row in returns[first:start]:
+                engine.push(row)
+            out = np.empty(max(len(returns) - start, 0), dtype=dtype)
+            for k, row in enumerate(returns[start:]):
+                engine.push(row)
+                out['ts'][k] = timestamps[start + k]
+                out['tri'][k] = engine.covariance()
+
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path, mode) as file:
+                # Descartar un registro parcial de una escritura interrumpida antes de anexar
+                file.truncate(os.path.getsize(self.path) // dtype.itemsize * dtype.itemsize if mode == 'ab' else 0)
+                file.write(out.tobytes())
+                file.flush()
+                os.fsync(file.fileno())
+            fsync_path(os.path.dirname(self.path))
+            self._write_meta({'simbolos': symbols, 'referencia': benchmark, 'ventana': self.window})
+        return len(out)
+
+    def dates(self):
+        meta, stored = self.records()
+        if stored is None:
+            return pd.DatetimeIndex([])
+        return pd.DatetimeIndex(np.asarray(stored['ts']).astype('datetime64[ns]'))
+
+    def matrix(self, date, kind='correlacion'):
+        """Matriz de correlación o covarianza del último día guardado en o antes de date."""
+        meta, stored = self.records()
+        if stored is None or not len(stored):
+            raise ValueError(f"No hay matrices guardadas en {self.path}")
+        position = int(np.searchsorted(stored['ts'], pd.Timestamp(date).value, side='right')) - 1
+        if position < 0:
+            raise ValueError(f"No hay matrices anteriores a {pd.Timestamp(date).date()}")
+        symbols = meta['simbolos']
+        cov = unpack(stored['tri'][position], len(symbols))
+        values = correlation_from_covariance(cov) if kind == 'correlacion' else cov
+        day = pd.Timestamp(int(stored['ts'][position]))
+        return day, pd.DataFrame(values, index=symbols, columns=symbols)
+
+    def betas(self, benchmark=None):
+        """Beta móvil de cada símbolo contra la referencia para todos los días guardados (vectorizado)."""
+        meta, stored = self.records()
+        if stored is None:
+            raise ValueError(f"No hay matrices guardadas en {self.path}")
+        symbols = meta['simbolos']
+        benchmark = benchmark or meta['referencia']
+        b = symbols.index(benchmark)
+        n = len(symbols)
+        tri = np.asarray(stored['tri'], dtype='float64')
+        variance = tri[:, tri_index(b, b, n)]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            betas = {symbol: tri[:, tri_index(i, b, n)] / variance for i, symbol in enumerate(symbols) if i != b}
+        frame = pd.DataFrame(betas)
+        frame.insert(0, 'Date', np.asarray(stored['ts']).astype('datetime64[ns]'))
+        return frame
+
+def main():
+    parser = argparse.ArgumentParser(description="Correlación y covarianza móviles entre símbolos y beta a una referencia")
+    parser.add_argument('--ventana', type=int, default=DEFAULT_WINDOW, help="Días de la ventana móvil")
+    sub = parser.add_subparsers(dest='comando', required=True)
+
+    update = sub.add_parser('actualizar', help="Descarga precios y anexa las matrices de los días nuevos")
+    update.add_argument('--simbolos', nargs='+', default=DEFAULT_SYMBOLS)
+    update.add_argument('--referencia', default=DEFAULT_BENCHMARK, help="Símbolo de referencia para la beta")
+    update.add_argument('--sin-descarga', action='store_true', help="Usa el panel de precios ya guardado")
+    update.add_argument('--completo', action='store_true', help="Recalcula todas las matrices")
+
+    show = sub.add_parser('matriz', help="Matriz de un día")
+    show.add_argument('--fecha', default=None, help="AAAA-MM-DD (por defecto, el último día guardado)")
+    show.add_argument('--covarianza', action='store_true')
+
+    beta = sub.add_parser('betas', help="Exporta la beta móvil de cada símbolo a CSV")
+    beta.add_argument('--referencia', default=None)
+    args = parser.parse_args()
+
+    store = CorrelationStore(args.ventana)
+    if args.comando == 'actualizar':
+        symbols = list(dict.fromkeys(args.simbolos + [args.referencia]))
+        if not args.sin_descarga:
+            download_prices(symbols)
+        timestamps, returns = load_returns(symbols)
+        added = store.update(symbols, args.referencia, timestamps, returns, full=args.completo)
+        print(f"Matrices agregadas: {added} (ventana de {args.ventana} días, {len(symbols)} símbolos)")
+    elif args.comando == 'matriz':
+        day, matrix = store.matrix(args.fecha or pd.Timestamp.max, 'covarianza' if args.covarianza else 'correlacion')
+        print(f"{day.date()}:")
+        print(matrix.round(4).to_string())
+    else:
+        path = os.path.join(CORRELATION_DIR, f'betas_{args.ventana}.csv')
+        betas = store.betas(args.referencia)
+        write_csv(betas, path)
+        print(betas.tail().to_string(index=False))
+        print(f"\nBetas en {path}")
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -1,9 +1,29 @@
 import csv
 import os
 from datetime import datetime
+from data_io import file_lock
+from run_store import CSV_LOG_PATH, RUN_DB_PATH, RunStore
 
-def init_csv_log(file_path="src/logs/log_data.csv"):
+LOG_FIELDS = ["Fecha", "Símbolo", "Registros_descargados", "Registros_agregados", "Total_en_archivo", "Estado"]
+
+# Rutas ya verificadas en este proceso (evita revisar el directorio en cada llamada)
+_initialized_paths = set()
+# Historial abierto por ruta: el esquema y las migraciones se aplican una sola vez por proceso
+_run_stores = {}
+
+def _run_store(db_path=RUN_DB_PATH):
+    key = os.path.abspath(db_path)
+    if key not in _run_stores:
+        _run_stores[key] = RunStore(db_path)
+    return _run_stores[key]
+
+def init_csv_log(file_path=CSV_LOG_PATH):
     """Inicializa el archivo CSV si no existe y agrega los encabezados."""
+    # La ruta es relativa al directorio de trabajo, que puede cambiar dentro del proceso
+    key = os.path.abspath(file_path)
+    if key in _initialized_paths:
+        return
+
     # Verificar si el directorio existe, si no, crear
     dir_path = os.path.dirname(file_path)
     if not os.path.exists(dir_path):
@@ -12,11 +32,12 @@ def init_csv_log(file_path="src/logs/log_data.csv"):
     # Verificar si el archivo CSV existe, si no, crear con encabezado
     if not os.path.exists(file_path):
         with open(file_path, mode='w', newline='') as file:
-            writer = csv.DictWriter(file, fieldnames=["Fecha", "Símbolo", "Registros_descargados", "Registros_agregados", "Total_en_archivo", "Estado"])
+            writer = csv.DictWriter(file, fieldnames=LOG_FIELDS)
             writer.writeheader()
+    _initialized_paths.add(key)
 
-def write_csv_log(symbol, downloaded_count, new_rows_added, total_count, status):
-    """Escribe un nuevo registro en el archivo CSV de log."""
+def write_csv_log(symbol, downloaded_count, new_rows_added, total_count, status, revised_rows=None, quarantined_rows=None):
+    """Escribe un nuevo registro en el archivo CSV de log y en el historial de ejecuciones."""
     log_entry = {
         "Fecha": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
         "Símbolo": symbol,
@@ -26,22 +47,18 @@ def write_csv_log(symbol, downloaded_count, new_rows_added, total_count, status)
         "Estado": status
     }
 
-    log_data_path = "src/logs/log_data.csv"
+    log_data_path = CSV_LOG_PATH
 
-    # Verificar si el directorio existe, si no, crear
-    dir_path = os.path.dirname(log_data_path)
-    if not os.path.exists(dir_path):
-        os.makedirs(dir_path, exist_ok=True)
+    # Crea el directorio y el encabezado solo la primera vez en el proceso
+    init_csv_log(log_data_path)
 
-    # Solo se escribe el encabezado la primera vez, cuando el archivo no existe
-    file_exists = os.path.exists(log_data_path)
+    # El bloqueo evita perder la fila si `historial rotar` está reescribiendo el archivo
+    with file_lock(log_data_path):
+        with open(log_data_path, mode='a', newline='') as file:
+            writer = csv.DictWriter(file, fieldnames=LOG_FIELDS)
+            # Escribir la nueva entrada
+            writer.writerow(log_entry)
 
-    with open(log_data_path, mode='a', newline='') as file:
-        writer = csv.DictWriter(file, fieldnames=["Fecha", "Símbolo", "Registros_descargados", "Registros_agregados", "Total_en_archivo", "Estado"])
-        
-        # Si el archivo no existe, se escribe el encabezado
-        if not file_exists:
-            writer.writeheader()
-        
-        # Escribir la nueva entrada
-        writer.writerow(log_entry)
\ No newline at end of file
+    # Registrar también en el historial consultable (las filas revisadas solo se guardan allí)
+    _run_store().record(symbol, downloaded_count, new_rows_added, total_count, status, fecha=log_entry["Fecha"],
+                      revised_rows=revised_rows, quarantined_rows=quarantined_rows)
\ No newline at end of file
@@ -3,11 +3,14 @@ import pandas as pd
 import plotly.graph_objects as go
 import plotly.express as px
 import numpy as np
-import joblib
 import os
 
-# Importa el modelo ARIMA
-from arima_model import ejecutar_arima_completo
+import dashboard_data
+from data_service import DataService
+from data_io import data_version
+from artifacts import ModelNotTrainedError, load_artifacts
+import conformal
+from correlation import CorrelationStore
 
 # Configuración de la página
 st.set_page_config(
@@ -19,23 +22,38 @@ st.set_page_config(
 st.title("📊 AVAL Stock Analysis Dashboard")
 
 # Definir rutas relativas
-DATA_PATH = os.path.join('src', 'static', 'data', 'enriched_historical.csv')
+DATA_PATH = dashboard_data.DATA_PATH
 HISTORICAL_PATH = os.path.join('src', 'static', 'data', 'historical.csv')
-MODEL_PATH = os.path.join('src', 'static', 'models', 'model.pkl')
-METRICS_PATH = os.path.join('src', 'static', 'models', 'metrics.csv')
-SCALER_PATH = os.path.join('src', 'static', 'models', 'scaler.pkl')
-SELECTOR_PATH = os.path.join('src', 'static', 'models', 'feature_selector.pkl')
-FEATURES_PATH = os.path.join('src', 'static', 'models', 'selected_features.csv')
+MODEL_DIR = os.path.join('src', 'static', 'models')
+KPI_COLUMNS = dashboard_data.KPI_COLUMNS
+
+# Servicio de lectura compartido (vista SQLite sobre el CSV enriquecido)
+@st.cache_resource
+def get_service():
+    return DataService(DATA_PATH)
+
+# Los cargadores viven en dashboard_data; aquí solo se cachean por versión de los datos
+@st.cache_data
+def load_data(version, columns, year_range):
+    return dashboard_data.load_data(get_service(), columns, year_range)
+
+@st.cache_data
+def load_stats(version):
+    return dashboard_data.load_stats(get_service())
 
-# Cargar datos
 @st.cache_data
-def load_data():
-    df = pd.read_csv(DATA_PATH)
-    df['Date'] = pd.to_datetime(df['Date'], errors='coerce').dt.floor('ms')
-    return df
+def load_correlation(version, date):
+    return dashboard_data.load_correlation(date)
+
+@st.cache_data
+def get_chart_data(version, year_range, zoom_range, max_points):
+    return dashboard_data.get_chart_data(get_service(), year_range, zoom_range, max_points)
 
 try:
-    df = load_data()
+    service = get_service()
+    DATA_VERSION = service.refresh()
+    min_year, max_year = service.year_bounds()
+    signal_columns = ['Señal'] if 'Señal' in service.columns() else []
 except Exception as e:
     st.error(f"Error al cargar los datos: {e}")
     st.stop()
@@ -44,7 +62,7 @@ except Exception as e:
 # Inicialización de filtros en session_state
 # ======================
 if 'year_range' not in st.session_state:
-    st.session_state['year_range'] = (int(df['Year'].min()), int(df['Year'].max()))
+    st.session_state['year_range'] = (min_year, max_year)
 if 'selected_mas' not in st.session_state:
     st.session_state['selected_mas'] = ['SMA_21', 'SMA_50', 'SMA_200']
 if 'selected_indicators' not in st.session_state:
@@ -72,8 +90,8 @@ if st.sidebar.button("Resetear filtros"):
 
 year_range = st.sidebar.slider(
     "Seleccionar Rango de Años",
-    min_value=int(df['Year'].min()),
-    max_value=int(df['Year'].max()),
+    min_value=min_year,
+    max_value=max_year,
     key='year_range'
 )
 
@@ -91,11 +109,37 @@ selected_indicators = st.sidebar.multiselect(
     key='selected_indicators'
 )
 
+max_points = st.sidebar.slider(
+    "Puntos máximos por gráfico",
+    min_value=200,
+    max_value=5000,
+    value=dashboard_data.DEFAULT_MAX_POINTS,
+    step=100
+)
+
 # ======================
 # Filtrar datos por año
 # ======================
-mask = (df['Year'] >= st.session_state['year_range'][0]) & (df['Year'] <= st.session_state['year_range'][1])
-filtered_df = df[mask].copy()
+# Consulta por rango de fechas sobre el índice de la vista (solo columnas de KPIs y señales)
+filtered_df = load_data(DATA_VERSION, tuple(KPI_COLUMNS + signal_columns), tuple(st.session_state['year_range']))
+
+# Rango visible: al acercarse lo suficiente los gráficos vuelven a resolución completa
+min_date, max_date = filtered_df['Date'].min().date(), filtered_df['Date'].max().date()
+zoom_range = st.sidebar.date_input(
+    "Rango visible (zoom)",
+    value=(min_date, max_date),
+    min_value=min_date,
+    max_value=max_date
+)
+if not isinstance(zoom_range, (list, tuple)) or len(zoom_range) != 2:
+    zoom_range = (min_date, max_date)  # Selección incompleta: usar todo el rango
+
+chart_data = get_chart_data(DATA_VERSION, tuple(st.session_state['year_range']), tuple(zoom_range), max_points)
+bars_df = chart_data['bars']
+lines = chart_data['lines']
+freq_labels = {'W-FRI': 'semanales', 'ME': 'mensuales', 'QE': 'trimestrales', 'YE': 'anuales'}
+if chart_data['freq'] is not None:
+    st.sidebar.caption(f"Mostrando barras {freq_labels[chart_data['freq']]}; acerque el rango para ver datos diarios.")
 
 # ======================
 # KPIs en la parte superior
@@ -158,11 +202,11 @@ st.subheader("Análisis de Precio y Volumen")
 fig = go.Figure()
 
 fig.add_trace(go.Candlestick(
-    x=filtered_df['Date'],
-    open=filtered_df['Open AVAL'],
-    high=filtered_df['High AVAL'],
-    low=filtered_df['Low AVAL'],
-    close=filtered_df['Close AVAL'],
+    x=bars_df['Date'],
+    open=bars_df['Open AVAL'],
+    high=bars_df['High AVAL'],
+    low=bars_df['Low AVAL'],
+    close=bars_df['Close AVAL'],
     name='OHLC'
 ))
 
@@ -175,15 +219,15 @@ ma_colors = {
 }
 for ma in selected_mas:
     fig.add_trace(go.Scatter(
-        x=filtered_df['Date'],
-        y=filtered_df[ma],
+        x=lines[ma]['Date'],
+        y=lines[ma][ma],
         name=ma,
         line=dict(color=ma_colors.get(ma, 'gray'), dash='solid')
     ))
 
 # Visualización de cruces de medias móviles
-cross_5_20 = filtered_df[filtered_df['SMA_Cross_5_20'] == 1]
-cross_10_50 = filtered_df[filtered_df['SMA_Cross_10_50'] == 1]
+cross_5_20 = bars_df[bars_df['SMA_Cross_5_20'] == 1]
+cross_10_50 = bars_df[bars_df['SMA_Cross_10_50'] == 1]
 fig.add_trace(go.Scatter(
     x=cross_5_20['Date'],
     y=cross_5_20['Adj Close AVAL'],
@@ -244,16 +288,15 @@ st.plotly_chart(fig, use_container_width=True)
 # ======================
 # Gráfico de volumen con media móvil
 # ======================
-filtered_df['Volume_MA_21'] = filtered_df['Volume AVAL'].rolling(window=21).mean()
 volume_fig = go.Figure()
 volume_fig.add_trace(go.Bar(
-    x=filtered_df['Date'],
-    y=filtered_df['Volume AVAL'],
+    x=bars_df['Date'],
+    y=bars_df['Volume AVAL'],
     name='Volumen'
 ))
 volume_fig.add_trace(go.Scatter(
-    x=filtered_df['Date'],
-    y=filtered_df['Volume_MA_21'],
+    x=lines['Volume_MA_21']['Date'],
+    y=lines['Volume_MA_21']['Volume_MA_21'],
     name='Volumen MA 21d',
     line=dict(color='orange', dash='dot')
 ))
@@ -278,8 +321,8 @@ if 'RSI' in selected_indicators:
     with col1:
         fig_rsi = go.Figure()
         fig_rsi.add_trace(go.Scatter(
-            x=filtered_df['Date'],
-            y=filtered_df['RSI'],
+            x=lines['RSI']['Date'],
+            y=lines['RSI']['RSI'],
             name='RSI'
         ))
         fig_rsi.add_hline(y=70, line_dash="dash", line_color="red")
@@ -291,20 +334,20 @@ if 'Bandas de Bollinger' in selected_indicators:
     with col2:
         fig_bb = go.Figure()
         fig_bb.add_trace(go.Scatter(
-            x=filtered_df['Date'],
-            y=filtered_df['BB_upper'],
+            x=lines['BB']['Date'],
+            y=lines['BB']['BB_upper'],
             name='Banda Superior',
             line=dict(color='gray', dash='dash')
         ))
         fig_bb.add_trace(go.Scatter(
-            x=filtered_df['Date'],
-            y=filtered_df['BB_middle'],
+            x=lines['BB']['Date'],
+            y=lines['BB']['BB_middle'],
             name='Media Móvil',
             line=dict(color='blue')
         ))
         fig_bb.add_trace(go.Scatter(
-            x=filtered_df['Date'],
-            y=filtered_df['BB_lower'],
+            x=lines['BB']['Date'],
+            y=lines['BB']['BB_lower'],
             name='Banda Inferior',
             line=dict(color='gray', dash='dash'),
             fill='tonexty'
@@ -316,18 +359,18 @@ if 'Volatilidad' in selected_indicators:
     with col1:
         fig_vol = go.Figure()
         fig_vol.add_trace(go.Scatter(
-            x=filtered_df['Date'],
-            y=filtered_df['Volatility_7'],
+            x=lines['Volatility_7']['Date'],
+            y=lines['Volatility_7']['Volatility_7'],
             name='Volatilidad 7d'
         ))
         fig_vol.add_trace(go.Scatter(
-            x=filtered_df['Date'],
-            y=filtered_df['Volatility_14'],
+            x=lines['Volatility_14']['Date'],
+            y=lines['Volatility_14']['Volatility_14'],
             name='Volatilidad 14d'
         ))
         fig_vol.add_trace(go.Scatter(
-            x=filtered_df['Date'],
-            y=filtered_df['Volatility_30'],
+            x=lines['Volatility_30']['Date'],
+            y=lines['Volatility_30']['Volatility_30'],
             name='Volatilidad 30d'
         ))
         fig_vol.update_layout(title='Volatilidad')
@@ -337,8 +380,8 @@ if 'Momentum' in selected_indicators:
     with col2:
         fig_mom = go.Figure()
         fig_mom.add_trace(go.Scatter(
-            x=filtered_df['Date'],
-            y=filtered_df['Momentum'],
+            x=lines['Momentum']['Date'],
+            y=lines['Momentum']['Momentum'],
             name='Momentum'
         ))
         fig_mom.update_layout(title='Momentum')
@@ -352,14 +395,16 @@ st.subheader("Comparación de Modelos de Predicción")
 if model_selector in ["ML Mejorado", "Ambos"]:
     st.markdown("### Predicción del Modelo ML Mejorado")
     try:
-        model = joblib.load(MODEL_PATH)
-        scaler = joblib.load(SCALER_PATH)
-        selector = joblib.load(SELECTOR_PATH)
-        selected_features = pd.read_csv(FEATURES_PATH)['0'].tolist()
-        metrics = pd.read_csv(METRICS_PATH)
+        # Versión vigente completa (modelo, escalador y selector siempre del mismo entrenamiento)
+        loaded = load_artifacts(MODEL_DIR)
+        model = loaded['model']
+        scaler = loaded['scaler']
+        selector = loaded['selector']
+        selected_features = loaded['features']
+        metrics = loaded['metrics']
 
         # Preprocesar la última fila igual que en el entrenamiento
-        last_data = df.copy().iloc[[-1]]
+        last_data = service.tail(1)
         all_features = [
             'High AVAL', 'Low AVAL', 'Open AVAL', 'Volume AVAL',
             'Month', 'Year', 'Quarter', 'SMA_7', 'SMA_21',
@@ -402,6 +447,12 @@ if model_selector in ["ML Mejorado", "Ambos"]:
                 f"{(prediction - last_value):.2f}"
             )
             st.write(f"**Señal:** {signal}")
+            # Intervalos conformales con los residuos ya calibrados (el modelador los actualiza)
+            intervals = conformal.ConformalIntervals(MODEL_DIR).intervals(prediction)
+            for level in conformal.LEVELS:
+                lower, upper = conformal.interval_columns(level)
+                if np.isfinite(intervals[lower]):
+                    st.write(f"**Intervalo {level * 100:g}%:** ${intervals[lower]:.2f} – ${intervals[upper]:.2f}")
         with col2:
             st.metric("RMSE del Modelo", f"{metrics['RMSE'].iloc[0]:.4f}")
         with col3:
@@ -416,12 +467,16 @@ if model_selector in ["ML Mejorado", "Ambos"]:
         else:
             st.info("El modelo no tiene coeficientes de importancia disponibles.")
 
+    except ModelNotTrainedError as e:
+        st.info(str(e))
     except Exception as e:
         st.error(f"Error al cargar el modelo mejorado: {e}")
 
 if model_selector in ["ARIMA", "Ambos"]:
     st.markdown("### Predicción y Métricas del Modelo ARIMA")
     try:
+        # Importación diferida: statsmodels solo se carga si se eligió ARIMA
+        from arima_model import ejecutar_arima_completo
         arima_result = ejecutar_arima_completo(
             ruta_archivo=HISTORICAL_PATH,
             order=(3,1,1),
@@ -468,15 +523,38 @@ if 'Señal' in filtered_df.columns:
         mime='text/csv'
     )
 
+# ======================
+# Correlación entre símbolos
+# ======================
+correlation_store = CorrelationStore()
+if os.path.exists(correlation_store.path) and os.path.exists(correlation_store.meta_path):
+    correlation_dates = correlation_store.dates()
+    if len(correlation_dates):
+        st.subheader(f"Correlación entre Símbolos ({correlation_store.window} días)")
+        selected_day = st.select_slider(
+            "Fecha de la matriz",
+            options=list(correlation_dates.date),
+            value=correlation_dates[-1].date()
+        )
+        day, corr_matrix, day_betas = load_correlation(data_version(correlation_store.path), selected_day)
+        col1, col2 = st.columns([3, 1])
+        with col1:
+            fig_corr = px.imshow(corr_matrix, text_auto='.2f', zmin=-1, zmax=1,
+                                 color_continuous_scale='RdBu', title=f"Correlación al {day.date()}")
+            st.plotly_chart(fig_corr, use_container_width=True)
+        with col2:
+            st.write(f"**Beta contra {correlation_store.meta()['referencia']}**")
+            st.dataframe(day_betas.rename('Beta').round(3))
+
 # ======================
 # Información adicional
 # ======================
 with st.expander("ℹ️ Información del Dataset"):
     st.write("Estadísticas Descriptivas:")
-    stats_df = df.drop(columns=['Date']).describe()
+    stats_df = load_stats(DATA_VERSION)
     st.dataframe(stats_df)
 
     st.write("Últimos Registros:")
-    display_df = df.copy()
+    display_df = service.tail(5)
     display_df['Date'] = display_df['Date'].dt.strftime('%Y-%m-%d')
     st.dataframe(display_df.tail())
\ No newline at end of file
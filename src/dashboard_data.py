@@ -0,0 +1,63 @@
+import os
+
+import pandas as pd
+
+from correlation import CorrelationStore, correlation_from_covariance
+from data_io import float32_dtypes
+from downsampling import choose_frequency, aggregate_ohlc, lttb_frame
+
+# Cargadores de datos del dashboard sin Streamlit: dashboard.py los envuelve en su caché por versión
+# y el benchmark los mide directamente (sin caché)
+DATA_PATH = os.path.join('src', 'static', 'data', 'enriched_historical.csv')
+
+# Columnas que consume cada sección del dashboard
+KPI_COLUMNS = ['Adj Close AVAL', 'Daily_Return', 'Volatility_7', 'SMA_21', 'Cumulative_Return', 'RSI']
+CHART_COLUMNS = [
+    'Open AVAL', 'High AVAL', 'Low AVAL', 'Close AVAL', 'Adj Close AVAL', 'Volume AVAL',
+    'SMA_21', 'SMA_50', 'SMA_100', 'SMA_200', 'SMA_Cross_5_20', 'SMA_Cross_10_50',
+    'Volume_MA_21', 'RSI', 'BB_middle', 'BB_upper', 'BB_lower',
+    'Volatility_7', 'Volatility_14', 'Volatility_30', 'Momentum'
+]
+# Presupuesto de puntos por gráfico con el que abre el dashboard
+DEFAULT_MAX_POINTS = 1500
+
+# Para graficar basta float32; los cruces son banderas 0/1
+CHART_DTYPES = {**float32_dtypes(CHART_COLUMNS), 'SMA_Cross_5_20': 'int8', 'SMA_Cross_10_50': 'int8'}
+
+def load_data(service, columns, year_range):
+    """Consulta solo las columnas y el rango de años pedidos."""
+    return service.query_years(list(columns), *year_range, dtype=float32_dtypes(KPI_COLUMNS))
+
+def load_stats(service):
+    """Estadísticas descriptivas precalculadas por versión de los datos."""
+    return service.stats()
+
+def load_correlation(date, store=None):
+    """Matriz de correlación de un día y betas contra la referencia (un solo registro del archivo mapeado)."""
+    store = store or CorrelationStore()
+    day, cov = store.matrix(date, 'covarianza')
+    benchmark = store.meta()['referencia']
+    matrix = pd.DataFrame(correlation_from_covariance(cov.to_numpy()), index=cov.index, columns=cov.columns)
+    betas = (cov[benchmark] / cov.loc[benchmark, benchmark]).drop(benchmark)
+    return day, matrix, betas
+
+def get_chart_data(service, year_range, zoom_range, max_points):
+    """Prepara los datos de los gráficos reducidos al presupuesto de puntos del rango visible."""
+    # Solo el rango visible (zoom) dentro de los años seleccionados viaja al navegador
+    zoom_start = max(pd.Timestamp(zoom_range[0]), pd.Timestamp(f"{year_range[0]}-01-01"))
+    zoom_end = min(pd.Timestamp(zoom_range[1]), pd.Timestamp(f"{year_range[1]}-12-31"))
+    visible = service.query(CHART_COLUMNS, zoom_start, zoom_end, dtype=CHART_DTYPES)
+
+    freq = choose_frequency(len(visible), zoom_start, zoom_end, max_points)
+    lines = {}
+    for col in ['SMA_21', 'SMA_50', 'SMA_100', 'SMA_200', 'Volume_MA_21', 'RSI',
+                'Volatility_7', 'Volatility_14', 'Volatility_30', 'Momentum']:
+        lines[col] = lttb_frame(visible, [col], max_points)
+    # Las bandas comparten eje x para que el relleno entre ellas sea coherente
+    lines['BB'] = lttb_frame(visible, ['BB_middle', 'BB_upper', 'BB_lower'], max_points)
+
+    return {
+        'freq': freq,
+        'bars': aggregate_ohlc(visible, freq),
+        'lines': lines
+    }
\ No newline at end of file
@@ -0,0 +1,106 @@
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+try:
+    import fcntl  # No disponible en Windows: allí solo se garantiza el rename atómico
+except ImportError:
+    fcntl = None
+
+@contextmanager
+def file_lock(path, shared=False):
+    """Bloqueo consultivo sobre path: compartido para lectores, exclusivo para escritores (archivo path.lock)."""
+    if fcntl is None:
+        yield
+        return
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(f"{path}.lock", 'a') as handle:
+        fcntl.flock(handle, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(handle, fcntl.LOCK_UN)
+
+def data_version(path):
+    """Devuelve un identificador de versión del archivo (fecha de modificación y tamaño)."""
+    stat = os.stat(path)
+    return f"{stat.st_mtime_ns}-{stat.st_size}"
+
+def fsync_path(path):
+    """Fuerza a disco un archivo o directorio."""
+    flags = os.O_RDONLY | getattr(os, 'O_DIRECTORY', 0) if os.path.isdir(path) else os.O_RDONLY
+    try:
+        fd = os.open(path, flags)
+    except OSError:
+        return  # Windows no permite abrir directorios
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+@contextmanager
+def atomic_path(path):
+    """Entrega una ruta temporal junto a path; si el bloque termina sin error, la sincroniza y la publica con os.replace."""
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(prefix=f".{os.path.basename(path)}.", suffix='.tmp', dir=directory)
+    os.close(fd)
+    try:
+        yield tmp_path
+        fsync_path(tmp_path)
+        os.replace(tmp_path, path)
+        fsync_path(directory)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def write_csv(df, path, **kwargs):
+    """Escribe el CSV completo de forma atómica (los lectores ven el archivo anterior o el nuevo, nunca uno a medias)."""
+    with atomic_path(path) as tmp_path:
+        df.to_csv(tmp_path, index=False, **kwargs)
+
+def truncate_csv(path, n_rows):
+    """Deja en el CSV el encabezado y sus primeras n_rows filas."""
+    with open(path, 'rb+') as file:
+        newlines = np.flatnonzero(np.frombuffer(file.read(), dtype=np.uint8) == ord('\n'))
+        if n_rows < len(newlines):
+            file.truncate(int(newlines[n_rows]) + 1)
+
+def append_csv(df, path, keep_rows=None):
+    """Anexa filas al CSV sobre una copia (opcionalmente truncada a keep_rows filas) y la publica de forma atómica."""
+    with atomic_path(path) as tmp_path:
+        # Copiar bytes es mucho más barato que volver a formatear el CSV completo
+        shutil.copyfile(path, tmp_path)
+        if keep_rows is not None:
+            truncate_csv(tmp_path, keep_rows)
+        df.to_csv(tmp_path, mode='a', header=False, index=False)
+
+def float32_dtypes(columns):
+    """Mapa de tipos float32 para las columnas donde la precisión lo permite."""
+    return {col: 'float32' for col in columns}
+
+def read_columns(path, columns=None, dtype=None, date_col='Date', missing='error'):
+    """Lee del CSV solo las columnas indicadas con los tipos dados (proyección en el lector).
+
+    Con missing='ignore' las columnas pedidas que el archivo no tiene se omiten en lugar de fallar.
+    """
+    usecols = None
+    with file_lock(path, shared=True):
+        if columns is not None:
+            # Conservar el orden pedido y garantizar la columna de fecha
+            usecols = list(dict.fromkeys([date_col] + list(columns)))
+            if missing == 'ignore':
+                header = set(pd.read_csv(path, nrows=0).columns)
+                usecols = [col for col in usecols if col in header]
+            if dtype is not None:
+                dtype = {col: kind for col, kind in dtype.items() if col in usecols}
+        df = pd.read_csv(path, usecols=usecols, dtype=dtype)
+    if usecols is not None:
+        df = df[usecols]
+    df[date_col] = pd.to_datetime(df[date_col])
+    return df
\ No newline at end of file
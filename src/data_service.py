@@ -0,0 +1,170 @@
+import os
+import sqlite3
+from contextlib import closing
+import pandas as pd
+
+from data_io import data_version, file_lock
+
+# Rutas por defecto del servicio de lectura
+DATA_PATH = os.path.join('src', 'static', 'data', 'enriched_historical.csv')
+DB_PATH = os.path.join('src', 'static', 'data', 'enriched_historical.sqlite')
+
+DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+# Forma de la vista publicada: al cambiarla, las bases ya publicadas se reconstruyen aunque el CSV no cambie
+VIEW_LAYOUT = 2
+
+def prepare_frame(df, date_col='Date'):
+    """Ordena por fecha, fija un DatetimeIndex y añade los agregados derivados reutilizables."""
+    df = df.dropna(subset=[date_col]).sort_values(date_col, kind='stable')
+    df.index = pd.DatetimeIndex(df[date_col])
+    df.index.name = None
+
+    # Media móvil del volumen calculada una sola vez sobre toda la historia
+    if 'Volume AVAL' in df.columns:
+        df['Volume_MA_21'] = df['Volume AVAL'].rolling(window=21).mean()
+    return df
+
+def describe_frame(df, date_col='Date'):
+    """Estadísticas descriptivas del dataset (sin la columna de fecha)."""
+    return df.drop(columns=[date_col]).describe()
+
+class DataService:
+    """Vista SQLite de solo lectura sobre los datos enriquecidos, compartida por todos los procesos del dashboard."""
+
+    def __init__(self, csv_path=DATA_PATH, db_path=DB_PATH, table='enriched'):
+        self.csv_path = csv_path
+        self.db_path = db_path
+        self.table = table
+        self._columns = None
+
+    def _connect(self):
+        """Abre una conexión de solo lectura con mmap para compartir la caché de páginas del sistema."""
+        con = sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True)
+        con.execute("PRAGMA mmap_size = 268435456")
+        return con
+
+    def version(self):
+        """Devuelve la versión de los datos publicada en la base, o None si no existe."""
+        if not os.path.exists(self.db_path):
+            return None
+        try:
+            with closing(self._connect()) as con:
+                row = con.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+            return row[0] if row else None
+        except sqlite3.Error:
+            return None
+
+    def refresh(self):
+        """Reconstruye la vista si el CSV cambió desde la última publicación. Devuelve la versión vigente."""
+        current = f"{data_version(self.csv_path)}-v{VIEW_LAYOUT}"
+        if self.version() != current:
+            self._build(current)
+            self._columns = None
+        return current
+
+    def _build(self, version):
+        """Carga el CSV en una base temporal y la publica con un rename atómico."""
+        with file_lock(self.csv_path, shared=True):
+            df = pd.read_csv(self.csv_path)
+        df['Date'] = pd.to_datetime(df['Date'], errors='coerce')
+        df = prepare_frame(df)
+        stats = describe_frame(df)
+
+        stored = df.reset_index(drop=True)
+        # Filas insertadas en orden de fecha: el rowid (1..n) es la posición y cada año es un tramo contiguo
+        years = stored['Date'].dt.year
+        offsets = pd.DataFrame({
+            'year': years.unique(),
+            'first_row': years.searchsorted(years.unique(), side='left') + 1,
+            'last_row': years.searchsorted(years.unique(), side='right')
+        })
+        stored['Date'] = stored['Date'].dt.strftime(DATE_FORMAT)
+
+        # Cada proceso construye su propio temporal; el último rename gana y los lectores nunca ven una base a medias
+        tmp_path = f"{self.db_path}.{os.getpid()}.tmp"
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        con = sqlite3.connect(tmp_path)
+        try:
+            stored.to_sql(self.table, con, index=False)
+            con.execute(f'CREATE UNIQUE INDEX idx_{self.table}_date ON {self.table} ("Date")')
+            con.execute("CREATE TABLE years (year INTEGER PRIMARY KEY, first_row INTEGER NOT NULL, last_row INTEGER NOT NULL)")
+            con.executemany("INSERT INTO years VALUES (?, ?, ?)", offsets.astype('int64').itertuples(index=False))
+            stats.to_sql('stats', con, index=True, index_label='stat')
+            con.execute("CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT)")
+            con.execute("INSERT INTO meta VALUES ('version', ?)", (version,))
+            con.commit()
+        finally:
+            con.close()
+        os.replace(tmp_path, self.db_path)
+
+    def columns(self):
+        """Lista las columnas disponibles en la vista."""
+        if self._columns is None:
+            with closing(self._connect()) as con:
+                info = con.execute(f'PRAGMA table_info({self.table})').fetchall()
+            self._columns = [row[1] for row in info]
+        return self._columns
+
+    def _select(self, columns):
+        """Construye la lista SELECT asegurando que la fecha siempre esté incluida."""
+        columns = [col for col in (columns or self.columns()) if col != 'Date']
+        return ['Date'] + columns, ', '.join(f'"{col}"' for col in ['Date'] + columns)
+
+    def _read(self, sql, params, columns, dtype=None):
+        """Ejecuta la consulta y devuelve un DataFrame con la fecha parseada y los tipos pedidos."""
+        with closing(self._connect()) as con:
+            df = pd.read_sql_query(sql, con, params=params)
+        df.columns = columns
+        df['Date'] = pd.to_datetime(df['Date'], format=DATE_FORMAT)
+        if dtype:
+            df = df.astype({col: kind for col, kind in dtype.items() if col in df.columns})
+        return df
+
+    def query(self, columns=None, start=None, end=None, dtype=None):
+        """Devuelve solo las columnas pedidas en el rango de fechas [start, end] (fin de día incluido)."""
+        columns, select = self._select(columns)
+        clauses, params = [], []
+        if start is not None:
+            clauses.append('"Date" >= ?')
+            params.append(pd.Timestamp(start).normalize().strftime(DATE_FORMAT))
+        if end is not None:
+            clauses.append('"Date" < ?')
+            params.append((pd.Timestamp(end).normalize() + pd.Timedelta(days=1)).strftime(DATE_FORMAT))
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+        return self._read(f'SELECT {select} FROM {self.table} {where} ORDER BY "Date"', params, columns, dtype)
+
+    def query_years(self, columns, start_year, end_year, dtype=None):
+        """Devuelve las columnas pedidas para los años [start_year, end_year].
+
+        Los límites de cada año se precalculan al publicar (tabla years): el filtro es un tramo de rowid
+        contiguo, sin comparar fechas fila por fila.
+        """
+        columns, select = self._select(columns)
+        with closing(self._connect()) as con:
+            first, last = con.execute(
+                "SELECT MIN(first_row), MAX(last_row) FROM years WHERE year BETWEEN ? AND ?",
+                (int(start_year), int(end_year))
+            ).fetchone()
+        if first is None:
+            return self._read(f'SELECT {select} FROM {self.table} WHERE 0', [], columns, dtype)
+        return self._read(f'SELECT {select} FROM {self.table} WHERE rowid BETWEEN ? AND ? ORDER BY rowid',
+                          [first, last], columns, dtype)
+
+    def tail(self, n=1, columns=None):
+        """Devuelve las últimas n filas ordenadas por fecha."""
+        columns, select = self._select(columns)
+        df = self._read(f'SELECT {select} FROM {self.table} ORDER BY "Date" DESC LIMIT ?', [int(n)], columns)
+        return df.iloc[::-1].reset_index(drop=True)
+
+    def year_bounds(self):
+        """Devuelve el primer y el último año disponibles."""
+        with closing(self._connect()) as con:
+            first, last = con.execute('SELECT MIN(year), MAX(year) FROM years').fetchone()
+        return int(first), int(last)
+
+    def stats(self):
+        """Devuelve las estadísticas descriptivas precalculadas al publicar la versión."""
+        with closing(self._connect()) as con:
+            return pd.read_sql_query('SELECT * FROM stats', con, index_col='stat').rename_axis(None)
\ No newline at end of file
@@ -0,0 +1,89 @@
+import numpy as np
+import pandas as pd
+
+# Reglas de agregación para convertir barras diarias en barras más gruesas
+OHLC_AGGREGATION = {
+    'Open AVAL': 'first',
+    'High AVAL': 'max',
+    'Low AVAL': 'min',
+    'Close AVAL': 'last',
+    'Adj Close AVAL': 'last',
+    'Volume AVAL': 'sum'
+}
+
+# Frecuencias candidatas de la más fina a la más gruesa (alias de pandas, días aproximados por barra)
+FREQUENCIES = [
+    ('W-FRI', 7),
+    ('ME', 30),
+    ('QE', 91),
+    ('YE', 365)
+]
+
+def choose_frequency(n_rows, start, end, max_points):
+    """Elige la frecuencia de agregación OHLC según el rango visible y el presupuesto de puntos."""
+    if n_rows <= max_points:
+        return None  # Resolución completa
+    span_days = max((pd.Timestamp(end) - pd.Timestamp(start)).days, 1)
+    for freq, days in FREQUENCIES:
+        if span_days / days <= max_points:
+            return freq
+    return FREQUENCIES[-1][0]
+
+def aggregate_ohlc(df, freq, date_col='Date'):
+    """Agrega las barras a la frecuencia indicada (open primero, high máx, low mín, close último, volumen suma)."""
+    if freq is None:
+        return df
+    rules = {col: how for col, how in OHLC_AGGREGATION.items() if col in df.columns}
+    # El resto de columnas numéricas conserva el último valor del periodo
+    for col in df.columns:
+        if col != date_col and col not in rules and pd.api.types.is_numeric_dtype(df[col]):
+            rules[col] = 'last'
+    aggregated = df.set_index(date_col).resample(freq).agg(rules)
+    aggregated = aggregated.dropna(subset=[c for c in ('Open AVAL', 'Close AVAL') if c in aggregated.columns], how='all')
+    return aggregated.reset_index()
+
+def lttb_indices(x, y, n_out):
+    """Devuelve los índices seleccionados por Largest-Triangle-Three-Buckets."""
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    # n_out - 2 buckets para los puntos interiores; el primero y el último siempre se conservan
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+
+    a = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        # Punto promedio del siguiente bucket (o el último punto)
+        if i + 2 < len(edges):
+            next_start, next_end = edges[i + 1], edges[i + 2]
+        else:
+            next_start, next_end = n - 1, n
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+
+        # Área del triángulo formado con el punto anterior y el promedio siguiente
+        area = np.abs(
+            (x[a] - avg_x) * (y[start:end] - y[a])
+            - (x[a] - x[start:end]) * (avg_y - y[a])
+        )
+        a = start + int(np.argmax(area))
+        selected[i + 1] = a
+    return selected
+
+def lttb_frame(df, columns, n_out, key=None, date_col='Date'):
+    """Reduce el DataFrame a n_out filas elegidas por LTTB sobre la columna clave."""
+    columns = list(columns)
+    key = key or columns[0]
+
+    # Los NaN (p.ej. el arranque de las medias móviles) no participan en el cálculo
+    subset = df.loc[df[key].notna(), [date_col] + columns]
+    if len(subset) <= n_out:
+        return subset
+
+    x = subset[date_col].to_numpy().astype('datetime64[ns]').astype(np.int64).astype(np.float64)
+    y = subset[key].to_numpy(dtype=np.float64)
+    return subset.iloc[lttb_indices(x, y, n_out)]
\ No newline at end of file
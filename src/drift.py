@@ -0,0 +1,214 @@
+import argparse
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+import artifacts
+from data_io import atomic_path, file_lock, read_columns
+
+MODEL_DIR = os.path.join('src', 'static', 'models')
+DATA_PATH = os.path.join('src', 'static', 'data', 'enriched_historical.csv')
+STATE_FILE = 'drift_state.json'
+
+# La referencia son las últimas filas vistas al entrenar y se compara con una ventana igual de larga de las
+# filas más recientes: las series con tendencia (precios, medias) no son iid y una ventana corta frente a una
+# referencia larga parecería derivar siempre
+WINDOW_ROWS = 60
+BINS = 10
+
+# Umbrales de la decisión: PSI habitual de cambio importante, distancia KS y antigüedad máxima del modelo
+PSI_THRESHOLD = 0.25
+KS_THRESHOLD = 0.3
+MAX_AGE_DAYS = 30
+# Una sola característica que deriva (p.ej. el volumen) no justifica por sí sola un reentrenamiento
+MIN_DRIFTED_FEATURES = 3
+
+# Las variables de calendario son deterministas: su "deriva" no dice nada de los datos
+CALENDAR_FEATURES = [
+    'Month', 'Year', 'Quarter', 'Day_of_Week_Num',
+    'Month_Sin', 'Month_Cos', 'Day_of_Week_Sin', 'Day_of_Week_Cos'
+]
+
+def welford_merge(stats, values):
+    """Combina (n, media, M2) con un lote de valores (fórmula de Chan, estable sin guardar los datos)."""
+    values = np.asarray(values, dtype='float64')
+    values = values[~np.isnan(values)]
+    if not len(values):
+        return stats
+    n_a, mean_a, m2_a = stats
+    n_b, mean_b = len(values), values.mean()
+    m2_b = ((values - mean_b) ** 2).sum()
+    n = n_a + n_b
+    delta = mean_b - mean_a
+    return [n, mean_a + delta * n_b / n, m2_a + m2_b + delta ** 2 * n_a * n_b / n]
+
+def histogram(values, edges):
+    """Conteos por bin con bordes internos edges (los extremos quedan abiertos)."""
+    values = np.asarray(values, dtype='float64')
+    values = values[~np.isnan(values)]
+    return np.bincount(np.searchsorted(edges, values, side='right'), minlength=len(edges) + 1)
+
+def psi(expected, actual, eps=1e-4):
+    """Índice de estabilidad poblacional entre dos histogramas con los mismos bins."""
+    p = np.maximum(expected / max(expected.sum(), 1), eps)
+    q = np.maximum(actual / max(actual.sum(), 1), eps)
+    return float(((q - p) * np.log(q / p)).sum())
+
+def ks_statistic(expected, actual):
+    """KS aproximado sobre los bordes de los bins: máxima distancia entre las distribuciones acumuladas."""
+    p = np.cumsum(expected) / max(expected.sum(), 1)
+    q = np.cumsum(actual) / max(actual.sum(), 1)
+    return float(np.abs(p - q).max())
+
+def reference_profile(df, features, date_col='Date', rows=WINDOW_ROWS, bins=BINS):
+    """Perfil de referencia de las últimas filas vistas al entrenar: Welford y bordes por cuantiles con sus conteos."""
+    recent = df.tail(rows)
+    profile = {'hasta': str(pd.Timestamp(df[date_col].iloc[-1])), 'caracteristicas': {}}
+    for feature in features:
+        if feature in CALENDAR_FEATURES or feature not in recent.columns:
+            continue
+        values = recent[feature].to_numpy(dtype='float64')
+        edges = np.unique(np.nanquantile(values, np.linspace(0, 1, bins + 1)[1:-1]))
+        profile['caracteristicas'][feature] = {
+            'welford': welford_merge([0, 0.0, 0.0], values),
+            'bordes': edges.tolist(),
+            'conteos': histogram(values, edges).tolist()
+        }
+    return profile
+
+def save_reference(profile, path):
+    with atomic_path(path) as tmp_path:
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            json.dump(profile, file)
+
+class DriftMonitor:
+    """Estadísticas por característica de las filas llegadas desde el último entrenamiento, comparadas con su referencia.
+
+    El estado (Welford y histograma acumulados, más la ventana de las últimas filas) se guarda junto a los modelos
+    y cada actualización solo procesa las filas posteriores a la última vista.
+    """
+
+    def __init__(self, model_dir=MODEL_DIR, data_path=DATA_PATH, window=WINDOW_ROWS):
+        self.model_dir = model_dir
+        self.data_path = data_path
+        self.window = window
+        self.state_path = os.path.join(model_dir, STATE_FILE)
+        self.version = artifacts.current_version(model_dir)
+        self.reference = None
+        reference_path = artifacts.artifact_paths(model_dir, self.version)['reference']
+        if os.path.exists(reference_path):
+            with open(reference_path, encoding='utf-8') as file:
+                self.reference = json.load(file)
+        self.state = self._load_state()
+
+    def _load_state(self):
+        if self.reference is None:
+            return None
+        if os.path.exists(self.state_path):
+            with open(self.state_path, encoding='utf-8') as file:
+                state = json.load(file)
+            # El estado corresponde a la referencia de un entrenamiento; uno nuevo lo reinicia
+            if state.get('version') == self.version:
+                return state
+        return {
+            'version': self.version,
+            'ultima_fecha': None,
+            'filas_nuevas': 0,
+            'caracteristicas': {
+                feature: {'welford': [0, 0.0, 0.0], 'conteos': [0] * len(info['conteos']), 'ventana': []}
+                for feature, info in self.reference['caracteristicas'].items()
+            }
+        }
+
+    def update(self, df=None):
+        """Incorpora las filas posteriores a la última vista. Devuelve cuántas filas nuevas procesó."""
+        if self.state is None:
+            return 0
+        features = list(self.state['caracteristicas'])
+        if df is None:
+            df = read_columns(self.data_path, columns=features)
+        df = df.dropna(subset=features)
+        dates = pd.to_datetime(df['Date'])
+
+        if self.state['ultima_fecha'] is None:
+            # Primera actualización: la ventana arranca con las últimas filas del entrenamiento
+            seen = dates <= pd.Timestamp(self.reference['hasta'])
+            for feature in features:
+                self.state['caracteristicas'][feature]['ventana'] = df.loc[seen, feature].tail(self.window).tolist()
+            self.state['ultima_fecha'] = self.reference['hasta']
+
+        new = df[dates > pd.Timestamp(self.state['ultima_fecha'])]
+        if len(new):
+            for feature in features:
+                entry = self.state['caracteristicas'][feature]
+                values = new[feature].to_numpy(dtype='float64')
+                edges = np.asarray(self.reference['caracteristicas'][feature]['bordes'])
+                entry['welford'] = welford_merge(entry['welford'], values)
+                entry['conteos'] = (np.asarray(entry['conteos']) + histogram(values, edges)).tolist()
+                entry['ventana'] = (entry['ventana'] + values.tolist())[-self.window:]
+            self.state['ultima_fecha'] = str(pd.Timestamp(new['Date'].iloc[-1]))
+            self.state['filas_nuevas'] += len(new)
+
+        with file_lock(self.state_path):
+            with atomic_path(self.state_path) as tmp_path:
+                with open(tmp_path, 'w', encoding='utf-8') as file:
+                    json.dump(self.state, file)
+        return len(new)
+
+    def scores(self):
+        """PSI y KS de la ventana reciente y desplazamiento de la media de las filas nuevas, por característica."""
+        rows = []
+        for feature, entry in self.state['caracteristicas'].items():
+            info = self.reference['caracteristicas'][feature]
+            reference_counts = np.asarray(info['conteos'])
+            window_counts = histogram(entry['ventana'], np.asarray(info['bordes']))
+            n_ref, mean_ref, m2_ref = info['welford']
+            n_new, mean_new, _ = entry['welford']
+            std_ref = np.sqrt(m2_ref / (n_ref - 1)) if n_ref > 1 else np.nan
+            rows.append({
+                'Característica': feature,
+                'PSI': psi(reference_counts, window_counts),
+                'KS': ks_statistic(reference_counts, window_counts),
+                'Desplazamiento (σ)': abs(mean_new - mean_ref) / std_ref if n_new and std_ref > 0 else np.nan
+            })
+        scores = pd.DataFrame(rows)
+        scores['Deriva'] = (scores['PSI'] > PSI_THRESHOLD) & (scores['KS'] > KS_THRESHOLD)
+        return scores.sort_values('PSI', ascending=False, ignore_index=True)
+
+    def decision(self, max_age_days=MAX_AGE_DAYS):
+        """Decide si conviene reentrenar; devuelve {'reentrenar', 'motivo', 'puntajes'}."""
+        if self.reference is None:
+            return {'reentrenar': True, 'motivo': "no hay referencia de entrenamiento", 'puntajes': None}
+        scores = self.scores()
+        if not self.state['filas_nuevas']:
+            return {'reentrenar': False, 'motivo': "no hay filas nuevas desde el entrenamiento", 'puntajes': scores}
+        drifted = scores.loc[scores['Deriva'], 'Característica'].tolist()
+        if len(drifted) >= MIN_DRIFTED_FEATURES:
+            return {'reentrenar': True, 'motivo': f"deriva en {len(drifted)} características: {', '.join(drifted)}",
+                    'puntajes': scores}
+        age = (pd.Timestamp(self.state['ultima_fecha']) - pd.Timestamp(self.reference['hasta'])).days
+        if age > max_age_days:
+            return {'reentrenar': True, 'motivo': f"el modelo tiene {age} días de datos sin reentrenar",
+                    'puntajes': scores}
+        return {'reentrenar': False, 'motivo': "sin deriva significativa", 'puntajes': scores}
+
+def check(model_dir=MODEL_DIR, data_path=DATA_PATH, df=None):
+    """Actualiza el monitor con las filas nuevas y devuelve la decisión."""
+    monitor = DriftMonitor(model_dir, data_path)
+    monitor.update(df)
+    return monitor.decision()
+
+def main():
+    parser = argparse.ArgumentParser(description="Monitor de deriva de las características frente a la referencia del entrenamiento")
+    parser.add_argument('--top', type=int, default=10, help="Características a mostrar")
+    args = parser.parse_args()
+
+    result = check()
+    print(f"Reentrenar: {'sí' if result['reentrenar'] else 'no'} ({result['motivo']})")
+    if result['puntajes'] is not None:
+        print(result['puntajes'].head(args.top).round(4).to_string(index=False))
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
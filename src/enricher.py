@@ -1,15 +1,120 @@
 import pandas as pd
 import numpy as np
 from datetime import datetime
+import argparse
 import os
+import tempfile
+from profiling import profiler
+from adjustments import RECOMPUTE_PATH, pending_ranges, clear_ranges
+from data_io import data_version, file_lock, write_csv, append_csv
+
+# Orden natural de los días para la representación categórica
+DAY_NAMES = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+# Tipos compactos para los campos de calendario y las banderas de cruce
+COMPACT_DTYPES = {
+    'Month': 'int8',
+    'Quarter': 'int8',
+    'Year': 'int16',
+    'Day_of_Week_Num': 'int8',
+    'SMA_Cross_5_20': 'uint8',
+    'SMA_Cross_10_50': 'uint8'
+}
+
+# Precios crudos que se conservan en float64 aunque se pidan indicadores float32
+RAW_PRICE_COLUMNS = ['Adj Close AVAL', 'Close AVAL', 'High AVAL', 'Low AVAL', 'Open AVAL']
+
+# Filas previas que necesita la ventana más larga (SMA_200) para recalcular un tramo
+WARMUP_ROWS = 200
+
+# Indicadores proporcionales al nivel de precio: al reescalar la serie se reescalan por el mismo factor.
+# El resto (retornos, RSI, ROC, razones) no cambia con un reescalado.
+ADJ_LEVEL_COLUMNS = ['SMA_7', 'SMA_21', 'Volatility_7', 'Momentum', 'BB_middle', 'BB_upper', 'BB_lower']
+CLOSE_LEVEL_COLUMNS = ['SMA_50', 'SMA_100', 'SMA_200', 'Volatility_14', 'Volatility_30', 'EMA_5', 'EMA_10', 'EMA_20']
+EMA_SPANS = [5, 10, 20]
+
+def add_derived_features(df):
+    """Añade las características que se calculan fila a fila a partir de otros indicadores."""
+    # Características de divergencia
+    df['SMA_EMA_5_Diff'] = df['SMA_7'] - df['EMA_5']
+    df['SMA_EMA_10_Diff'] = df['SMA_21'] - df['EMA_10']
+
+    # Cruces de medias móviles (ahora sí existen las EMAs y SMAs)
+    df['SMA_Cross_5_20'] = (df['EMA_5'] > df['EMA_20']).astype(int)
+    df['SMA_Cross_10_50'] = (df['EMA_10'] > df['SMA_50']).astype(int)
+
+    # Volatilidad relativa (ahora sí existen las volatilidades)
+    df['Volatility_Ratio_7_30'] = df['Volatility_7'] / df['Volatility_30']
+
+def compact_frame(df, float32_indicators=False):
+    """Devuelve una copia del DataFrame enriquecido con tipos compactos en memoria."""
+    df = df.copy()
+    if 'Day_of_Week' in df.columns:
+        df['Day_of_Week'] = pd.Categorical(df['Day_of_Week'], categories=DAY_NAMES, ordered=True)
+    for col, kind in COMPACT_DTYPES.items():
+        if col in df.columns and df[col].notna().all():
+            df[col] = df[col].astype(kind)
+
+    if float32_indicators:
+        indicators = [
+            col for col in df.columns
+            if df[col].dtype == 'float64' and col not in RAW_PRICE_COLUMNS
+        ]
+        df[indicators] = df[indicators].astype('float32')
+    return df
+
+def memory_report(before, after):
+    """Mide los bytes por fila antes y después de compactar."""
+    rows = max(len(before), 1)
+    before_bytes = int(before.memory_usage(deep=True).sum())
+    after_bytes = int(after.memory_usage(deep=True).sum())
+    return {
+        'filas': len(before),
+        'bytes_por_fila_antes': before_bytes / rows,
+        'bytes_por_fila_despues': after_bytes / rows,
+        'reduccion_pct': (1 - after_bytes / before_bytes) * 100 if before_bytes else 0.0
+    }
+
+def verify_compaction(full_df, compact_df, tolerance=1e-3):
+    """Entrena el modelo con ambos DataFrames y comprueba que las métricas coinciden dentro de la tolerancia relativa."""
+    from modeller import StockPredictor  # Importación diferida: sklearn solo hace falta al verificar
+
+    results = {}
+    for label, frame in [('completo', full_df), ('compacto', compact_df)]:
+        with tempfile.TemporaryDirectory() as model_dir:
+            predictor = StockPredictor('enriched_historical.csv', df=frame)
+            results[label] = predictor.train(model_dir=model_dir)
+
+    diffs = {
+        name: abs(results['compacto'][name] - value) / max(abs(value), 1e-12)
+        for name, value in results['completo'].items()
+    }
+    return {
+        'metricas': results,
+        'diferencia_relativa': diffs,
+        'dentro_de_tolerancia': all(diff <= tolerance for diff in diffs.values())
+    }
 
 class DataEnricher:
-    def __init__(self, input_file):
+    def __init__(self, input_file, df=None):
         # Definir rutas relativas
         self.input_path = os.path.join('src', 'static', 'data', input_file)
-        self.df = pd.read_csv(self.input_path)
+        self.input_version = None
+        if df is not None:
+            # Tramo ya cargado (p.ej. al recalcular solo el final del histórico)
+            self.df = df.copy()
+            self.df['Date'] = pd.to_datetime(self.df['Date'])
+        else:
+            self._read_input()
+
+    def _read_input(self):
+        """Lee el histórico con bloqueo compartido y recuerda su versión."""
+        with file_lock(self.input_path, shared=True):
+            self.df = pd.read_csv(self.input_path)
+            self.input_version = data_version(self.input_path)
         self.df['Date'] = pd.to_datetime(self.df['Date'])
 
+    @profiler.profile('enricher.add_temporal_features')
     def add_temporal_features(self):
         """Añade características temporales"""
         self.df['Day_of_Week'] = self.df['Date'].dt.day_name()
@@ -17,6 +122,7 @@ class DataEnricher:
         self.df['Year'] = self.df['Date'].dt.year
         self.df['Quarter'] = self.df['Date'].dt.quarter
 
+    @profiler.profile('enricher.add_technical_indicators')
     def add_technical_indicators(self):
         """Añade indicadores técnicos"""
         # Medias móviles
@@ -49,6 +155,7 @@ class DataEnricher:
         self.df['BB_upper'] = self.df['BB_middle'] + (std_dev * 2)
         self.df['BB_lower'] = self.df['BB_middle'] - (std_dev * 2)
 
+    @profiler.profile('enricher.add_advanced_features')
     def add_advanced_features(self):
         """Añade características avanzadas para mejorar el modelo"""
         # Características cíclicas para variables temporales
@@ -82,37 +189,138 @@ class DataEnricher:
         self.df['EMA_10'] = self.df['Close AVAL'].ewm(span=10, adjust=False).mean()
         self.df['EMA_20'] = self.df['Close AVAL'].ewm(span=20, adjust=False).mean()
 
-        # Características de divergencia
-        self.df['SMA_EMA_5_Diff'] = self.df['SMA_7'] - self.df['EMA_5']
-        self.df['SMA_EMA_10_Diff'] = self.df['SMA_21'] - self.df['EMA_10']
+        # Divergencias, cruces y volatilidad relativa
+        add_derived_features(self.df)
+
+    def _incremental_frame(self, output_path, ranges):
+        """Reutiliza el resultado anterior: reescala lo previo a los rangos marcados y recalcula solo el final.
+
+        Devuelve (DataFrame completo, primera fila recalculada, si se reescaló el tramo conservado),
+        o None si el resultado anterior no sirve de base (se hace entonces el cálculo completo).
+        """
+        if not os.path.exists(output_path):
+            return None
+        previous = pd.read_csv(output_path)
+        previous['Date'] = pd.to_datetime(previous['Date'])
+        dates = self.df['Date'].to_numpy()
+
+        # Primera fila a recalcular: la primera nueva o la primera marcada por el colector
+        start = len(previous)
+        for entry in ranges:
+            start = min(start, int(np.searchsorted(dates, np.datetime64(entry['desde']), side='left')))
+        if (start <= WARMUP_ROWS or len(previous) > len(self.df)
+                or not np.array_equal(previous['Date'].to_numpy()[:start], dates[:start])):
+            return None
 
-        # Cruces de medias móviles (ahora sí existen las EMAs y SMAs)
-        self.df['SMA_Cross_5_20'] = (self.df['EMA_5'] > self.df['EMA_20']).astype(int)
-        self.df['SMA_Cross_10_50'] = (self.df['EMA_10'] > self.df['SMA_50']).astype(int)
+        # Tramo conservado: precios del histórico actual e indicadores reescalados por cada ajuste
+        prefix = previous.iloc[:start].copy()
+        for col in self.df.columns:
+            if col != 'Date' and col in prefix.columns:
+                prefix[col] = self.df[col].iloc[:start].to_numpy()
+        prefix_dates = prefix['Date'].to_numpy()
+        rescaled = False
+        for entry in ranges:
+            if not entry.get('factores'):
+                continue
+            rescaled = True
+            rows = int(np.searchsorted(prefix_dates, np.datetime64(entry['desde']), side='left'))
+            for columns, factor in [(ADJ_LEVEL_COLUMNS, entry['factores']['ajustado']),
+                                    (CLOSE_LEVEL_COLUMNS, entry['factores']['precio'])]:
+                values = prefix[columns].to_numpy(copy=True)
+                values[:rows] *= factor
+                prefix[columns] = values
+        add_derived_features(prefix)
 
-        # Volatilidad relativa (ahora sí existen las volatilidades)
-        self.df['Volatility_Ratio_7_30'] = self.df['Volatility_7'] / self.df['Volatility_30']
+        # Tramo recalculado, con WARMUP_ROWS filas previas para completar las ventanas
+        tail_enricher = DataEnricher(os.path.basename(self.input_path), df=self.df.iloc[start - WARMUP_ROWS:].reset_index(drop=True))
+        tail_enricher.add_temporal_features()
+        tail_enricher.add_technical_indicators()
+        tail_enricher.add_advanced_features()
+        tail = tail_enricher.df.iloc[WARMUP_ROWS:].reset_index(drop=True)
 
-    def enrich_data(self, output_file):
-        """Ejecuta todo el proceso de enriquecimiento"""
-        self.add_temporal_features()
-        self.add_technical_indicators()
-        self.add_advanced_features()
+        # Indicadores recursivos: continuar desde el último valor conservado
+        last = prefix.iloc[-1]
+        for span in EMA_SPANS:
+            seeded = pd.concat([pd.Series([last[f'EMA_{span}']]), tail['Close AVAL']], ignore_index=True)
+            tail[f'EMA_{span}'] = seeded.ewm(span=span, adjust=False).mean().iloc[1:].to_numpy()
+        seeded = pd.concat([pd.Series([last['Cumulative_Return']]), 1 + tail['Daily_Return']], ignore_index=True)
+        tail['Cumulative_Return'] = seeded.cumprod().iloc[1:].to_numpy()
+        add_derived_features(tail)
 
+        return pd.concat([prefix, tail[prefix.columns]], ignore_index=True), start, rescaled
+
+    @profiler.profile('enricher.enrich_data')
+    def enrich_data(self, output_file, compact=False, float32_indicators=False, incremental=False,
+                    ranges_path=RECOMPUTE_PATH):
+        """Ejecuta todo el proceso de enriquecimiento (o solo el tramo afectado si incremental=True)"""
         # Crear el directorio si no existe
         output_dir = os.path.join('src', 'static', 'data')
         os.makedirs(output_dir, exist_ok=True)
-
-        # Guarda los datos enriquecidos
         output_path = os.path.join(output_dir, output_file)
-        self.df.to_csv(output_path, index=False)
+
+        # Con el histórico bloqueado (compartido) el colector no puede cambiarlo ni agregar rangos:
+        # el histórico leído y los rangos pendientes corresponden a la misma versión
+        with file_lock(self.input_path, shared=True), file_lock(output_path):
+            if self.input_version is not None and data_version(self.input_path) != self.input_version:
+                self._read_input()
+
+            result = None
+            if incremental:
+                with profiler.stage('incremental'):
+                    result = self._incremental_frame(output_path, pending_ranges(ranges_path))
+            self.incremental = result is not None
+            if result is not None:
+                self.df, start, rescaled = result
+            else:
+                self.add_temporal_features()
+                self.add_technical_indicators()
+                self.add_advanced_features()
+
+            # Guarda los datos enriquecidos; escribir el CSV es lo más costoso, así que si el tramo
+            # conservado no cambió solo se anexa lo recalculado a una copia truncada en esa fila
+            with profiler.stage('write_csv'):
+                if result is not None and not rescaled:
+                    append_csv(self.df.iloc[start:], output_path, keep_rows=start)
+                else:
+                    write_csv(self.df, output_path)
+            # Los rangos marcados por el colector ya quedaron recalculados
+            clear_ranges(ranges_path)
+
+        # Compactar la copia en memoria (el CSV conserva la precisión completa)
+        if compact:
+            compacted = compact_frame(self.df, float32_indicators=float32_indicators)
+            self.memory_report = memory_report(self.df, compacted)
+            self.df = compacted
         return self.df
 
 def main():
+    parser = argparse.ArgumentParser(description="Enriquece los datos históricos con indicadores técnicos")
+    parser.add_argument('--compactar', action='store_true', help="Compacta los tipos en memoria tras enriquecer")
+    parser.add_argument('--float32', action='store_true', help="Usa float32 para los indicadores al compactar")
+    parser.add_argument('--verificar', action='store_true', help="Comprueba que las métricas del modelo no cambian al compactar")
+    parser.add_argument('--completo', action='store_true', help="Recalcula todo el histórico en lugar de solo el tramo nuevo o ajustado")
+    args = parser.parse_args()
+
     try:
         # Ejecutar el enriquecimiento
         enricher = DataEnricher('historical.csv')
-        enriched_df = enricher.enrich_data('enriched_historical.csv')
+        enriched_df = enricher.enrich_data('enriched_historical.csv', incremental=not args.completo)
+        print("Enriquecimiento incremental (solo el tramo nuevo o ajustado)." if enricher.incremental
+              else "Enriquecimiento completo.")
+
+        if args.compactar or args.verificar:
+            compacted = compact_frame(enriched_df, float32_indicators=args.float32)
+            report = memory_report(enriched_df, compacted)
+            print("\nMemoria del dataset enriquecido:")
+            print(f"Bytes por fila antes: {report['bytes_por_fila_antes']:.1f}")
+            print(f"Bytes por fila después: {report['bytes_por_fila_despues']:.1f}")
+            print(f"Reducción: {report['reduccion_pct']:.1f}%")
+
+            if args.verificar:
+                check = verify_compaction(enriched_df, compacted)
+                for name, diff in check['diferencia_relativa'].items():
+                    print(f"Diferencia relativa {name}: {diff:.2e}")
+                print("Métricas dentro de tolerancia" if check['dentro_de_tolerancia'] else "Métricas FUERA de tolerancia")
 
         # Mostrar las nuevas columnas y primeras filas
         print("\nColumnas en el dataset enriquecido:")
@@ -130,5 +338,8 @@ def main():
     except Exception as e:
         print(f"\nError durante el proceso de enriquecimiento: {e}")
 
+    finally:
+        profiler.write('enricher')
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,96 @@
+import numpy as np
+import pandas as pd
+
+# Tolerancia relativa para considerar revisado un valor ya guardado (el CSV conserva la precisión completa)
+REVISION_RTOL = 1e-9
+
+def sort_by_date(df, date_col):
+    """Ordena por fecha solo si hace falta y deja una fila por fecha (la última recibida)."""
+    if not df[date_col].is_monotonic_increasing:
+        df = df.sort_values(date_col, kind='stable')
+    if df[date_col].duplicated().any():
+        df = df.drop_duplicates(subset=date_col, keep='last')
+    return df.reset_index(drop=True)
+
+def changed_rows(old_values, new_values, rtol=REVISION_RTOL):
+    """Máscara de filas con algún valor distinto entre dos bloques alineados (NaN == NaN)."""
+    changed = np.zeros(len(old_values), dtype=bool)
+    for col in new_values.columns:
+        old_col = old_values[col].to_numpy()
+        new_col = new_values[col].to_numpy()
+        if np.issubdtype(old_col.dtype, np.number) and np.issubdtype(new_col.dtype, np.number):
+            changed |= ~np.isclose(old_col.astype('float64'), new_col.astype('float64'), rtol=rtol, atol=0.0, equal_nan=True)
+        else:
+            changed |= ~(pd.isna(old_col) & pd.isna(new_col)) & (old_col != new_col)
+    return changed
+
+def upsert_sorted(old_df, new_df, date_col='Date', rtol=REVISION_RTOL):
+    """Fusiona dos historias ordenadas por fecha: reemplaza las filas revisadas y agrega las nuevas.
+
+    Devuelve la historia fusionada y un resumen: filas revisadas, agregadas, si basta con anexar
+    las nuevas al archivo y la primera fecha cuyo valor guardado cambió (None si ninguna).
+    """
+    old_df = sort_by_date(old_df, date_col)
+    new_df = sort_by_date(new_df, date_col)
+
+    # Columnas del histórico primero; las que traiga de nuevo la descarga, al final
+    columns = list(old_df.columns) + [col for col in new_df.columns if col not in old_df.columns]
+    old_df = old_df.reindex(columns=columns)
+    new_df = new_df.reindex(columns=columns)
+
+    summary = {'revised': 0, 'added': 0, 'append_only': True, 'changed_from': None}
+    if len(new_df) == 0:
+        return old_df, summary
+    if len(old_df) == 0:
+        summary.update(added=len(new_df), append_only=False)
+        return new_df, summary
+
+    old_dates = old_df[date_col].to_numpy()
+    new_dates = new_df[date_col].to_numpy()
+
+    # Búsqueda binaria: inicio del solapamiento en el histórico y filas estrictamente más nuevas
+    start = int(np.searchsorted(old_dates, new_dates[0], side='left'))
+    newer_from = int(np.searchsorted(new_dates, old_dates[-1], side='right'))
+    overlap = new_df.iloc[:newer_from]
+    newer = new_df.iloc[newer_from:]
+
+    tail = old_df.iloc[start:].reset_index(drop=True)
+    positions = np.searchsorted(tail[date_col].to_numpy(), overlap[date_col].to_numpy(), side='left')
+    inside = positions < len(tail)
+    matched = np.zeros(len(overlap), dtype=bool)
+    matched[inside] = tail[date_col].to_numpy()[positions[inside]] == overlap[date_col].to_numpy()[inside]
+
+    # Filas del solapamiento con la misma fecha: reemplazar solo las que cambiaron
+    changed_dates = []
+    if matched.any():
+        rows = positions[matched]
+        old_rows = tail.iloc[rows].reset_index(drop=True)
+        new_rows = overlap[matched].reset_index(drop=True)
+        # Las columnas que la descarga no trae conservan el valor guardado
+        compare_cols = [col for col in columns if col != date_col and new_rows[col].notna().any()]
+        changed = changed_rows(old_rows[compare_cols], new_rows[compare_cols], rtol)
+        if changed.any():
+            tail = tail.copy()
+            for col in compare_cols:
+                values = tail[col].to_numpy(copy=True)
+                if np.issubdtype(values.dtype, np.number) and np.issubdtype(new_rows[col].dtype, np.number):
+                    # p.ej. volumen entero guardado y revisado con decimales
+                    values = values.astype(np.result_type(values.dtype, new_rows[col].dtype))
+                values[rows[changed]] = new_rows[col].to_numpy()[changed]
+                tail[col] = values
+            summary['revised'] = int(changed.sum())
+            changed_dates.append(new_rows[date_col].iloc[np.argmax(changed)])
+
+    # Fechas nuevas dentro del rango ya guardado (huecos): se insertan y solo se reordena el tramo final
+    gaps = overlap[~matched]
+    if len(gaps):
+        tail = pd.concat([tail, gaps], ignore_index=True).sort_values(date_col, kind='stable')
+        changed_dates.append(gaps[date_col].iloc[0])
+
+    merged = pd.concat([old_df.iloc[:start], tail, newer], ignore_index=True)
+    summary.update(
+        added=len(newer) + len(gaps),
+        append_only=not changed_dates,
+        changed_from=min(changed_dates) if changed_dates else None
+    )
+    return merged, summary
\ No newline at end of file
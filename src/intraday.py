@@ -0,0 +1,231 @@
+import argparse
+import glob
+import os
+
+import numpy as np
+import pandas as pd
+
+from adjustments import mark_range
+from data_io import atomic_path, file_lock, fsync_path
+
+# Barras intradía: src/static/data/intraday/<SÍMBOLO>/<intervalo>/<AAAA-MM>.bin
+INTRADAY_DIR = os.path.join('src', 'static', 'data', 'intraday')
+DATA_DIR = os.path.join('src', 'static', 'data')
+
+# Periodo máximo que entrega Yahoo para cada intervalo
+INTRADAY_PERIODS = {'1m': '7d', '5m': '60d', '1h': '730d'}
+INTERVAL_WIDTHS = {'1m': pd.Timedelta(minutes=1), '5m': pd.Timedelta(minutes=5), '1h': pd.Timedelta(hours=1)}
+
+# Zona horaria de la bolsa: los días y las horas de las barras remuestreadas son locales
+EXCHANGE_TZ = 'America/New_York'
+
+# Registro de ancho fijo (56 bytes por barra); ts en nanosegundos UTC
+BAR_DTYPE = np.dtype([
+    ('ts', '<i8'), ('open', '<f8'), ('high', '<f8'), ('low', '<f8'),
+    ('close', '<f8'), ('adj_close', '<f8'), ('volume', '<i8')
+])
+BAR_COLUMNS = [('open', 'Open'), ('high', 'High'), ('low', 'Low'), ('close', 'Close'),
+               ('adj_close', 'Adj Close'), ('volume', 'Volume')]
+
+def bars_from_frame(df, symbol, date_col=None):
+    """Convierte la descarga de yfinance en registros BAR_DTYPE ordenados y sin marcas de tiempo repetidas."""
+    date_col = date_col or next(col for col in ('Datetime', 'Date') if col in df.columns)
+    df = df.dropna(subset=[f'Close {symbol}'])
+    timestamps = pd.DatetimeIndex(pd.to_datetime(df[date_col], utc=True))
+    records = np.empty(len(df), dtype=BAR_DTYPE)
+    records['ts'] = timestamps.as_unit('ns').asi8
+    for field, name in BAR_COLUMNS:
+        column = f'{name} {symbol}'
+        if column not in df.columns and field == 'adj_close':
+            column = f'Close {symbol}'  # Las barras intradía no traen cierre ajustado
+        values = df[column].to_numpy(dtype='float64')
+        records[field] = np.round(values) if field == 'volume' else values
+
+    records = records[np.argsort(records['ts'], kind='stable')]
+    # Ante marcas repetidas se conserva la última descargada
+    keep = np.r_[records['ts'][1:] != records['ts'][:-1], True]
+    return records[keep]
+
+class IntradayStore:
+    """Almacén de solo anexado: un archivo binario de registros de ancho fijo por mes."""
+
+    def __init__(self, symbol, interval, root=INTRADAY_DIR):
+        self.symbol = symbol
+        self.interval = interval
+        self.directory = os.path.join(root, symbol, interval)
+
+    def chunk_paths(self):
+        return sorted(glob.glob(os.path.join(self.directory, '*.bin')))
+
+    def _complete_records(self, path):
+        """Registros completos del archivo; una escritura interrumpida deja a lo sumo un registro parcial al final."""
+        return os.path.getsize(path) // BAR_DTYPE.itemsize
+
+    def last_timestamp(self):
+        """Marca de tiempo de la última barra guardada (None si el almacén está vacío)."""
+        for path in reversed(self.chunk_paths()):
+            count = self._complete_records(path)
+            if count:
+                last = np.fromfile(path, dtype=BAR_DTYPE, count=1, offset=(count - 1) * BAR_DTYPE.itemsize)
+                return int(last['ts'][0])
+        return None
+
+    def append(self, records, now=None):
+        """Anexa las barras cerradas posteriores a la última guardada. Devuelve cuántas se agregaron."""
+        # La barra en curso todavía puede cambiar: solo se guardan las que ya cerraron
+        if now is None:
+            now = pd.Timestamp.now(tz='UTC')
+        width = INTERVAL_WIDTHS.get(self.interval)
+        if width is not None:
+            records = records[records['ts'] + width.value <= now.value]
+
+        os.makedirs(self.directory, exist_ok=True)
+        with file_lock(self.directory):
+            last = self.last_timestamp()
+            if last is not None:
+                records = records[records['ts'] > last]
+            if not len(records):
+                return 0
+
+            months = records['ts'].astype('datetime64[ns]').astype('datetime64[M]')
+            starts = np.flatnonzero(np.r_[True, months[1:] != months[:-1]])
+            for start, end in zip(starts, np.r_[starts[1:], len(records)]):
+                path = os.path.join(self.directory, f"{months[start]}.bin")
+                with open(path, 'ab') as file:
+                    # Descartar un registro parcial de una escritura interrumpida antes de anexar
+                    file.truncate(self._complete_records(path) * BAR_DTYPE.itemsize)
+                    file.write(records[start:end].tobytes())
+                    file.flush()
+                    os.fsync(file.fileno())
+            fsync_path(self.directory)
+        return len(records)
+
+    def iter_chunks(self):
+        """Genera las barras mes a mes, sin cargar todo el almacén en memoria."""
+        with file_lock(self.directory, shared=True):
+            paths = self.chunk_paths()
+            counts = [self._complete_records(path) for path in paths]
+        for path, count in zip(paths, counts):
+            if count:
+                yield np.fromfile(path, dtype=BAR_DTYPE, count=count)
+
+def bucket_labels(ts, freq, tz=EXCHANGE_TZ):
+    """Inicio (hora local de la bolsa, en ns) del periodo de freq al que pertenece cada barra."""
+    local = pd.DatetimeIndex(ts.astype('datetime64[ns]')).tz_localize('UTC').tz_convert(tz).tz_localize(None)
+    try:
+        labels = local.floor(freq)
+    except ValueError:
+        # Frecuencias de calendario (semana, mes) no tienen ancho fijo
+        labels = local.to_period(freq).start_time
+    return labels.as_unit('ns').asi8
+
+def aggregate_bars(records, labels):
+    """OHLCV vectorizado por grupos contiguos de etiquetas: open primero, high máx, low mín, close último, volumen suma."""
+    starts = np.flatnonzero(np.r_[True, labels[1:] != labels[:-1]])
+    ends = np.r_[starts[1:], len(records)] - 1
+    bars = np.empty(len(starts), dtype=BAR_DTYPE)
+    bars['ts'] = labels[starts]
+    bars['open'] = records['open'][starts]
+    bars['high'] = np.maximum.reduceat(records['high'], starts)
+    bars['low'] = np.minimum.reduceat(records['low'], starts)
+    bars['close'] = records['close'][ends]
+    bars['adj_close'] = records['adj_close'][ends]
+    bars['volume'] = np.add.reduceat(records['volume'], starts)
+    return bars
+
+def _merge_open_bar(previous, bar):
+    """Completa en su lugar la barra (arreglo de una fila) con la parte anterior del mismo periodo."""
+    bar['open'] = previous['open']
+    bar['high'] = np.maximum(previous['high'], bar['high'])
+    bar['low'] = np.minimum(previous['low'], bar['low'])
+    bar['volume'] += previous['volume']
+
+def resample_chunks(chunks, freq, tz=EXCHANGE_TZ):
+    """Remuestrea un flujo de bloques de barras a freq; el periodo abierto al final de un bloque se completa con el siguiente."""
+    carry = None
+    for chunk in chunks:
+        if not len(chunk):
+            continue
+        bars = aggregate_bars(chunk, bucket_labels(chunk['ts'], freq, tz))
+        if carry is not None:
+            if bars['ts'][0] == carry['ts'][0]:
+                _merge_open_bar(carry, bars[:1])
+            else:
+                yield carry
+        carry = bars[-1:].copy()
+        if len(bars) > 1:
+            yield bars[:-1]
+    if carry is not None:
+        yield carry
+
+def bars_to_frame(bars, symbol):
+    """Barras en el formato de columnas de historical.csv (Date en hora local de la bolsa)."""
+    frame = pd.DataFrame({'Date': bars['ts'].astype('datetime64[ns]')})
+    for field, name in BAR_COLUMNS:
+        frame[f'{name} {symbol}'] = bars[field]
+    return frame
+
+def frequency_paths(symbol, freq, root=INTRADAY_DIR):
+    """Rutas del remuestreo, del enriquecido y de los rangos a recalcular de una frecuencia."""
+    directory = os.path.join(root, symbol)
+    return {
+        'remuestreado': os.path.join(directory, f'resampled_{freq}.csv'),
+        'enriquecido': os.path.join(directory, f'enriched_{freq}.csv'),
+        'rangos': os.path.join(directory, f'recompute_{freq}.json')
+    }
+
+def resample_to_csv(store, freq, output_path, ranges_path=None, tz=EXCHANGE_TZ):
+    """Escribe el remuestreo por bloques en un CSV (atómico) y marca el último periodo anterior para recalcular."""
+    if store.last_timestamp() is None:
+        return 0
+    with file_lock(output_path):
+        previous_last = None
+        if ranges_path is not None and os.path.exists(output_path):
+            dates = pd.read_csv(output_path, usecols=['Date'])['Date']
+            previous_last = pd.Timestamp(dates.iloc[-1]) if len(dates) else None
+
+        rows = 0
+        with atomic_path(output_path) as tmp_path:
+            for bars in resample_chunks(store.iter_chunks(), freq, tz):
+                bars_to_frame(bars, store.symbol).to_csv(tmp_path, mode='a', header=rows == 0, index=False)
+                rows += len(bars)
+
+        # Solo el último periodo del remuestreo anterior pudo quedar incompleto: el almacén
+        # no cambia barras ya guardadas, así que lo anterior a él se conserva tal cual
+        if previous_last is not None:
+            mark_range(previous_last, None, 'intradia', path=ranges_path)
+    return rows
+
+def update_frequency(symbol, interval, freq, incremental=True, root=INTRADAY_DIR):
+    """Remuestrea las barras del intervalo a freq y calcula los indicadores de DataEnricher a esa frecuencia."""
+    from enricher import DataEnricher  # Importación diferida: solo al enriquecer
+
+    store = IntradayStore(symbol, interval, root)
+    paths = frequency_paths(symbol, freq, root)
+    rows = resample_to_csv(store, freq, paths['remuestreado'], paths['rangos'] if incremental else None)
+    if not rows:
+        return None
+    enricher = DataEnricher(os.path.relpath(paths['remuestreado'], DATA_DIR))
+    enricher.enrich_data(os.path.relpath(paths['enriquecido'], DATA_DIR), incremental=incremental,
+                         ranges_path=paths['rangos'])
+    return enricher
+
+def main():
+    parser = argparse.ArgumentParser(description="Remuestrea barras intradía y calcula indicadores por frecuencia")
+    parser.add_argument('--simbolo', default='AVAL')
+    parser.add_argument('--intervalo', default='1m', choices=sorted(INTRADAY_PERIODS), help="Barras guardadas de origen")
+    parser.add_argument('--frecuencias', nargs='+', default=['1h', 'D'],
+                        help="Frecuencias de destino (alias de pandas: 5min, 1h, D, W...)")
+    parser.add_argument('--completo', action='store_true', help="Recalcula todos los indicadores de cada frecuencia")
+    args = parser.parse_args()
+
+    for freq in args.frecuencias:
+        enricher = update_frequency(args.simbolo, args.intervalo, freq, incremental=not args.completo)
+        if enricher is None:
+            print(f"Sin barras {args.intervalo} guardadas para {args.simbolo}.")
+            return
+        mode = "incremental" if enricher.incremental else "completo"
+        print(f"{freq}: {len(enricher.df)} barras enriquecidas ({mode}) en {frequency_paths(args.simbolo, freq)['enriquecido']}")
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -1,15 +1,32 @@
 import logging
+import logging.handlers
 import os
 import datetime
+import json
+import queue
+import threading
+import atexit
+import copy
+import time
 
-# Directorio de logs (dentro de src/logs/text_logs)
-LOG_DIR = os.path.join(os.path.dirname(__file__), "logs")
+# Directorio de logs (dentro de src/logs/text_logs); se crea al escribir el primer registro.
+# AVAL_LOG_DIR lo reemplaza, p.ej. con aval-tracker instalado sin -e (el módulo queda en site-packages)
+LOG_DIR_ENV_VAR = "AVAL_LOG_DIR"
+LOG_DIR = os.environ.get(LOG_DIR_ENV_VAR) or os.path.join(os.path.dirname(__file__), "logs")
 TEXT_LOG_DIR = os.path.join(LOG_DIR, "text_logs")  # Directorio específico para logs de texto
-os.makedirs(TEXT_LOG_DIR, exist_ok=True)  # Crear el directorio si no existe
 
 # Generar el nombre del archivo de log usando la fecha y hora actual
 log_filename = f"aval_analysis_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.log"
 LOG_FILE = os.path.join(TEXT_LOG_DIR, log_filename)
+JSON_LOG_FILE = os.path.splitext(LOG_FILE)[0] + ".jsonl"
+
+# Variable de entorno para activar el modo asíncrono (QueueHandler + QueueListener)
+ASYNC_ENV_VAR = "AVAL_LOG_ASYNC"
+# Variable de entorno para descartar los registros sin escribir archivos (benchmark, pruebas)
+QUIET_ENV_VAR = "AVAL_LOG_QUIET"
+
+# Listener del modo asíncrono (uno por proceso)
+_listener = None
 
 # Formateador personalizado para evitar KeyError si faltan claves
 class CustomFormatter(logging.Formatter):
@@ -21,29 +38,181 @@ class CustomFormatter(logging.Formatter):
             record.function_name = 'N/A'
         return super().format(record)
 
-class Logger:
-    def __init__(self):
-        if not os.path.exists(TEXT_LOG_DIR):
-            os.makedirs(TEXT_LOG_DIR)
+# Formateador JSON lines con los mismos campos que el formato de texto
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            'timestamp': self.formatTime(record, '%Y-%m-%d %H:%M:%S'),
+            'name': record.name,
+            'class_name': getattr(record, 'class_name', 'N/A'),
+            'function_name': getattr(record, 'function_name', 'N/A'),
+            'level': record.levelname,
+            'message': record.getMessage()
+        }
+        if record.exc_info:
+            entry['exc_info'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            # Registro que llegó por la cola: la traza ya viene formateada
+            entry['exc_info'] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False)
+
+class BatchingFileHandler(logging.FileHandler):
+    """Manejador de archivo que vacía el buffer a disco por lotes y no en cada registro.
+
+    Un lote incompleto se vacía a lo sumo flush_interval segundos después de su primer registro, aunque
+    no lleguen más (procesos de larga duración casi inactivos como el programador o el servicio).
+    """
+
+    def __init__(self, filename, batch_size=100, flush_interval=2.0, encoding='utf-8'):
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+        super().__init__(filename, encoding=encoding, delay=True)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._pending = 0
+        self._last_flush = time.monotonic()
+        self._timer = None
+
+    def emit(self, record):
+        try:
+            if self.stream is None:
+                self.stream = self._open()
+            self.stream.write(self.format(record) + self.terminator)
+            self._pending += 1
+            # Vaciar por tamaño de lote, por tiempo o ante errores graves
+            if (self._pending >= self.batch_size
+                    or time.monotonic() - self._last_flush >= self.flush_interval
+                    or record.levelno >= logging.ERROR):
+                self.flush()
+            elif self._timer is None:
+                self._timer = threading.Timer(self.flush_interval, self._timed_flush)
+                self._timer.daemon = True
+                self._timer.start()
+        except Exception:
+            self.handleError(record)
+
+    def _timed_flush(self):
+        self.acquire()
+        try:
+            self._timer = None
+            if self._pending:
+                self.flush()
+        finally:
+            self.release()
+
+    def flush(self):
+        self.acquire()
+        try:
+            super().flush()
+            self._pending = 0
+            self._last_flush = time.monotonic()
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        finally:
+            self.release()
+
+    def close(self):
+        self.acquire()
+        try:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        finally:
+            self.release()
+        super().close()
+
+class RecordQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler que conserva la traza en exc_text en lugar de incrustarla en el mensaje.
+
+    El prepare() estándar formatea la excepción dentro de msg y borra exc_info, con lo que JsonFormatter
+    perdería el campo exc_info; aquí solo se resuelve el mensaje y la traza se pasa como texto.
+    """
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        # El traceback retiene los marcos del hilo llamador: no se encola
+        record.exc_info = None
+        return record
+
+def _text_formatter():
+    return CustomFormatter(
+        '[%(asctime)s | %(name)s | %(class_name)s | %(function_name)s | %(levelname)s] %(message)s',
+        datefmt='%Y-%m-%d %H:%M:%S'
+    )
 
+def _async_enabled():
+    return os.environ.get(ASYNC_ENV_VAR, '').lower() in ('1', 'true', 'yes')
+
+def _quiet_enabled():
+    return os.environ.get(QUIET_ENV_VAR, '').lower() in ('1', 'true', 'yes')
+
+def start_async_logging(logger, json_format=True, batch_size=100, flush_interval=2.0):
+    """Conecta el logger a una cola; un hilo listener escribe los registros por lotes fuera del hilo llamador."""
+    global _listener
+    if _listener is not None:
+        return _listener
+
+    file_handler = BatchingFileHandler(
+        JSON_LOG_FILE if json_format else LOG_FILE,
+        batch_size=batch_size,
+        flush_interval=flush_interval
+    )
+    file_handler.setLevel(logging.DEBUG)
+    file_handler.setFormatter(JsonFormatter() if json_format else _text_formatter())
+
+    log_queue = queue.SimpleQueue()
+    logger.addHandler(RecordQueueHandler(log_queue))
+    _listener = logging.handlers.QueueListener(log_queue, file_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_async_logging)
+    return _listener
+
+def stop_async_logging():
+    """Detiene el listener tras escribir los registros pendientes y cierra el archivo."""
+    global _listener
+    if _listener is None:
+        return
+    _listener.stop()
+    for handler in _listener.handlers:
+        handler.close()
+    _listener = None
+
+class Logger:
+    def __init__(self, async_mode=None, json_format=None, quiet=None):
         # Crear logger y configurar manejador
         self.logger = logging.getLogger('LoggerAVAL')
         self.logger.setLevel(logging.DEBUG)
 
-        # Crear manejador de archivo
-        file_handler = logging.FileHandler(LOG_FILE)
-        file_handler.setLevel(logging.DEBUG)
+        # Evitar duplicados
+        if self.logger.handlers:
+            return
 
-        # Aplicar el formateador personalizado
-        formatter = CustomFormatter(
-            '[%(asctime)s | %(name)s | %(class_name)s | %(function_name)s | %(levelname)s] %(message)s',
-            datefmt='%Y-%m-%d %H:%M:%S'
-        )
-        file_handler.setFormatter(formatter)
+        if quiet is None:
+            quiet = _quiet_enabled()
+        if quiet:
+            # Sin archivo: los registros se descartan (el primer Logger del proceso decide la configuración)
+            self.logger.addHandler(logging.NullHandler())
+            return
 
-        # Evitar duplicados
-        if not self.logger.handlers:
-            self.logger.addHandler(file_handler)
+        if async_mode is None:
+            async_mode = _async_enabled()
+        if async_mode:
+            start_async_logging(self.logger, json_format=True if json_format is None else json_format)
+            return
+
+        # Crear manejador de archivo (el archivo se crea con el primer registro)
+        os.makedirs(TEXT_LOG_DIR, exist_ok=True)
+        file_handler = logging.FileHandler(LOG_FILE, delay=True)
+        file_handler.setLevel(logging.DEBUG)
+
+        # Aplicar el formateador
+        file_handler.setFormatter(JsonFormatter() if json_format else _text_formatter())
+        self.logger.addHandler(file_handler)
 
     def debug(self, class_name, function_name, description, exc_info=False):
         self.logger.debug(
@@ -80,17 +249,18 @@ class Logger:
             exc_info=exc_info
         )
 
-# Uso del logger
-logger = Logger()
-logger.debug('MiClase', 'mi_funcion', 'Este es un mensaje de debug')
-logger.info('MiClase', 'mi_funcion', 'Este es un mensaje de info')
-logger.warning('MiClase', 'mi_funcion', 'Este es un mensaje de warning')
-
-'''
-# Registra un error con detalles de la excepción
-try:
-    1 / 0
-except ZeroDivisionError as e:
-    logger.error('MiClase', 'mi_funcion', f"Error en la operación: {str(e)}", exc_info=True)
-'''
-logger.critical('MiClase', 'mi_funcion', 'Este es un mensaje de critical')
\ No newline at end of file
+# Uso del logger (solo al ejecutar este archivo directamente)
+if __name__ == "__main__":
+    logger = Logger()
+    logger.debug('MiClase', 'mi_funcion', 'Este es un mensaje de debug')
+    logger.info('MiClase', 'mi_funcion', 'Este es un mensaje de info')
+    logger.warning('MiClase', 'mi_funcion', 'Este es un mensaje de warning')
+
+    '''
+    # Registra un error con detalles de la excepción
+    try:
+        1 / 0
+    except ZeroDivisionError as e:
+        logger.error('MiClase', 'mi_funcion', f"Error en la operación: {str(e)}", exc_info=True)
+    '''
+    logger.critical('MiClase', 'mi_funcion', 'Este es un mensaje de critical')
\ No newline at end of file
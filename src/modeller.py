@@ -1,27 +1,37 @@
 import pandas as pd
 import numpy as np
-from sklearn.model_selection import train_test_split
-from sklearn.ensemble import RandomForestRegressor
-from sklearn.linear_model import ElasticNet
-from sklearn.metrics import mean_squared_error, mean_absolute_error, r2_score
-from sklearn.preprocessing import StandardScaler
-from sklearn.feature_selection import SelectFromModel
 import joblib
 from datetime import datetime, timedelta
 import os
-import matplotlib.pyplot as plt
-import seaborn as sns
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from data_io import read_columns, write_csv
+import artifacts
+from profiling import profiler
+import plots
+import shared_matrix
+import drift
+import conformal
+
+def trading_signal(percent_change):
+    """Señal de operación (con su explicación) según el cambio porcentual esperado."""
+    if percent_change > 0:
+        return f"COMPRA (se espera un aumento de {percent_change:.2f}%)"
+    if percent_change < 0:
+        return f"VENTA (se espera una disminución de {abs(percent_change):.2f}%)"
+    return "MANTENER (no se espera cambio significativo)"
 
 class StockPredictor:
-    def __init__(self, data_file):
+    def __init__(self, data_file, df=None):
         # Definir rutas relativas para los datos de entrada
         self.data_path = os.path.join('src', 'static', 'data', data_file)
-        self.df = pd.read_csv(self.data_path)
-        self.df['Date'] = pd.to_datetime(self.df['Date'])
+        self.target_col = 'Adj Close AVAL'
         self.model = None
         self.scaler = None
         self.feature_selector = None
         self.selected_features = None
+        self.evaluation = None  # Fechas, valores reales y predicciones del conjunto de prueba
 
         # Definir todas las características disponibles
         self.all_features = [
@@ -38,15 +48,35 @@ class StockPredictor:
             'Volatility_Ratio_7_30'               # <-- nueva volatilidad relativa
         ]
 
+        # Leer solo la fecha, el objetivo y las características; los indicadores
+        # siguen en float64 para no alterar el escalado ni las métricas del modelo
+        if df is not None:
+            # DataFrame ya cargado (p.ej. el resultado del enriquecedor en memoria)
+            columns = ['Date', self.target_col] + [col for col in self.all_features if col in df.columns]
+            self.df = df[columns].reset_index(drop=True)
+        else:
+            self.df = read_columns(
+                self.data_path,
+                columns=[self.target_col] + self.all_features,
+                dtype=self.feature_dtypes(),
+                missing='ignore'  # Un CSV anterior sin las columnas nuevas sigue sirviendo (available_features)
+            )
+
+    @staticmethod
+    def feature_dtypes():
+        """Tipos compactos para las columnas enteras sin valores faltantes."""
+        return {
+            'Month': 'int8', 'Quarter': 'int8', 'Year': 'int16', 'Day_of_Week_Num': 'int8',
+            'SMA_Cross_5_20': 'int8', 'SMA_Cross_10_50': 'int8'
+        }
+
     def prepare_data(self):
         """Prepara los datos para el entrenamiento"""
         # Eliminar filas con valores NaN
         self.df = self.df.dropna()
 
         # Definir características y objetivo
-        target_col = 'Adj Close AVAL'
-        date_cols = ['Date']
-        drop_cols = ['Close AVAL', 'Dividends AVAL', 'Stock Splits AVAL', 'Cumulative_Return']
+        target_col = self.target_col
 
         # Filtrar columnas disponibles
         available_features = [col for col in self.all_features if col in self.df.columns]
@@ -64,33 +94,40 @@ class StockPredictor:
 
         return X_train, X_test, y_train, y_test, available_features
 
+    @profiler.profile('modeller.train')
     def train(self, model_dir='src/static/models'):
         """Entrena el modelo y guarda el artefacto"""
+        # Importación diferida: sklearn solo se carga al entrenar (al predecir lo carga joblib)
+        from sklearn.ensemble import RandomForestRegressor
+        from sklearn.linear_model import ElasticNet
+        from sklearn.metrics import mean_squared_error, mean_absolute_error, r2_score
+        from sklearn.preprocessing import StandardScaler
+        from sklearn.feature_selection import SelectFromModel
+
         # Crear directorio si no existe
         os.makedirs(model_dir, exist_ok=True)
-        model_path = os.path.join(model_dir, 'model.pkl')
-        scaler_path = os.path.join(model_dir, 'scaler.pkl')
-        selector_path = os.path.join(model_dir, 'feature_selector.pkl')
-        features_path = os.path.join(model_dir, 'selected_features.csv')
-        metrics_path = os.path.join(model_dir, 'metrics.csv')
 
-        X_train, X_test, y_train, y_test, available_features = self.prepare_data()
+        with profiler.stage('prepare_data'):
+            X_train, X_test, y_train, y_test, available_features = self.prepare_data()
 
         # Escalar características
-        self.scaler = StandardScaler()
-        X_train_scaled = self.scaler.fit_transform(X_train)
-        X_test_scaled = self.scaler.transform(X_test)
+        with profiler.stage('scale'):
+            self.scaler = StandardScaler()
+            X_train_scaled = self.scaler.fit_transform(X_train)
+            X_test_scaled = self.scaler.transform(X_test)
 
         # Selección de características
-        selector_model = RandomForestRegressor(n_estimators=100, random_state=42)
-        selector_model.fit(X_train_scaled, y_train)
+        with profiler.stage('forest_fit'):
+            selector_model = RandomForestRegressor(n_estimators=100, random_state=42)
+            selector_model.fit(X_train_scaled, y_train)
 
         # Seleccionar características importantes
-        self.feature_selector = SelectFromModel(selector_model, threshold='0.5*mean')
-        self.feature_selector.fit(X_train_scaled, y_train)
+        with profiler.stage('feature_selection'):
+            self.feature_selector = SelectFromModel(selector_model, threshold='0.5*mean')
+            self.feature_selector.fit(X_train_scaled, y_train)
 
-        X_train_selected = self.feature_selector.transform(X_train_scaled)
-        X_test_selected = self.feature_selector.transform(X_test_scaled)
+            X_train_selected = self.feature_selector.transform(X_train_scaled)
+            X_test_selected = self.feature_selector.transform(X_test_scaled)
 
         selected_indices = self.feature_selector.get_support(indices=True)
         self.selected_features = [available_features[i] for i in selected_indices]
@@ -99,22 +136,18 @@ class StockPredictor:
         print(f"Número de características seleccionadas: {len(self.selected_features)}")
 
         # Entrenar modelo ElasticNet
-        self.model = ElasticNet(
-            alpha=0.01,
-            l1_ratio=0.5,
-            max_iter=10000,
-            random_state=42
-        )
-        self.model.fit(X_train_selected, y_train)
-
-        # Guardar modelo y componentes
-        joblib.dump(self.model, model_path)
-        joblib.dump(self.scaler, scaler_path)
-        joblib.dump(self.feature_selector, selector_path)
-        pd.Series(self.selected_features).to_csv(features_path, index=False)
+        with profiler.stage('elasticnet_fit'):
+            self.model = ElasticNet(
+                alpha=0.01,
+                l1_ratio=0.5,
+                max_iter=10000,
+                random_state=42
+            )
+            self.model.fit(X_train_selected, y_train)
 
         # Evaluar modelo
-        y_pred = self.model.predict(X_test_selected)
+        with profiler.stage('evaluate'):
+            y_pred = self.model.predict(X_test_selected)
 
         # Calcular métricas
         metrics = {
@@ -129,57 +162,86 @@ class StockPredictor:
         print(f"MAE: {metrics['MAE']:.4f}")
         print(f"R2: {metrics['R2']:.4f}")
 
-        # Guardar métricas
-        pd.DataFrame([metrics]).to_csv(metrics_path, index=False)
-
-        # Generar gráficos
-        self.generate_plots(y_test, y_pred, model_dir)
+        # Guardar modelo, componentes y métricas como una sola versión (se publica completa o no se publica)
+        with profiler.stage('save_artifacts'):
+            with artifacts.publish(model_dir) as paths:
+                joblib.dump(self.model, paths['model'])
+                joblib.dump(self.scaler, paths['scaler'])
+                joblib.dump(self.feature_selector, paths['selector'])
+                pd.Series(self.selected_features).to_csv(paths['features'], index=False)
+                pd.DataFrame([metrics]).to_csv(paths['metrics'], index=False)
+                # Referencia de las características para el monitor de deriva
+                drift.save_reference(drift.reference_profile(self.df, available_features), paths['reference'])
+                # Residuos del tramo de prueba (no visto al ajustar): calibración inicial de los intervalos conformales
+                pd.DataFrame({
+                    'Date': self.df['Date'].iloc[-len(y_test):].to_numpy(),
+                    'Residuo': np.abs(np.asarray(y_test) - y_pred)
+                }).to_csv(paths['calibration'], index=False)
+
+        # Conservar la evaluación para la etapa (opcional) de gráficos
+        self.evaluation = (
+            self.df['Date'].iloc[-len(y_test):].to_numpy(),
+            np.asarray(y_test),
+            np.asarray(y_pred)
+        )
 
         return metrics
 
+    def share_features(self, backend='shm'):
+        """Publica X sin escalar e y para otros procesos (cada tramo ajusta su propio escalador y selector)."""
+        X_train, X_test, y_train, y_test, available_features = self.prepare_data()
+        X = np.vstack([X_train.to_numpy(dtype='float64'), X_test.to_numpy(dtype='float64')])
+        y = np.concatenate([np.asarray(y_train, dtype='float64'), np.asarray(y_test, dtype='float64')])
+        return shared_matrix.SharedArrays({'X': X, 'y': y}, backend=backend), available_features
+
+    def evaluate_folds(self, n_folds=5, workers=None, backend='shm'):
+        """Validación walk-forward del pipeline completo: cada tramo se ajusta en un proceso aparte sobre la matriz compartida.
+
+        El escalador y el selector se ajustan solo con las filas de entrenamiento del tramo: los del modelo publicado
+        vieron el 80% de la historia y filtrarían información a la evaluación de los primeros tramos.
+        """
+        with profiler.stage('share_features'):
+            shared, available_features = self.share_features(backend)
+
+        with shared:
+            # Ventana creciente: el tramo k entrena con todo lo anterior y evalúa el bloque siguiente
+            n_rows = len(shared.arrays['y'])
+            edges = np.linspace(n_rows // (n_folds + 1), n_rows, n_folds + 1, dtype=int)
+            folds = [(int(edges[i]), int(edges[i + 1])) for i in range(n_folds)]
+
+            with profiler.stage('fold_fit'):
+                with ProcessPoolExecutor(
+                    max_workers=workers,
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=shared_matrix.init_worker,
+                    initargs=(shared.handles,)
+                ) as pool:
+                    results = list(pool.map(_fold_metrics, folds))
+
+        return pd.DataFrame(results)
+
     def generate_plots(self, y_test, y_pred, model_dir):
         """Genera gráficos para visualizar el rendimiento del modelo"""
-        # Crear directorio para gráficos
-        plots_dir = os.path.join(model_dir, 'plots')
-        os.makedirs(plots_dir, exist_ok=True)
-
-        # Gráfico de predicciones vs valores reales
-        plt.figure(figsize=(12, 6))
-        test_dates = self.df['Date'].iloc[-len(y_test):]
-        plt.plot(test_dates, y_test, label='Valores reales', color='blue')
-        plt.plot(test_dates, y_pred, label='Predicciones', color='red', linestyle='--')
-        plt.title('Precio ajustado: Predicción vs Valor real')
-        plt.xlabel('Fecha')
-        plt.ylabel('Adj Close AVAL')
-        plt.legend()
-        plt.xticks(rotation=45)
-        plt.tight_layout()
-        plt.savefig(os.path.join(plots_dir, 'predictions_vs_actual.png'))
-        plt.close()
-
-        # Gráfico de distribución de errores
-        errors = y_test - y_pred
-        plt.figure(figsize=(10, 6))
-        sns.histplot(errors, kde=True)
-        plt.title('Distribución de errores')
-        plt.xlabel('Error')
-        plt.ylabel('Frecuencia')
-        plt.savefig(os.path.join(plots_dir, 'error_distribution.png'))
-        plt.close()
-
-    def predict_next_day(self, model_dir='src/static/models'):
-        """Predice el valor para el siguiente día"""
+        test_dates = self.df['Date'].iloc[-len(y_test):].to_numpy()
+        return plots.render_model_plots(test_dates, np.asarray(y_test), np.asarray(y_pred), os.path.join(model_dir, 'plots'))
+
+    def start_plots(self, model_dir='src/static/models'):
+        """Lanza la generación de gráficos en un proceso aparte y devuelve el Future"""
+        if self.evaluation is None:
+            raise RuntimeError("Entrene el modelo antes de generar los gráficos")
+        dates, y_test, y_pred = self.evaluation
+        return plots.submit(plots.render_model_plots, dates, y_test, y_pred, os.path.join(model_dir, 'plots'))
+
+    @profiler.profile('modeller.predict_next_day')
+    def predict_next_day(self, model_dir='src/static/models', prediction_path=None):
+        """Predice el valor para el siguiente día (por defecto en src/static/predictions/next_day_prediction.csv)"""
         # Cargar modelo y componentes si no están cargados
         if self.model is None:
-            model_path = os.path.join(model_dir, 'model.pkl')
-            scaler_path = os.path.join(model_dir, 'scaler.pkl')
-            selector_path = os.path.join(model_dir, 'feature_selector.pkl')
-            features_path = os.path.join(model_dir, 'selected_features.csv')
-
-            self.model = joblib.load(model_path)
-            self.scaler = joblib.load(scaler_path)
-            self.feature_selector = joblib.load(selector_path)
-            self.selected_features = pd.read_csv(features_path)['0'].tolist()
+            loaded = artifacts.load_artifacts(model_dir)
+            self.model = loaded['model']
+            self.scaler = loaded['scaler']
+            self.feature_selector = loaded['selector']
+            self.selected_features = loaded['features']
 
         # Obtener la última fila de datos
         last_row = self.df.iloc[-1:].copy()
@@ -208,27 +270,32 @@ class StockPredictor:
         percent_change = ((prediction - last_value) / last_value) * 100
 
         # Determinar señal
-        if percent_change > 0:
-            signal = f"COMPRA (se espera un aumento de {percent_change:.2f}%)"
-        elif percent_change < 0:
-            signal = f"VENTA (se espera una disminución de {abs(percent_change):.2f}%)"
-        else:
-            signal = "MANTENER (no se espera cambio significativo)"
+        signal = trading_signal(percent_change)
+
+        # Intervalos conformales: antes se calibran los residuos de los valores reales llegados desde la última vez
+        calibration = conformal.ConformalIntervals(model_dir)
+        calibration.update(
+            self.df,
+            lambda X: self.model.predict(self.feature_selector.transform(self.scaler.transform(X))),
+            available_features,
+            self.target_col
+        )
+        intervals = calibration.intervals(prediction)
 
         # Crear DataFrame con la predicción
         prediction_df = pd.DataFrame({
             'Fecha': [next_date],
             'Último valor conocido': [last_value],
             'Predicción': [prediction],
+            **{column: [value] for column, value in intervals.items()},
             'Cambio porcentual': [percent_change],
             'Señal': [signal.split(' ')[0]]  # Solo guardar COMPRA, VENTA o MANTENER
         })
 
         # Guardar predicción
-        predictions_dir = os.path.join('src', 'static', 'predictions')
-        os.makedirs(predictions_dir, exist_ok=True)
-        prediction_path = os.path.join(predictions_dir, 'next_day_prediction.csv')
-        prediction_df.to_csv(prediction_path, index=False)
+        prediction_path = prediction_path or os.path.join('src', 'static', 'predictions', 'next_day_prediction.csv')
+        os.makedirs(os.path.dirname(prediction_path), exist_ok=True)
+        write_csv(prediction_df, prediction_path)
 
         return {
             'last_date': last_date,
@@ -236,14 +303,70 @@ class StockPredictor:
             'last_value': last_value,
             'prediction': prediction,
             'percent_change': percent_change,
-            'signal': signal
+            'signal': signal,
+            'intervals': intervals
         }
 
+def _fold_metrics(fold):
+    """Ajusta y evalúa un tramo leyendo X e y de la memoria compartida (sin copiarlos al proceso).
+
+    Escalador, selector y modelo se ajustan como en train(), pero solo con las filas anteriores al tramo de prueba.
+    """
+    from sklearn.ensemble import RandomForestRegressor
+    from sklearn.feature_selection import SelectFromModel
+    from sklearn.linear_model import ElasticNet
+    from sklearn.metrics import mean_squared_error, mean_absolute_error, r2_score
+    from sklearn.preprocessing import StandardScaler
+
+    train_end, test_end = fold
+    X = shared_matrix.get('X')
+    y = shared_matrix.get('y')
+    y_train = y[:train_end]
+    scaler = StandardScaler().fit(X[:train_end])
+    X_train, X_test = scaler.transform(X[:train_end]), scaler.transform(X[train_end:test_end])
+
+    selector = SelectFromModel(RandomForestRegressor(n_estimators=100, random_state=42), threshold='0.5*mean')
+    selector.fit(X_train, y_train)
+    X_train, X_test = selector.transform(X_train), selector.transform(X_test)
+
+    model = ElasticNet(alpha=0.01, l1_ratio=0.5, max_iter=10000, random_state=42)
+    model.fit(X_train, y_train)
+    y_pred = model.predict(X_test)
+    y_test = y[train_end:test_end]
+    return {
+        'Filas entrenamiento': train_end,
+        'Filas prueba': test_end - train_end,
+        'Características': X_train.shape[1],
+        'RMSE': np.sqrt(mean_squared_error(y_test, y_pred)),
+        'MAE': mean_absolute_error(y_test, y_pred),
+        'R2': r2_score(y_test, y_pred)
+    }
+
 def main():
+    parser = argparse.ArgumentParser(description="Entrena el modelo y predice el siguiente día")
+    parser.add_argument('--sin-graficos', action='store_true', help="Omite la generación de gráficos")
+    parser.add_argument('--validar', type=int, default=0, metavar='TRAMOS',
+                        help="Validación walk-forward en paralelo con el número de tramos indicado")
+    parser.add_argument('--procesos', type=int, default=None, help="Procesos para la validación (por defecto, uno por núcleo)")
+    parser.add_argument('--memmap', action='store_true', help="Comparte la matriz en un .npy mapeado en vez de memoria compartida")
+    parser.add_argument('--si-hay-deriva', action='store_true',
+                        help="Reentrena solo si el monitor de deriva lo recomienda; si no, predice con el modelo vigente")
+    args = parser.parse_args()
+
     try:
         # Instanciar y entrenar el modelo
         predictor = StockPredictor('enriched_historical.csv')
-        metrics = predictor.train()
+        retrain = True
+        if args.si_hay_deriva:
+            with profiler.stage('drift_check'):
+                decision = drift.check()
+            retrain = decision['reentrenar']
+            print(f"Monitor de deriva: {'reentrenar' if retrain else 'conservar el modelo'} ({decision['motivo']})")
+        if retrain:
+            metrics = predictor.train()
+
+        # Los gráficos se renderizan en otro proceso mientras se predice
+        plots_future = None if args.sin_graficos or not retrain else predictor.start_plots()
 
         # Realizar una predicción para el siguiente día
         prediction_result = predictor.predict_next_day()
@@ -253,13 +376,29 @@ def main():
         print(f"Fecha de la predicción: {prediction_result['next_date'].strftime('%Y-%m-%d')}")
         print(f"Último valor conocido: {prediction_result['last_value']:.4f}")
         print(f"Predicción: {prediction_result['prediction']:.4f}")
+        for level in conformal.LEVELS:
+            lower, upper = conformal.interval_columns(level)
+            print(f"Intervalo {level * 100:g}%: [{prediction_result['intervals'][lower]:.4f}, {prediction_result['intervals'][upper]:.4f}]")
         print(f"Cambio porcentual: {prediction_result['percent_change']:.2f}%")
         print(f"Señal: {prediction_result['signal']}")
 
+        if args.validar:
+            folds = predictor.evaluate_folds(args.validar, args.procesos, 'memmap' if args.memmap else 'shm')
+            print("\nValidación walk-forward:")
+            print(folds.to_string(index=False))
+
+        if plots_future is not None:
+            with profiler.stage('plots_wait'):
+                rendered = plots_future.result()
+            print("\nGráficos actualizados." if rendered else "\nGráficos sin cambios (entradas iguales a la última renderización).")
+
         print("\nProceso de modelado completado exitosamente.")
 
     except Exception as e:
         print(f"\nError durante el proceso de modelado: {e}")
 
+    finally:
+        profiler.write('modeller')
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
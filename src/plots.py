@@ -0,0 +1,123 @@
+import hashlib
+import json
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from data_io import atomic_path
+
+# Archivo con la huella de las entradas de la última renderización por gráfico
+STATE_FILE = 'render_state.json'
+
+def _pyplot():
+    """Importa matplotlib en modo headless (Agg) solo cuando hace falta graficar."""
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    return plt
+
+def inputs_fingerprint(*arrays):
+    """Huella SHA-256 de las entradas de un gráfico."""
+    digest = hashlib.sha256()
+    for array in arrays:
+        array = np.asarray(array)
+        if np.issubdtype(array.dtype, np.datetime64):
+            array = array.astype('datetime64[ns]').astype(np.int64)
+        digest.update(np.ascontiguousarray(array).tobytes())
+    return digest.hexdigest()
+
+def _is_current(plots_dir, name, fingerprint, outputs):
+    """Indica si el gráfico ya fue renderizado con las mismas entradas."""
+    path = os.path.join(plots_dir, STATE_FILE)
+    if not os.path.exists(path) or not all(os.path.exists(out) for out in outputs):
+        return False
+    with open(path, encoding='utf-8') as file:
+        return json.load(file).get(name) == fingerprint
+
+def _mark_rendered(plots_dir, name, fingerprint):
+    path = os.path.join(plots_dir, STATE_FILE)
+    state = {}
+    if os.path.exists(path):
+        with open(path, encoding='utf-8') as file:
+            state = json.load(file)
+    state[name] = fingerprint
+    with atomic_path(path) as tmp_path, open(tmp_path, 'w', encoding='utf-8') as file:
+        json.dump(state, file, indent=2)
+
+def _save_figure(plt, path):
+    """Guarda la figura actual de forma atómica (el dashboard nunca ve un PNG a medias)."""
+    with atomic_path(path) as tmp_path:
+        plt.savefig(tmp_path, format='png')
+    plt.close()
+
+def render_model_plots(dates, y_test, y_pred, plots_dir):
+    """Genera los gráficos de predicción y de errores del modelo. Devuelve False si se omitieron por no cambiar."""
+    os.makedirs(plots_dir, exist_ok=True)
+    predictions_path = os.path.join(plots_dir, 'predictions_vs_actual.png')
+    errors_path = os.path.join(plots_dir, 'error_distribution.png')
+
+    fingerprint = inputs_fingerprint(dates, y_test, y_pred)
+    if _is_current(plots_dir, 'model', fingerprint, [predictions_path, errors_path]):
+        return False
+
+    plt = _pyplot()
+    import seaborn as sns
+
+    # Gráfico de predicciones vs valores reales
+    plt.figure(figsize=(12, 6))
+    plt.plot(dates, y_test, label='Valores reales', color='blue')
+    plt.plot(dates, y_pred, label='Predicciones', color='red', linestyle='--')
+    plt.title('Precio ajustado: Predicción vs Valor real')
+    plt.xlabel('Fecha')
+    plt.ylabel('Adj Close AVAL')
+    plt.legend()
+    plt.xticks(rotation=45)
+    plt.tight_layout()
+    _save_figure(plt, predictions_path)
+
+    # Gráfico de distribución de errores
+    errors = np.asarray(y_test) - np.asarray(y_pred)
+    plt.figure(figsize=(10, 6))
+    sns.histplot(errors, kde=True)
+    plt.title('Distribución de errores')
+    plt.xlabel('Error')
+    plt.ylabel('Frecuencia')
+    _save_figure(plt, errors_path)
+
+    _mark_rendered(plots_dir, 'model', fingerprint)
+    return True
+
+def render_arima_plot(dates, values, pred_dates, pred_values, next_date, forecast, order, output_path):
+    """Genera el gráfico de ajuste ARIMA y predicción del siguiente día. Devuelve False si se omitió."""
+    plots_dir = os.path.dirname(output_path)
+    os.makedirs(plots_dir, exist_ok=True)
+    fingerprint = inputs_fingerprint(dates, values, pred_values, [forecast], list(order))
+    if _is_current(plots_dir, 'arima', fingerprint, [output_path]):
+        return False
+
+    plt = _pyplot()
+    plt.figure(figsize=(16,6))
+    plt.plot(dates, values, label='Precio Real', color='blue')
+    plt.plot(pred_dates, pred_values, label='Predicción ARIMA', color='orange', linestyle='--')
+    plt.scatter(next_date, forecast, color='red', label=f'Predicción siguiente día ({next_date.date()})', zorder=5)
+    plt.axvline(x=dates[-1], color='gray', linestyle=':', label='Último dato')
+    plt.title(f'Precio Real vs Ajuste ARIMA{order} y Predicción del Siguiente Día')
+    plt.xlabel('Fecha')
+    plt.ylabel('Adj Close AVAL')
+    plt.legend()
+    plt.grid(True)
+    plt.tight_layout()
+    _save_figure(plt, output_path)
+
+    _mark_rendered(plots_dir, 'arima', fingerprint)
+    return True
+
+def submit(func, *args):
+    """Renderiza en un proceso aparte (spawn) y devuelve el Future; el llamador sigue trabajando mientras tanto."""
+    executor = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn'))
+    future = executor.submit(func, *args)
+    # Liberar el proceso en cuanto termine la renderización
+    future.add_done_callback(lambda _: executor.shutdown(wait=False))
+    return future
\ No newline at end of file
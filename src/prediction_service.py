@@ -0,0 +1,367 @@
+import argparse
+import json
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+import pandas as pd
+
+import arima_model
+import artifacts
+from data_io import data_version, read_columns
+from logger import Logger
+from modeller import StockPredictor, trading_signal
+
+MODEL_DIR = os.path.join('src', 'static', 'models')
+DATA_DIR = os.path.join('src', 'static', 'data')
+
+# Archivo enriquecido de cada símbolo; sus columnas '<campo> <SÍMBOLO>' se renombran al esquema del modelo
+DATA_FILES = {'AVAL': 'enriched_historical.csv'}
+MODEL_SYMBOL = 'AVAL'
+TARGET_COL = f'Adj Close {MODEL_SYMBOL}'
+ARIMA_ORDER = (3, 1, 1)
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+
+# Micro-lotes: se espera hasta BATCH_WAIT_MS desde la primera solicitud o hasta MAX_BATCH solicitudes
+BATCH_WAIT_MS = 2.0
+MAX_BATCH = 256
+RELOAD_INTERVAL = 1.0
+REQUEST_TIMEOUT = 5.0
+LATENCY_WINDOW = 10000
+
+class LatencyStats:
+    """Ventana circular de latencias por endpoint con percentiles p50/p99."""
+
+    def __init__(self, window=LATENCY_WINDOW):
+        self._lock = threading.Lock()
+        self._samples = {}
+        self._counts = {}
+        self.window = window
+
+    def record(self, endpoint, seconds):
+        with self._lock:
+            self._samples.setdefault(endpoint, deque(maxlen=self.window)).append(seconds)
+            self._counts[endpoint] = self._counts.get(endpoint, 0) + 1
+
+    def summary(self):
+        with self._lock:
+            samples = {endpoint: np.fromiter(values, dtype='float64') for endpoint, values in self._samples.items()}
+            counts = dict(self._counts)
+        return {
+            endpoint: {
+                'solicitudes': counts[endpoint],
+                'p50_ms': float(np.percentile(values, 50) * 1000),
+                'p99_ms': float(np.percentile(values, 99) * 1000)
+            }
+            for endpoint, values in samples.items()
+        }
+
+def load_latest_row(symbol, data_file):
+    """Última fila de características del símbolo con los nombres de columna del modelo."""
+    df = None
+    if symbol != MODEL_SYMBOL:
+        df = read_columns(os.path.join(DATA_DIR, data_file))
+        df = df.rename(columns=lambda col: col.replace(f' {symbol}', f' {MODEL_SYMBOL}'))
+    predictor = StockPredictor(data_file, df=df)
+    return predictor.df.iloc[-1]
+
+class PredictionService:
+    """Modelo y últimas filas (ya transformadas) residentes en memoria; las solicitudes concurrentes se predicen en un solo lote."""
+
+    def __init__(self, model_dir=MODEL_DIR, data_files=None, batch_wait=BATCH_WAIT_MS / 1000,
+                 max_batch=MAX_BATCH, reload_interval=RELOAD_INTERVAL):
+        self.model_dir = model_dir
+        self.data_files = dict(data_files or DATA_FILES)
+        self.batch_wait = batch_wait
+        self.max_batch = max_batch
+        self.reload_interval = reload_interval
+        self.logger = Logger()
+        self.latency = LatencyStats()
+        self.batch_sizes = deque(maxlen=LATENCY_WINDOW)
+        self.reloads = 0
+        self.state = None  # Se reemplaza completo al recargar: cada lote usa una versión coherente
+        self._queue = queue.Queue()
+        self._stop = threading.Event()
+        self._reload_lock = threading.Lock()
+        self._arima_lock = threading.Lock()
+        self._arima = {}
+        self._threads = []
+        try:
+            self.reload()
+        except artifacts.ModelNotTrainedError as e:
+            # El servicio arranca igual y carga el modelo cuando se publique el primero
+            self.logger.warning('PredictionService', '__init__', str(e))
+
+    def reload(self, force=False):
+        """Recarga el modelo si se publicó otra versión y las filas de los símbolos cuyos datos cambiaron."""
+        with self._reload_lock:
+            state = self.state
+            versions = {symbol: data_version(os.path.join(DATA_DIR, name)) for symbol, name in self.data_files.items()}
+            model_changed = force or state is None or artifacts.current_version(self.model_dir) != state['version']
+            stale = [symbol for symbol in versions
+                     if force or state is None or state['data_versions'].get(symbol) != versions[symbol]]
+            if not model_changed and not stale:
+                return False
+
+            new_state = dict(state) if state is not None else {'rows': {}, 'data_versions': {}}
+            if model_changed:
+                loaded = artifacts.load_artifacts(self.model_dir)
+                new_state.update(
+                    version=loaded['version'], model=loaded['model'],
+                    scaler=loaded['scaler'], selector=loaded['selector']
+                )
+            rows = {symbol: entry['row'] for symbol, entry in new_state['rows'].items()}
+            rows.update({symbol: load_latest_row(symbol, self.data_files[symbol]) for symbol in stale})
+
+            # Columnas en el orden con que se ajustó el escalador
+            scaler = new_state['scaler']
+            columns = list(getattr(scaler, 'feature_names_in_', []))
+            if not columns:
+                columns = [col for col in rows[MODEL_SYMBOL].index if col not in ('Date', TARGET_COL)]
+            # Escalar y seleccionar todas las filas residentes en una sola llamada vectorizada: solo cambian al
+            # recargar, y SelectFromModel recalcula las importancias del bosque en cada transform (~30 ms)
+            symbols = list(rows)
+            X = pd.DataFrame(np.vstack([rows[symbol][columns].to_numpy(dtype='float64') for symbol in symbols]), columns=columns)
+            X = new_state['selector'].transform(scaler.transform(X))
+            new_state['rows'] = {symbol: {'row': rows[symbol], 'vector': X[i]} for i, symbol in enumerate(symbols)}
+            new_state['data_versions'] = dict(new_state['data_versions'], **{symbol: versions[symbol] for symbol in stale})
+            self.state = new_state
+            self.reloads += 1
+
+        self.logger.info('PredictionService', 'reload',
+                         f"Modelo {new_state['version']} cargado; datos actualizados: {', '.join(stale) or 'ninguno'}")
+        return True
+
+    def start(self):
+        """Inicia el hilo de micro-lotes y el que vigila el puntero del modelo y los datos."""
+        self._stop.clear()
+        self._threads = [
+            threading.Thread(target=self._batch_loop, name='micro-lotes', daemon=True),
+            threading.Thread(target=self._watch_loop, name='recarga', daemon=True)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self):
+        self._stop.set()
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    def _watch_loop(self):
+        while not self._stop.wait(self.reload_interval):
+            try:
+                self.reload()
+            except Exception as e:
+                # Una publicación a medias o un archivo bloqueado no detiene el servicio: se reintenta
+                self.logger.warning('PredictionService', '_watch_loop', f"No se pudo recargar: {e}")
+
+    def _batch_loop(self):
+        while not self._stop.is_set():
+            try:
+                batch = [self._queue.get(timeout=0.1)]
+            except queue.Empty:
+                continue
+            deadline = time.perf_counter() + self.batch_wait
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._run_batch(batch)
+
+    def _run_batch(self, batch):
+        """Una sola llamada al modelo para todos los símbolos del lote (filas ya escaladas y seleccionadas)."""
+        state = self.state
+        if state is None:
+            for _, future in batch:
+                future.set_exception(artifacts.ModelNotTrainedError(f"Modelo no entrenado en {self.model_dir}"))
+            return
+        pending = []
+        for symbol, future in batch:
+            if symbol in state['rows']:
+                pending.append((symbol, future))
+            else:
+                future.set_exception(KeyError(f"Símbolo desconocido: {symbol}"))
+        if not pending:
+            return
+
+        symbols = list(dict.fromkeys(symbol for symbol, _ in pending))
+        try:
+            predictions = state['model'].predict(np.vstack([state['rows'][symbol]['vector'] for symbol in symbols]))
+        except Exception as e:
+            for _, future in pending:
+                future.set_exception(e)
+            return
+
+        self.batch_sizes.append(len(pending))
+        results = {symbol: self._result(state, symbol, float(value)) for symbol, value in zip(symbols, predictions)}
+        for symbol, future in pending:
+            future.set_result(results[symbol])
+
+    @staticmethod
+    def _result(state, symbol, prediction):
+        row = state['rows'][symbol]['row']
+        last_value = float(row[TARGET_COL])
+        percent_change = (prediction - last_value) / last_value * 100
+        return {
+            'simbolo': symbol,
+            'fecha_ultima': row['Date'].strftime('%Y-%m-%d'),
+            'fecha_prediccion': (row['Date'] + timedelta(days=1)).strftime('%Y-%m-%d'),
+            'ultimo_valor': last_value,
+            'prediccion': prediction,
+            'cambio_porcentual': percent_change,
+            'senal': trading_signal(percent_change).split(' ')[0],
+            'version_modelo': state['version']
+        }
+
+    def predict(self, symbols, timeout=REQUEST_TIMEOUT):
+        """Encola los símbolos y espera sus predicciones (se agrupan con las de otras solicitudes)."""
+        futures = []
+        for symbol in symbols:
+            future = Future()
+            self._queue.put((symbol, future))
+            futures.append(future)
+        return [future.result(timeout) for future in futures]
+
+    def arima(self, symbol=MODEL_SYMBOL):
+        """Pronóstico ARIMA del siguiente día; solo se reajusta cuando cambia el histórico."""
+        column = f'Adj Close {symbol}'
+        version = data_version(arima_model.HISTORICAL_PATH)
+        with self._arima_lock:
+            cached = self._arima.get(symbol)
+            if cached is None or cached['data_version'] != version:
+                df = arima_model.cargar_datos(arima_model.HISTORICAL_PATH, columnas=[column], tipos={column: 'float64'})
+                serie = arima_model.obtener_serie(df, column)
+                fit = arima_model.entrenar_arima(serie, ARIMA_ORDER)
+                forecast = float(fit.forecast(steps=1).iloc[0])
+                cached = {
+                    'data_version': version,
+                    'resultado': {
+                        'simbolo': symbol,
+                        'fecha_ultima': serie.index[-1].strftime('%Y-%m-%d'),
+                        'fecha_prediccion': (serie.index[-1] + timedelta(days=1)).strftime('%Y-%m-%d'),
+                        'ultimo_valor': float(serie.iloc[-1]),
+                        'prediccion': forecast,
+                        'orden': list(ARIMA_ORDER)
+                    }
+                }
+                self._arima[symbol] = cached
+        return cached['resultado']
+
+    def metrics(self):
+        """Latencias p50/p99 por endpoint, tamaño de los lotes y versión vigente."""
+        sizes = np.fromiter(self.batch_sizes, dtype='float64')
+        return {
+            'version_modelo': self.state['version'],
+            'recargas': self.reloads,
+            'latencia': self.latency.summary(),
+            'lotes': {
+                'cantidad': int(len(sizes)),
+                'tamano_medio': float(sizes.mean()) if len(sizes) else 0.0,
+                'tamano_max': int(sizes.max()) if len(sizes) else 0
+            }
+        }
+
+def make_handler(service):
+    """Manejador HTTP con los endpoints /prediccion, /arima, /metricas y /salud."""
+
+    class Handler(BaseHTTPRequestHandler):
+        def _send(self, status, payload):
+            body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _symbols(self, query, body=None):
+            if body and 'simbolos' in body:
+                return list(body['simbolos'])
+            raw = query.get('simbolos', query.get('simbolo', [MODEL_SYMBOL]))
+            return [symbol for value in raw for symbol in value.split(',') if symbol]
+
+        def _dispatch(self, body=None):
+            started = time.perf_counter()
+            url = urlparse(self.path)
+            endpoint = url.path.rstrip('/') or '/'
+            query = parse_qs(url.query)
+            try:
+                if endpoint == '/prediccion':
+                    status, payload = 200, service.predict(self._symbols(query, body))
+                elif endpoint == '/arima':
+                    status, payload = 200, [service.arima(symbol) for symbol in self._symbols(query, body)]
+                elif endpoint == '/metricas':
+                    status, payload = 200, service.metrics()
+                elif endpoint == '/salud':
+                    state = service.state
+                    status, payload = 200, {'estado': 'ok' if state else 'sin modelo',
+                                            'version_modelo': state['version'] if state else None}
+                else:
+                    status, payload = 404, {'error': f"Ruta desconocida: {endpoint}"}
+            except KeyError as e:
+                status, payload = 404, {'error': str(e.args[0]) if e.args else str(e)}
+            except artifacts.ModelNotTrainedError as e:
+                status, payload = 503, {'error': str(e)}
+            except Exception as e:
+                status, payload = 500, {'error': str(e)}
+            self._send(status, payload)
+            if status != 404:
+                service.latency.record(endpoint, time.perf_counter() - started)
+
+        def do_GET(self):
+            self._dispatch()
+
+        def do_POST(self):
+            length = int(self.headers.get('Content-Length') or 0)
+            try:
+                body = json.loads(self.rfile.read(length) or b'{}')
+            except json.JSONDecodeError:
+                self._send(400, {'error': "Cuerpo JSON inválido"})
+                return
+            self._dispatch(body)
+
+        def log_message(self, format, *args):
+            pass  # Las latencias quedan en /metricas; no escribir una línea por solicitud
+
+    return Handler
+
+def main():
+    parser = argparse.ArgumentParser(description="Servicio HTTP local de predicción con micro-lotes")
+    parser.add_argument('--host', default=DEFAULT_HOST)
+    parser.add_argument('--puerto', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--espera-ms', type=float, default=BATCH_WAIT_MS, help="Espera máxima para completar un lote")
+    parser.add_argument('--lote-max', type=int, default=MAX_BATCH, help="Solicitudes máximas por lote")
+    parser.add_argument('--datos', action='append', default=[], metavar='SIMBOLO=ARCHIVO',
+                        help="Archivo enriquecido adicional por símbolo (en src/static/data)")
+    args = parser.parse_args()
+
+    data_files = dict(DATA_FILES)
+    data_files.update(dict(item.split('=', 1) for item in args.datos))
+
+    service = PredictionService(data_files=data_files, batch_wait=args.espera_ms / 1000, max_batch=args.lote_max)
+    service.start()
+    server = ThreadingHTTPServer((args.host, args.puerto), make_handler(service))
+    print(f"Servicio de predicción en http://{args.host}:{args.puerto} (modelo {service.state['version'] if service.state else 'no entrenado'})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.stop()
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
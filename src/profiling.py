@@ -0,0 +1,182 @@
+import cProfile
+import functools
+import json
+import os
+import platform
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import resource  # No disponible en Windows
+except ImportError:
+    resource = None
+
+# Directorio por defecto de los perfiles (el flujo de CI versiona los JSON para seguir las etapas entre ejecuciones)
+# y perfiles que se conservan por componente
+PROFILE_DIR = os.path.join('src', 'static', 'models', 'profiles')
+KEEP_PROFILES = 20
+
+# Variables de entorno: memoria con tracemalloc y etapas a perfilar con cProfile (separadas por coma)
+MEMORY_ENV_VAR = "AVAL_PROFILE_MEMORY"
+CPROFILE_ENV_VAR = "AVAL_PROFILE_CPROFILE"
+
+def _peak_rss_mb():
+    """Memoria residente pico del proceso en MB (None si no se puede medir)."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reporta KB y macOS bytes
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+class Profiler:
+    """Registra por etapa el tiempo de reloj, el tiempo de CPU y la memoria pico."""
+
+    def __init__(self, trace_memory=None, cprofile_stages=None):
+        if trace_memory is None:
+            trace_memory = os.environ.get(MEMORY_ENV_VAR, '').lower() in ('1', 'true', 'yes')
+        if cprofile_stages is None:
+            cprofile_stages = [s for s in os.environ.get(CPROFILE_ENV_VAR, '').split(',') if s]
+        self.trace_memory = trace_memory
+        self.cprofile_stages = set(cprofile_stages)
+        self.started = datetime.now()
+        self.stages = []
+        self.pstats = {}
+        # Pila de etapas abiertas por hilo: los trabajos concurrentes no mezclan sus nombres
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    @property
+    def _stack(self):
+        if not hasattr(self._local, 'stack'):
+            self._local.stack = []
+        return self._local.stack
+
+    def _full_name(self, name):
+        return '/'.join([frame['name'] for frame in self._stack] + [name])
+
+    @contextmanager
+    def stage(self, name, cprofile=False):
+        """Mide el bloque como una etapa; las etapas anidadas se registran como 'padre/hija'."""
+        full_name = self._full_name(name)
+        frame = {'name': name, 'child_peak': 0}
+
+        if self.trace_memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            # Conservar el pico del padre antes de reiniciarlo para esta etapa
+            if self._stack:
+                self._stack[-1]['child_peak'] = max(self._stack[-1]['child_peak'], tracemalloc.get_traced_memory()[1])
+            if hasattr(tracemalloc, 'reset_peak'):  # Python 3.9+
+                tracemalloc.reset_peak()
+
+        profile = None
+        if cprofile or name in self.cprofile_stages or full_name in self.cprofile_stages:
+            profile = cProfile.Profile()
+
+        self._stack.append(frame)
+        rss_before = _peak_rss_mb()
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        if profile is not None:
+            profile.enable()
+        try:
+            yield
+        finally:
+            if profile is not None:
+                profile.disable()
+            wall = time.perf_counter() - wall_start
+            cpu = time.process_time() - cpu_start
+            self._stack.pop()
+
+            entry = {
+                'stage': full_name,
+                'wall_s': round(wall, 6),
+                'cpu_s': round(cpu, 6),
+                'peak_rss_mb': _peak_rss_mb(),
+                'rss_growth_mb': None
+            }
+            if rss_before is not None:
+                entry['rss_growth_mb'] = round(entry['peak_rss_mb'] - rss_before, 3)
+            if self.trace_memory:
+                peak = max(tracemalloc.get_traced_memory()[1], frame['child_peak'])
+                entry['tracemalloc_peak_mb'] = round(peak / (1024 * 1024), 3)
+                if self._stack:
+                    self._stack[-1]['child_peak'] = max(self._stack[-1]['child_peak'], peak)
+            # Dentro de collect() la etapa va al perfil del bloque y no al del proceso
+            target = getattr(self._local, 'sink', None) or self
+            with target._lock:
+                target.stages.append(entry)
+                if profile is not None:
+                    target.pstats[full_name] = profile
+
+    @contextmanager
+    def collect(self):
+        """Registra en un perfil propio las etapas que este hilo ejecute dentro del bloque (un trabajo del daemon)."""
+        sink = Profiler(self.trace_memory, self.cprofile_stages)
+        previous = getattr(self._local, 'sink', None)
+        self._local.sink = sink
+        try:
+            yield sink
+        finally:
+            self._local.sink = previous
+
+    def profile(self, name=None, cprofile=False):
+        """Decorador que mide cada llamada a la función como una etapa."""
+        def decorator(func):
+            stage_name = name or func.__qualname__
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.stage(stage_name, cprofile=cprofile):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def write(self, component, directory=PROFILE_DIR, keep=KEEP_PROFILES):
+        """Escribe el perfil de la ejecución en JSON (y los .pstats pedidos). Devuelve la ruta del JSON.
+
+        Solo se conservan los últimos keep perfiles del componente, con sus .pstats.
+        """
+        os.makedirs(directory, exist_ok=True)
+        with self._lock:
+            started, stages, pstats = self.started, list(self.stages), dict(self.pstats)
+        stamp = started.strftime('%Y%m%d_%H%M%S')
+        base = os.path.join(directory, f"profile_{component}_{stamp}")
+
+        pstats_files = {}
+        for stage_name, profile in pstats.items():
+            path = f"{base}_{stage_name.replace('/', '-')}.pstats"
+            profile.dump_stats(path)
+            pstats_files[stage_name] = os.path.basename(path)
+
+        report = {
+            'component': component,
+            'started': started.isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'stages': stages,
+            'pstats': pstats_files
+        }
+        with open(f"{base}.json", 'w', encoding='utf-8') as file:
+            json.dump(report, file, indent=2, ensure_ascii=False)
+        _prune(directory, component, keep)
+        return f"{base}.json"
+
+def _prune(directory, component, keep):
+    """Borra los perfiles más antiguos del componente (JSON y .pstats) dejando los últimos keep."""
+    prefix = f"profile_{component}_"
+    # El sello AAAAMMDD_HHMMSS ordena cronológicamente; los .pstats comparten el prefijo de su JSON
+    stamps = sorted(name[len(prefix):-len('.json')] for name in os.listdir(directory)
+                    if name.startswith(prefix) and name.endswith('.json'))
+    for stamp in stamps[:-keep] if keep else []:
+        base = f"{prefix}{stamp}"
+        for name in os.listdir(directory):
+            if name == f"{base}.json" or (name.startswith(f"{base}_") and name.endswith('.pstats')):
+                os.remove(os.path.join(directory, name))
+
+# Perfilador compartido por los módulos del proceso
+profiler = Profiler()
\ No newline at end of file
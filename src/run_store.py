@@ -0,0 +1,339 @@
+import argparse
+import csv
+import gzip
+import os
+import shutil
+import sqlite3
+import time
+from contextlib import closing
+from datetime import datetime, timedelta
+
+from data_io import atomic_path, file_lock
+
+# Base de datos del historial de ejecuciones
+RUN_DB_PATH = os.path.join('src', 'logs', 'run_history.db')
+TEXT_LOG_DIR = os.path.join('src', 'logs', 'text_logs')
+CSV_LOG_PATH = os.path.join('src', 'logs', 'log_data.csv')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    fecha TEXT NOT NULL,
+    dia TEXT NOT NULL,
+    simbolo TEXT NOT NULL,
+    descargados INTEGER,
+    agregados INTEGER,
+    total INTEGER,
+    estado TEXT,
+    exito INTEGER NOT NULL,
+    revisados INTEGER,
+    cuarentena INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_runs_dia_simbolo ON runs (dia, simbolo);
+CREATE INDEX IF NOT EXISTS idx_runs_simbolo_dia ON runs (simbolo, dia);
+
+CREATE TABLE IF NOT EXISTS runs_diarios (
+    dia TEXT NOT NULL,
+    simbolo TEXT NOT NULL,
+    ejecuciones INTEGER NOT NULL,
+    agregados INTEGER NOT NULL,
+    fallos INTEGER NOT NULL,
+    ultimo_total INTEGER,
+    revisados INTEGER NOT NULL DEFAULT 0,
+    cuarentena INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (dia, simbolo)
+);
+
+CREATE TABLE IF NOT EXISTS validaciones (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    fecha TEXT NOT NULL,
+    simbolo TEXT NOT NULL,
+    modo TEXT NOT NULL,
+    filas_revisadas INTEGER NOT NULL,
+    regla TEXT NOT NULL,
+    accion TEXT NOT NULL,
+    fallos INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_validaciones_simbolo_fecha ON validaciones (simbolo, fecha);
+"""
+
+# Vista unificada: filas recientes detalladas + días ya compactados
+DAILY_UNION = """
+SELECT dia, simbolo, COUNT(*) AS ejecuciones, COALESCE(SUM(agregados), 0) AS agregados,
+       SUM(1 - exito) AS fallos, COALESCE(SUM(revisados), 0) AS revisados,
+       COALESCE(SUM(cuarentena), 0) AS cuarentena
+FROM runs GROUP BY dia, simbolo
+UNION ALL
+SELECT dia, simbolo, ejecuciones, agregados, fallos, revisados, cuarentena FROM runs_diarios
+"""
+
+# Columnas agregadas después de la primera versión del esquema (tabla, columna, definición)
+MIGRATIONS = [
+    ('runs', 'revisados', 'INTEGER'),
+    ('runs_diarios', 'revisados', 'INTEGER NOT NULL DEFAULT 0'),
+    ('runs', 'cuarentena', 'INTEGER'),
+    ('runs_diarios', 'cuarentena', 'INTEGER NOT NULL DEFAULT 0')
+]
+
+def _to_int(value):
+    """Convierte a entero o None (p.ej. 'Error' en Total_en_archivo)."""
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+class RunStore:
+    """Historial de ejecuciones en SQLite con índice por fecha y símbolo."""
+
+    def __init__(self, db_path=RUN_DB_PATH):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+        with closing(self._connect()) as con:
+            con.executescript(SCHEMA)
+            self._migrate(con)
+
+    @staticmethod
+    def _migrate(con):
+        """Agrega a las bases existentes las columnas nuevas del esquema."""
+        for table, column, definition in MIGRATIONS:
+            existing = {row[1] for row in con.execute(f"PRAGMA table_info({table})")}
+            if column not in existing:
+                with con:
+                    con.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def record(self, symbol, downloaded_count, new_rows_added, total_count, status, fecha=None, revised_rows=None,
+               quarantined_rows=None):
+        """Registra una ejecución del colector."""
+        fecha = fecha or datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        with closing(self._connect()) as con, con:
+            con.execute(
+                "INSERT INTO runs (fecha, dia, simbolo, descargados, agregados, total, estado, exito, revisados, cuarentena) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (fecha, fecha[:10], symbol, _to_int(downloaded_count), _to_int(new_rows_added),
+                 _to_int(total_count), status, int(status == "Éxito"), _to_int(revised_rows), _to_int(quarantined_rows))
+            )
+
+    def record_validation(self, symbol, mode, checked_rows, counts, warnings=None, fecha=None):
+        """Registra los fallos por regla de una validación (modo 'incremental' o 'completa')."""
+        fecha = fecha or datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        rows = [(fecha, symbol, mode, int(checked_rows), rule, 'cuarentena', int(n)) for rule, n in counts.items()]
+        rows += [(fecha, symbol, mode, int(checked_rows), rule, 'aviso', int(n)) for rule, n in (warnings or {}).items()]
+        with closing(self._connect()) as con, con:
+            con.executemany(
+                "INSERT INTO validaciones (fecha, simbolo, modo, filas_revisadas, regla, accion, fallos) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                rows
+            )
+
+    def validations(self, symbol=None, limit=20):
+        """Últimas validaciones con fallos: fecha, símbolo, modo, filas revisadas, regla, acción y fallos."""
+        sql = "SELECT fecha, simbolo, modo, filas_revisadas, regla, accion, fallos FROM validaciones WHERE fallos > 0"
+        params = []
+        if symbol:
+            sql += " AND simbolo = ?"
+            params.append(symbol)
+        sql += " ORDER BY fecha DESC, regla LIMIT ?"
+        params.append(limit)
+        with closing(self._connect()) as con:
+            return con.execute(sql, params).fetchall()
+
+    def import_csv(self, csv_path):
+        """Importa el historial de log_data.csv (omitiendo las fechas ya registradas). Devuelve las filas importadas."""
+        if not os.path.exists(csv_path):
+            return 0
+        with closing(self._connect()) as con, con:
+            known = {row[0] for row in con.execute("SELECT fecha FROM runs")}
+            # Los días ya compactados perdieron el detalle por fecha: sus filas ya están contadas en el resumen
+            compacted = set(con.execute("SELECT dia, simbolo FROM runs_diarios").fetchall())
+            rows = []
+            with open(csv_path, newline='') as file:
+                for entry in csv.DictReader(file):
+                    if entry["Fecha"] in known or (entry["Fecha"][:10], entry["Símbolo"]) in compacted:
+                        continue
+                    rows.append((
+                        entry["Fecha"], entry["Fecha"][:10], entry["Símbolo"],
+                        _to_int(entry["Registros_descargados"]), _to_int(entry["Registros_agregados"]),
+                        _to_int(entry["Total_en_archivo"]), entry["Estado"], int(entry["Estado"] == "Éxito")
+                    ))
+            con.executemany(
+                "INSERT INTO runs (fecha, dia, simbolo, descargados, agregados, total, estado, exito) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                rows
+            )
+        return len(rows)
+
+    def rows_added(self, symbol=None, since=None, until=None):
+        """Ejecuciones, filas agregadas, fallos, filas revisadas y en cuarentena por símbolo y día."""
+        clauses, params = [], []
+        if symbol:
+            clauses.append("simbolo = ?")
+            params.append(symbol)
+        if since:
+            clauses.append("dia >= ?")
+            params.append(since)
+        if until:
+            clauses.append("dia <= ?")
+            params.append(until)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+        sql = (
+            f"SELECT dia, simbolo, SUM(ejecuciones), SUM(agregados), SUM(fallos), SUM(revisados), SUM(cuarentena) "
+            f"FROM ({DAILY_UNION}) {where} GROUP BY dia, simbolo ORDER BY dia, simbolo"
+        )
+        with closing(self._connect()) as con:
+            return con.execute(sql, params).fetchall()
+
+    def failures(self, symbol=None, limit=50):
+        """Últimos fallos registrados (solo los no compactados conservan el detalle)."""
+        sql = "SELECT fecha, simbolo, estado FROM runs WHERE exito = 0"
+        params = []
+        if symbol:
+            sql += " AND simbolo = ?"
+            params.append(symbol)
+        sql += " ORDER BY fecha DESC LIMIT ?"
+        params.append(limit)
+        with closing(self._connect()) as con:
+            return con.execute(sql, params).fetchall()
+
+    def trim_csv(self, csv_path=CSV_LOG_PATH, max_age_days=90):
+        """Importa log_data.csv al historial y luego quita del CSV las filas más antiguas que max_age_days.
+
+        Ambos pasos van bajo el mismo bloqueo: ninguna fila se borra sin estar antes en la base.
+        """
+        if not os.path.exists(csv_path):
+            return {'importadas': 0, 'eliminadas': 0}
+        cutoff = (datetime.now() - timedelta(days=max_age_days)).strftime("%Y-%m-%d")
+        with file_lock(csv_path):
+            imported = self.import_csv(csv_path)
+            with open(csv_path, newline='') as file:
+                reader = csv.DictReader(file)
+                fields = reader.fieldnames
+                rows = list(reader)
+            kept = [row for row in rows if (row.get("Fecha") or '')[:10] >= cutoff]
+            if len(kept) < len(rows):
+                with atomic_path(csv_path) as tmp_path:
+                    with open(tmp_path, 'w', newline='') as file:
+                        writer = csv.DictWriter(file, fieldnames=fields)
+                        writer.writeheader()
+                        writer.writerows(kept)
+        return {'importadas': imported, 'eliminadas': len(rows) - len(kept)}
+
+    def compact(self, max_age_days=90):
+        """Resume por día y símbolo las ejecuciones más antiguas que max_age_days y elimina su detalle."""
+        cutoff = (datetime.now() - timedelta(days=max_age_days)).strftime("%Y-%m-%d")
+        with closing(self._connect()) as con:
+            with con:
+                con.execute(
+                    """
+                    INSERT INTO runs_diarios (dia, simbolo, ejecuciones, agregados, fallos, ultimo_total, revisados, cuarentena)
+                    SELECT dia, simbolo, COUNT(*), COALESCE(SUM(agregados), 0), SUM(1 - exito), MAX(total),
+                           COALESCE(SUM(revisados), 0), COALESCE(SUM(cuarentena), 0)
+                    FROM runs WHERE dia < ? GROUP BY dia, simbolo
+                    ON CONFLICT (dia, simbolo) DO UPDATE SET
+                        ejecuciones = ejecuciones + excluded.ejecuciones,
+                        agregados = agregados + excluded.agregados,
+                        fallos = fallos + excluded.fallos,
+                        ultimo_total = COALESCE(excluded.ultimo_total, ultimo_total),
+                        revisados = revisados + excluded.revisados,
+                        cuarentena = cuarentena + excluded.cuarentena
+                    """,
+                    (cutoff,)
+                )
+                removed = con.execute("DELETE FROM runs WHERE dia < ?", (cutoff,)).rowcount
+            con.execute("VACUUM")
+        return removed
+
+def _log_timestamp(path):
+    """Fecha del log según su nombre (aval_analysis_YYYYMMDD_HHMMSS); en CI el mtime es el del checkout."""
+    stem = os.path.basename(path).split('.')[0]
+    try:
+        return datetime.strptime(stem[-15:], "%Y%m%d_%H%M%S").timestamp()
+    except ValueError:
+        return os.path.getmtime(path)
+
+def rotate_text_logs(directory=TEXT_LOG_DIR, compress_after_days=7, max_age_days=90, max_total_mb=20):
+    """Comprime los logs de texto antiguos, elimina los vencidos y mantiene el directorio bajo el tamaño máximo."""
+    if not os.path.isdir(directory):
+        return {'comprimidos': 0, 'eliminados': 0}
+
+    now = time.time()
+    compressed = removed = 0
+    for name in os.listdir(directory):
+        path = os.path.join(directory, name)
+        age_days = (now - _log_timestamp(path)) / 86400
+        if age_days > max_age_days:
+            os.remove(path)
+            removed += 1
+        elif age_days > compress_after_days and name.endswith(('.log', '.jsonl')):
+            with open(path, 'rb') as src, gzip.open(path + '.gz', 'wb') as dst:
+                shutil.copyfileobj(src, dst)
+            os.remove(path)
+            compressed += 1
+
+    # Si aún se excede el tamaño, eliminar los más antiguos primero
+    files = sorted(
+        (os.path.join(directory, name) for name in os.listdir(directory)),
+        key=_log_timestamp
+    )
+    total = sum(os.path.getsize(path) for path in files)
+    while files and total > max_total_mb * 1024 * 1024:
+        oldest = files.pop(0)
+        total -= os.path.getsize(oldest)
+        os.remove(oldest)
+        removed += 1
+    return {'comprimidos': compressed, 'eliminados': removed}
+
+def main():
+    parser = argparse.ArgumentParser(description="Consulta y mantenimiento del historial de ejecuciones")
+    parser.add_argument('--db', default=RUN_DB_PATH, help="Ruta de la base de datos")
+    sub = parser.add_subparsers(dest='comando', required=True)
+
+    added = sub.add_parser('agregados', help="Filas agregadas por símbolo y día")
+    added.add_argument('--simbolo')
+    added.add_argument('--desde', help="Fecha inicial (YYYY-MM-DD)")
+    added.add_argument('--hasta', help="Fecha final (YYYY-MM-DD)")
+
+    failures = sub.add_parser('fallos', help="Historial de fallos")
+    failures.add_argument('--simbolo')
+    failures.add_argument('--limite', type=int, default=50)
+
+    checks = sub.add_parser('validaciones', help="Reglas de calidad que fallaron en las últimas validaciones")
+    checks.add_argument('--simbolo')
+    checks.add_argument('--limite', type=int, default=20)
+
+    rotate = sub.add_parser('rotar', help="Compacta el historial, recorta log_data.csv y rota los logs de texto")
+    rotate.add_argument('--dias', type=int, default=90, help="Antigüedad máxima del detalle y de los logs")
+    rotate.add_argument('--comprimir-dias', type=int, default=7, help="Antigüedad a partir de la cual se comprimen los logs")
+    rotate.add_argument('--max-mb', type=float, default=20, help="Tamaño máximo del directorio de logs de texto")
+
+    importer = sub.add_parser('importar-csv', help="Importa el historial de log_data.csv")
+    importer.add_argument('--csv', default=CSV_LOG_PATH)
+
+    args = parser.parse_args()
+    store = RunStore(args.db)
+
+    if args.comando == 'agregados':
+        print(f"{'Día':<12}{'Símbolo':<10}{'Ejecuciones':>12}{'Agregados':>11}{'Fallos':>8}{'Revisados':>11}{'Cuarentena':>12}")
+        for dia, simbolo, runs, rows, failed, revised, quarantined in store.rows_added(args.simbolo, args.desde, args.hasta):
+            print(f"{dia:<12}{simbolo:<10}{runs:>12}{rows:>11}{failed:>8}{revised:>11}{quarantined:>12}")
+    elif args.comando == 'fallos':
+        for fecha, simbolo, estado in store.failures(args.simbolo, args.limite):
+            print(f"{fecha}  {simbolo}  {estado}")
+    elif args.comando == 'validaciones':
+        for fecha, simbolo, modo, revisadas, regla, accion, fallos in store.validations(args.simbolo, args.limite):
+            print(f"{fecha}  {simbolo}  {modo:<11} {regla:<22} {accion:<10} {fallos:>6} de {revisadas} filas")
+    elif args.comando == 'rotar':
+        # Primero el CSV: sus filas antiguas se importan y luego se compactan con el resto
+        trimmed = store.trim_csv(max_age_days=args.dias)
+        removed = store.compact(args.dias)
+        result = rotate_text_logs(compress_after_days=args.comprimir_dias, max_age_days=args.dias, max_total_mb=args.max_mb)
+        print(f"Filas de log_data.csv importadas: {trimmed['importadas']}, quitadas del CSV: {trimmed['eliminadas']}")
+        print(f"Ejecuciones compactadas: {removed}")
+        print(f"Logs comprimidos: {result['comprimidos']}, eliminados: {result['eliminados']}")
+    elif args.comando == 'importar-csv':
+        print(f"Filas importadas: {store.import_csv(args.csv)}")
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
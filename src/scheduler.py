@@ -0,0 +1,327 @@
+import argparse
+import os
+import random
+import signal
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+import drift
+from collector import DataCollector
+from data_io import file_lock
+from enricher import DataEnricher
+from logger import Logger
+from modeller import StockPredictor
+from profiling import profiler
+from run_store import RUN_DB_PATH
+
+DATA_DIR = os.path.join('src', 'static', 'data')
+
+# Bolsa de cada símbolo, sus archivos y las etapas de su pipeline, en orden. Los datos son relativos a
+# src/static/data; cada símbolo necesita su propio directorio de modelos y su propio archivo de predicción
+PIPELINES = {
+    'AVAL': {
+        'tz': 'America/New_York',
+        'cierre': '16:00',
+        'historico': 'historical.csv',
+        'enriquecido': 'enriched_historical.csv',
+        'modelos': os.path.join('src', 'static', 'models'),
+        'prediccion': os.path.join('src', 'static', 'predictions', 'next_day_prediction.csv'),
+        'etapas': ['colectar', 'enriquecer', 'entrenar']
+    }
+}
+# Margen tras el cierre para que Yahoo publique la barra del día
+CLOSE_DELAY = timedelta(minutes=30)
+
+# Etapas simultáneas por tipo: las descargas esperan la red, el enriquecimiento y el entrenamiento usan CPU
+CONCURRENCY = {'colectar': 2, 'enriquecer': 1, 'entrenar': 1}
+
+# Reintentos de la descarga dentro de la etapa y de la etapa completa (estos últimos persisten entre reinicios)
+FETCH_ATTEMPTS = 4
+FETCH_BACKOFF = (5.0, 60.0)      # Base y tope en segundos
+JOB_ATTEMPTS = 5
+JOB_BACKOFF = (300.0, 3600.0)
+POLL_SECONDS = 30
+
+TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+JOB_SCHEMA = """
+CREATE TABLE IF NOT EXISTS trabajos (
+    simbolo TEXT NOT NULL,
+    dia TEXT NOT NULL,
+    etapa TEXT NOT NULL,
+    estado TEXT NOT NULL,
+    intentos INTEGER NOT NULL DEFAULT 0,
+    proximo_intento TEXT NOT NULL,
+    ultimo_error TEXT,
+    actualizado TEXT NOT NULL,
+    PRIMARY KEY (simbolo, dia)
+);
+CREATE INDEX IF NOT EXISTS idx_trabajos_estado_proximo ON trabajos (estado, proximo_intento);
+"""
+
+def backoff_delay(attempt, base, cap):
+    """Espera exponencial con jitter completo: uniforme entre 0 y min(tope, base·2^intento)."""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+def retry(func, attempts=FETCH_ATTEMPTS, base=FETCH_BACKOFF[0], cap=FETCH_BACKOFF[1], stop=None, on_retry=None):
+    """Llama a func hasta attempts veces, esperando entre fallos; con stop activado no vuelve a intentar."""
+    for attempt in range(attempts):
+        try:
+            return func()
+        except Exception as e:
+            if attempt == attempts - 1:
+                raise
+            delay = backoff_delay(attempt, base, cap)
+            if on_retry is not None:
+                on_retry(attempt + 1, delay, e)
+            if stop is not None:
+                if stop.wait(delay):
+                    raise
+            else:
+                time.sleep(delay)
+
+def last_session(now, tz, close):
+    """Último día hábil cuyo cierre (más el margen) ya pasó, y el instante UTC en que se dispara su trabajo."""
+    local = now.tz_convert(tz)
+    hour, minute = (int(part) for part in close.split(':'))
+
+    def trigger(day):
+        return pd.Timestamp(datetime.combine(day, datetime.min.time()), tz=tz) + timedelta(hours=hour, minutes=minute) + CLOSE_DELAY
+
+    day = local.date()
+    if local < trigger(day):
+        day -= timedelta(days=1)
+    while day.weekday() >= 5:
+        day -= timedelta(days=1)
+    return day, trigger(day).tz_convert('UTC')
+
+def _utc_text(timestamp):
+    return timestamp.tz_convert('UTC').strftime(TIME_FORMAT)
+
+class JobStore:
+    """Estado de los trabajos por símbolo y día en la base del historial: un reinicio retoma la etapa pendiente."""
+
+    def __init__(self, db_path=RUN_DB_PATH):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+        with closing(self._connect()) as con:
+            con.executescript(JOB_SCHEMA)
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def _execute(self, sql, params=()):
+        with closing(self._connect()) as con, con:
+            return con.execute(sql, params).rowcount
+
+    def ensure(self, symbol, day, stage, trigger):
+        """Crea el trabajo del día si aún no existe."""
+        now = _utc_text(pd.Timestamp.now(tz='UTC'))
+        self._execute(
+            "INSERT OR IGNORE INTO trabajos (simbolo, dia, etapa, estado, proximo_intento, actualizado) "
+            "VALUES (?, ?, ?, 'pendiente', ?, ?)",
+            (symbol, str(day), stage, _utc_text(trigger), now)
+        )
+
+    def due(self, now):
+        with closing(self._connect()) as con:
+            return con.execute(
+                "SELECT simbolo, dia FROM trabajos WHERE estado = 'pendiente' AND proximo_intento <= ? "
+                "ORDER BY proximo_intento", (_utc_text(now),)
+            ).fetchall()
+
+    def stage(self, symbol, day):
+        with closing(self._connect()) as con:
+            row = con.execute("SELECT etapa, intentos FROM trabajos WHERE simbolo = ? AND dia = ?", (symbol, day)).fetchone()
+        return row
+
+    def claim(self, symbol, day):
+        """Marca el trabajo en curso si seguía pendiente (False si otro ya lo tomó)."""
+        return self._execute(
+            "UPDATE trabajos SET estado = 'en_curso', actualizado = ? WHERE simbolo = ? AND dia = ? AND estado = 'pendiente'",
+            (_utc_text(pd.Timestamp.now(tz='UTC')), symbol, day)
+        ) == 1
+
+    def advance(self, symbol, day, next_stage, keep_running=True):
+        """Registra la etapa terminada: pasa a la siguiente (o a 'ok' si era la última) y reinicia los intentos."""
+        state = 'ok' if next_stage is None else ('en_curso' if keep_running else 'pendiente')
+        self._execute(
+            "UPDATE trabajos SET etapa = COALESCE(?, etapa), estado = ?, intentos = 0, ultimo_error = NULL, "
+            "actualizado = ? WHERE simbolo = ? AND dia = ?",
+            (next_stage, state, _utc_text(pd.Timestamp.now(tz='UTC')), symbol, day)
+        )
+
+    def fail(self, symbol, day, error, attempts):
+        """Reprograma la etapa con espera exponencial, o la deja 'fallido' al agotar los intentos."""
+        now = pd.Timestamp.now(tz='UTC')
+        retry_at = now + timedelta(seconds=backoff_delay(attempts, *JOB_BACKOFF))
+        state = 'fallido' if attempts + 1 >= JOB_ATTEMPTS else 'pendiente'
+        self._execute(
+            "UPDATE trabajos SET estado = ?, intentos = ?, proximo_intento = ?, ultimo_error = ?, actualizado = ? "
+            "WHERE simbolo = ? AND dia = ?",
+            (state, attempts + 1, _utc_text(retry_at), str(error)[:500], _utc_text(now), symbol, day)
+        )
+        return state, retry_at
+
+    def resume_interrupted(self):
+        """Los trabajos que quedaron en curso por un cierre abrupto vuelven a pendientes en la misma etapa."""
+        return self._execute("UPDATE trabajos SET estado = 'pendiente' WHERE estado = 'en_curso'")
+
+    def jobs(self, limit=20):
+        with closing(self._connect()) as con:
+            return pd.read_sql_query(
+                "SELECT simbolo, dia, etapa, estado, intentos, proximo_intento, ultimo_error, actualizado "
+                "FROM trabajos ORDER BY dia DESC, simbolo LIMIT ?", con, params=(limit,)
+            )
+
+class Scheduler:
+    """Proceso de larga duración: dispara el pipeline de cada símbolo tras el cierre de su bolsa.
+
+    Los módulos de las etapas se importan una sola vez y quedan cargados entre ejecuciones.
+    """
+
+    def __init__(self, pipelines=PIPELINES, concurrency=CONCURRENCY, store=None):
+        for key in ('historico', 'enriquecido', 'modelos', 'prediccion'):
+            paths = [os.path.normpath(config[key]) for config in pipelines.values()]
+            if len(set(paths)) < len(paths):
+                raise ValueError(f"Cada símbolo necesita su propio '{key}': {paths}")
+        self.pipelines = pipelines
+        self.jobs = store or JobStore()
+        self.logger = Logger()
+        self.stop = threading.Event()
+        self.limits = {stage: threading.Semaphore(limit) for stage, limit in concurrency.items()}
+        self.pool = ThreadPoolExecutor(max_workers=sum(concurrency.values()))
+        self.running = set()
+        self.running_lock = threading.Lock()
+        self.stages = {'colectar': self.collect, 'enriquecer': self.enrich, 'entrenar': self.train}
+
+    @staticmethod
+    def warm_up():
+        """Carga una vez las dependencias que las etapas importan de forma diferida (yfinance, sklearn)."""
+        import yfinance
+        import sklearn.ensemble
+        import sklearn.feature_selection
+        import sklearn.linear_model
+
+    def collect(self, symbol, config):
+        collector = DataCollector(symbol, os.path.join(DATA_DIR, config['historico']))
+
+        def download():
+            df = collector.fetch_data()
+            # yfinance no lanza excepción ante un fallo transitorio: devuelve una tabla vacía
+            if df.empty:
+                raise RuntimeError(f"Descarga vacía para {symbol}")
+            return df
+
+        def log_retry(attempt, delay, error):
+            self.logger.warning('Scheduler', 'collect', f"{symbol}: intento {attempt} fallido ({error}); reintento en {delay:.1f} s")
+
+        try:
+            df = retry(download, stop=self.stop, on_retry=log_retry)
+        except Exception as e:
+            collector.handle_error(str(e))
+            raise
+        collector.save_data(df)
+
+    def enrich(self, symbol, config):
+        enricher = DataEnricher(config['historico'])
+        # Solo se recalcula el tramo afectado por las filas nuevas
+        enricher.enrich_data(config['enriquecido'], incremental=True)
+
+    def train(self, symbol, config):
+        decision = drift.check(model_dir=config['modelos'], data_path=os.path.join(DATA_DIR, config['enriquecido']))
+        self.logger.info('Scheduler', 'train', f"{symbol}: monitor de deriva, reentrenar={decision['reentrenar']} ({decision['motivo']})")
+        predictor = StockPredictor(config['enriquecido'])
+        if decision['reentrenar']:
+            predictor.train(model_dir=config['modelos'])
+        predictor.predict_next_day(model_dir=config['modelos'], prediction_path=config['prediccion'])
+
+    def run_job(self, symbol, day):
+        """Ejecuta las etapas pendientes del trabajo en orden, respetando el tope de cada tipo de etapa."""
+        # Cada trabajo tiene su propio perfil: los trabajos simultáneos no se mezclan ni se vacían entre sí
+        with profiler.collect() as job_profile:
+            try:
+                self._run_stages(symbol, day)
+            finally:
+                with self.running_lock:
+                    self.running.discard((symbol, day))
+                job_profile.write(f'scheduler_{symbol}')
+
+    def _run_stages(self, symbol, day):
+        config = self.pipelines[symbol]
+        while not self.stop.is_set():
+            stage, attempts = self.jobs.stage(symbol, day)
+            with self.limits[stage]:
+                self.logger.info('Scheduler', 'run_job', f"{symbol} {day}: etapa {stage}")
+                try:
+                    self.stages[stage](symbol, config)
+                except Exception as e:
+                    state, retry_at = self.jobs.fail(symbol, day, e, attempts)
+                    self.logger.error('Scheduler', 'run_job',
+                                      f"{symbol} {day}: falló {stage} ({e}); "
+                                      + ("sin más reintentos" if state == 'fallido' else f"reintento a las {retry_at:%H:%M:%S} UTC"))
+                    return
+            stages = config['etapas']
+            position = stages.index(stage)
+            next_stage = stages[position + 1] if position + 1 < len(stages) else None
+            self.jobs.advance(symbol, day, next_stage, keep_running=not self.stop.is_set())
+            if next_stage is None:
+                self.logger.info('Scheduler', 'run_job', f"{symbol} {day}: pipeline completo")
+                return
+
+    def tick(self, now=None):
+        """Crea los trabajos de los cierres ya ocurridos y lanza los que están vencidos."""
+        now = now or pd.Timestamp.now(tz='UTC')
+        for symbol, config in self.pipelines.items():
+            day, trigger = last_session(now, config['tz'], config['cierre'])
+            self.jobs.ensure(symbol, day, config['etapas'][0], trigger)
+
+        submitted = []
+        for symbol, day in self.jobs.due(now):
+            with self.running_lock:
+                if (symbol, day) in self.running or not self.jobs.claim(symbol, day):
+                    continue
+                self.running.add((symbol, day))
+            submitted.append(self.pool.submit(self.run_job, symbol, day))
+        return submitted
+
+    def serve(self, once=False):
+        """Bucle principal; con once procesa los trabajos vencidos una vez y termina."""
+        with file_lock(f"{self.jobs.db_path}.scheduler"):  # Una sola instancia por base de trabajos
+            resumed = self.jobs.resume_interrupted()
+            if resumed:
+                self.logger.info('Scheduler', 'serve', f"Trabajos interrumpidos retomados: {resumed}")
+            while not self.stop.is_set():
+                futures = self.tick()
+                if once:
+                    for future in futures:
+                        future.result()
+                    break
+                self.stop.wait(POLL_SECONDS)
+            self.pool.shutdown(wait=True)
+
+def main():
+    parser = argparse.ArgumentParser(description="Programador local: ejecuta el pipeline tras cada cierre de mercado")
+    parser.add_argument('--una-vez', action='store_true', help="Procesa los trabajos vencidos y termina")
+    parser.add_argument('--estado', action='store_true', help="Muestra los trabajos recientes y termina")
+    args = parser.parse_args()
+
+    if args.estado:
+        print(JobStore().jobs().to_string(index=False))
+        return
+
+    scheduler = Scheduler()
+    scheduler.warm_up()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        # Termina la etapa en curso y guarda el avance antes de salir
+        signal.signal(signum, lambda *_: scheduler.stop.set())
+    scheduler.serve(once=args.una_vez)
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,90 @@
+import os
+import shutil
+import tempfile
+from multiprocessing import shared_memory
+
+import numpy as np
+
+# Segmentos abiertos por este proceso al adjuntarse (las vistas son válidas mientras sigan abiertos)
+_attached = {}
+# Arreglos adjuntados en un proceso de trabajo por init_worker
+_worker_arrays = {}
+
+class SharedArrays:
+    """Publica arreglos NumPy una sola vez en memoria compartida (o en .npy mapeados) para varios procesos.
+
+    Los procesos de trabajo reciben solo los descriptores (nombre, forma y tipo) y se adjuntan sin copiar.
+    """
+
+    def __init__(self, arrays, backend='shm', directory=None):
+        if backend not in ('shm', 'memmap'):
+            raise ValueError(f"Backend no soportado: {backend}")
+        self.backend = backend
+        self.handles = {}
+        self.arrays = {}
+        self._segments = []
+        self._directory = None
+        if backend == 'memmap':
+            self._directory = directory or tempfile.mkdtemp(prefix='aval_shared_')
+            os.makedirs(self._directory, exist_ok=True)
+
+        for name, array in arrays.items():
+            array = np.ascontiguousarray(array)
+            handle = {'backend': backend, 'shape': array.shape, 'dtype': array.dtype.str}
+            if backend == 'shm':
+                segment = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+                view = np.ndarray(array.shape, dtype=array.dtype, buffer=segment.buf)
+                view[...] = array
+                self._segments.append(segment)
+                handle['name'] = segment.name
+            else:
+                path = os.path.join(self._directory, f"{name}.npy")
+                np.save(path, array)
+                view = np.load(path, mmap_mode='r')
+                handle['path'] = path
+            self.handles[name] = handle
+            self.arrays[name] = view
+
+    def close(self):
+        """Libera la memoria compartida o borra los archivos mapeados."""
+        self.arrays = {}
+        for segment in self._segments:
+            segment.close()
+            segment.unlink()
+        self._segments = []
+        if self._directory is not None:
+            shutil.rmtree(self._directory, ignore_errors=True)
+            self._directory = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def attach(handle):
+    """Vista de solo lectura, sin copia, del arreglo descrito por handle."""
+    if handle['backend'] == 'memmap':
+        return np.load(handle['path'], mmap_mode='r')
+
+    name = handle['name']
+    if name not in _attached:
+        try:
+            segment = shared_memory.SharedMemory(name=name, track=False)  # Python 3.13+
+        except TypeError:
+            # Antes de 3.13 el segmento se registra en el resource tracker, que los procesos
+            # de trabajo heredan del creador: lo libera el creador con unlink()
+            segment = shared_memory.SharedMemory(name=name)
+        _attached[name] = segment
+    array = np.ndarray(handle['shape'], dtype=np.dtype(handle['dtype']), buffer=_attached[name].buf)
+    array.flags.writeable = False
+    return array
+
+def init_worker(handles):
+    """Inicializador de procesos de trabajo: se adjunta una vez a todos los arreglos publicados."""
+    for name, handle in handles.items():
+        _worker_arrays[name] = attach(handle)
+
+def get(name):
+    """Arreglo adjuntado por init_worker en este proceso."""
+    return _worker_arrays[name]
\ No newline at end of file
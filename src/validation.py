@@ -0,0 +1,210 @@
+import argparse
+import os
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from data_io import file_lock, write_csv
+from history_merge import changed_rows, sort_by_date
+
+HISTORICAL_PATH = os.path.join('src', 'static', 'data', 'historical.csv')
+QUARANTINE_PATH = os.path.join('src', 'static', 'data', 'quarantine.csv')
+
+PRICE_COLUMNS = ['Open AVAL', 'High AVAL', 'Low AVAL', 'Close AVAL', 'Adj Close AVAL']
+
+# Reglas declarativas: tipo de verificación, columnas, parámetros y acción.
+# 'cuarentena' saca la fila del histórico; 'aviso' solo la reporta.
+RULES = [
+    {'regla': 'precio_faltante', 'tipo': 'no_nulo', 'columnas': PRICE_COLUMNS, 'accion': 'cuarentena'},
+    {'regla': 'precio_no_positivo', 'tipo': 'positivo', 'columnas': PRICE_COLUMNS, 'accion': 'cuarentena'},
+    {'regla': 'high_menor_que_low', 'tipo': 'orden', 'columnas': ['Low AVAL', 'High AVAL'], 'accion': 'cuarentena'},
+    {'regla': 'volumen_cero', 'tipo': 'positivo', 'columnas': ['Volume AVAL'], 'accion': 'cuarentena'},
+    {'regla': 'fecha_duplicada', 'tipo': 'unico', 'columnas': ['Date'], 'accion': 'cuarentena'},
+    # Salto aislado: el log-retorno supera el umbral y el día siguiente lo revierte (o aún no existe)
+    {'regla': 'salto_de_precio', 'tipo': 'salto', 'columnas': ['Adj Close AVAL'], 'umbral': 0.4, 'accion': 'cuarentena'},
+    {'regla': 'open_fuera_de_rango', 'tipo': 'dentro_de', 'columnas': ['Open AVAL', 'Low AVAL', 'High AVAL'],
+     'tolerancia': 1e-6, 'accion': 'aviso'},
+    {'regla': 'close_fuera_de_rango', 'tipo': 'dentro_de', 'columnas': ['Close AVAL', 'Low AVAL', 'High AVAL'],
+     'tolerancia': 1e-6, 'accion': 'aviso'}
+]
+
+def _values(frame, col):
+    return frame[col].to_numpy(dtype='float64') if col in frame.columns else np.full(len(frame), np.nan)
+
+def _check_not_null(frame, rule, context):
+    return np.column_stack([np.isnan(_values(frame, col)) for col in rule['columnas']]).any(axis=1)
+
+def _check_positive(frame, rule, context):
+    # Los faltantes los reporta no_nulo
+    return np.column_stack([_values(frame, col) <= 0 for col in rule['columnas']]).any(axis=1)
+
+def _check_order(frame, rule, context):
+    low, high = (_values(frame, col) for col in rule['columnas'])
+    return low > high
+
+def _check_within(frame, rule, context):
+    value, low, high = (_values(frame, col) for col in rule['columnas'])
+    tolerance = rule.get('tolerancia', 0.0)
+    return (value < low * (1 - tolerance)) | (value > high * (1 + tolerance))
+
+def _check_unique(frame, rule, context):
+    # Se conserva la última fila de cada fecha, igual que al fusionar
+    return context['duplicadas']
+
+def _check_jump(frame, rule, context):
+    column = rule['columnas'][0]
+    value = _values(frame, column)
+    previous, following = context['vecinos'][column]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        jump = np.log(value / previous)
+        back = np.log(following / value)
+    threshold = rule['umbral']
+    reverts = np.isnan(back) | ((np.abs(back) > threshold / 2) & (np.sign(back) != np.sign(jump)))
+    return (np.abs(jump) > threshold) & reverts
+
+CHECKS = {
+    'no_nulo': _check_not_null,
+    'positivo': _check_positive,
+    'orden': _check_order,
+    'dentro_de': _check_within,
+    'unico': _check_unique,
+    'salto': _check_jump
+}
+
+def _neighbors(new_df, old_df, column, date_col='Date'):
+    """Valor anterior y siguiente de cada fila de la descarga (en los bordes, los del histórico guardado)."""
+    values = _values(new_df, column)
+    before = after = np.nan
+    if old_df is not None and len(old_df) and len(new_df):
+        old_dates = old_df[date_col].to_numpy()
+        old_values = _values(old_df, column)
+        first = int(np.searchsorted(old_dates, new_df[date_col].iloc[0], side='left'))
+        last = int(np.searchsorted(old_dates, new_df[date_col].iloc[-1], side='right'))
+        before = old_values[first - 1] if first > 0 else np.nan
+        after = old_values[last] if last < len(old_values) else np.nan
+    return np.r_[before, values[:-1]], np.r_[values[1:], after]
+
+def candidate_rows(old_df, new_df, date_col='Date'):
+    """Máscara de filas de la descarga que son nuevas o cambian un valor ya guardado."""
+    if old_df is None or not len(old_df):
+        return np.ones(len(new_df), dtype=bool)
+    old_dates = old_df[date_col].to_numpy()
+    new_dates = new_df[date_col].to_numpy()
+    positions = np.searchsorted(old_dates, new_dates, side='left')
+    inside = positions < len(old_dates)
+    matched = np.zeros(len(new_dates), dtype=bool)
+    matched[inside] = old_dates[positions[inside]] == new_dates[inside]
+
+    candidates = ~matched
+    if matched.any():
+        columns = [col for col in new_df.columns if col != date_col and col in old_df.columns]
+        old_rows = old_df.iloc[positions[matched]][columns].reset_index(drop=True)
+        new_rows = new_df[matched][columns].reset_index(drop=True)
+        candidates[np.flatnonzero(matched)] = changed_rows(old_rows, new_rows)
+    return candidates
+
+def validate(new_df, old_df=None, rules=RULES, full=False, date_col='Date'):
+    """Aplica las reglas vectorizadas a las filas nuevas o cambiadas (a todas con full=True).
+
+    Devuelve un dict con las filas válidas de la descarga, las de cuarentena (con la columna 'Reglas'),
+    las filas revisadas y los conteos por regla.
+    """
+    new_df = new_df.sort_values(date_col, kind='stable').reset_index(drop=True)
+    if old_df is not None:
+        old_df = sort_by_date(old_df, date_col)
+    duplicated = new_df[date_col].duplicated(keep='last').to_numpy()
+    candidates = np.ones(len(new_df), dtype=bool) if full else candidate_rows(old_df, new_df, date_col)
+    candidates |= duplicated
+
+    frame = new_df[candidates]
+    context = {'duplicadas': duplicated[candidates], 'vecinos': {}}
+    for rule in rules:
+        if rule['tipo'] == 'salto':
+            column = rule['columnas'][0]
+            unique = new_df[~duplicated]
+            previous, following = _neighbors(unique, None if full else old_df, column, date_col)
+            # Alinear los vecinos (calculados sin duplicados) con las filas candidatas
+            index = np.maximum(np.cumsum(~duplicated) - 1, 0)
+            context['vecinos'][column] = (previous[index][candidates], following[index][candidates])
+
+    quarantine = np.zeros(len(frame), dtype=bool)
+    failed_rules = np.full(len(frame), '', dtype=object)
+    counts, warnings = {}, {}
+    for rule in rules:
+        failed = CHECKS[rule['tipo']](frame, rule, context)
+        if rule['accion'] == 'cuarentena':
+            counts[rule['regla']] = int(failed.sum())
+            quarantine |= failed
+            failed_rules[failed] = failed_rules[failed] + rule['regla'] + ';'
+        else:
+            warnings[rule['regla']] = int(failed.sum())
+
+    bad = np.zeros(len(new_df), dtype=bool)
+    bad[np.flatnonzero(candidates)[quarantine]] = True
+    quarantined = new_df[bad].copy()
+    quarantined['Reglas'] = [rules_text.rstrip(';') for rules_text in failed_rules[quarantine]]
+    return {
+        'validas': new_df[~bad].reset_index(drop=True),
+        'cuarentena': quarantined.reset_index(drop=True),
+        'revisadas': int(candidates.sum()),
+        'conteos': counts,
+        'avisos': warnings
+    }
+
+def quarantine_rows(rows, symbol, path=QUARANTINE_PATH):
+    """Agrega las filas rechazadas al archivo de cuarentena (sin repetir fecha y reglas ya registradas)."""
+    if not len(rows):
+        return 0
+    rows = rows.copy()
+    rows.insert(0, 'Símbolo', symbol)
+    rows['Detectado'] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    with file_lock(path):
+        if os.path.exists(path):
+            existing = pd.read_csv(path, parse_dates=['Date'])
+            known = set(zip(existing['Símbolo'], existing['Date'], existing['Reglas']))
+            rows = rows[[key not in known for key in zip(rows['Símbolo'], rows['Date'], rows['Reglas'])]]
+            if not len(rows):
+                return 0
+            rows = pd.concat([existing, rows], ignore_index=True)
+            added = len(rows) - len(existing)
+        else:
+            added = len(rows)
+        write_csv(rows, path)
+    return added
+
+def record_result(symbol, result, mode):
+    """Guarda en el historial de ejecuciones las filas revisadas y los conteos por regla."""
+    from run_store import RunStore
+    RunStore().record_validation(symbol, mode, result['revisadas'], result['conteos'], result['avisos'])
+
+def summary_text(result):
+    """Resumen de una línea con las reglas que fallaron."""
+    failed = {rule: n for rule, n in {**result['conteos'], **result['avisos']}.items() if n}
+    details = ', '.join(f"{rule}={n}" for rule, n in failed.items()) or 'sin fallos'
+    return f"{result['revisadas']} filas revisadas, {len(result['cuarentena'])} en cuarentena ({details})"
+
+def main():
+    parser = argparse.ArgumentParser(description="Validación completa del histórico con las reglas de calidad")
+    parser.add_argument('--archivo', default=HISTORICAL_PATH)
+    parser.add_argument('--simbolo', default='AVAL')
+    parser.add_argument('--cuarentena', action='store_true',
+                        help="Saca del histórico las filas que fallan y marca el rango para el enriquecedor")
+    args = parser.parse_args()
+
+    from adjustments import mark_range
+
+    with file_lock(args.archivo):
+        history = pd.read_csv(args.archivo, parse_dates=['Date'])
+        result = validate(history, full=True)
+        print(summary_text(result))
+        if args.cuarentena and len(result['cuarentena']):
+            quarantine_rows(result['cuarentena'], args.simbolo)
+            write_csv(result['validas'], args.archivo)
+            # El enriquecedor recalcula desde la primera fila retirada
+            mark_range(result['cuarentena']['Date'].min(), None, 'validacion')
+            print(f"Filas retiradas del histórico: {len(result['cuarentena'])}")
+    record_result(args.simbolo, result, 'completa')
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Los módulos del pipeline son archivos sueltos en src (igual que al ejecutarlos con python src/<módulo>.py)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
\ No newline at end of file
@@ -0,0 +1,98 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from adjustments import clear_ranges, detect_adjustment, mark_range, pending_ranges, rescale_prefix
+
+def history(days=12):
+    close = np.linspace(300.0, 311.0, days)
+    return pd.DataFrame({
+        'Date': pd.bdate_range('2024-01-01', periods=days),
+        'Open AVAL': close, 'High AVAL': close + 2, 'Low AVAL': close - 2,
+        'Close AVAL': close, 'Adj Close AVAL': close * 0.9,
+        'Volume AVAL': np.full(days, 1000, dtype='int64'),
+        'Dividends AVAL': 0.0, 'Stock Splits AVAL': 0.0
+    })
+
+def download(full, start, event, adj_factor, price_factor=1.0, column=None):
+    """Descarga desde la fila start con las filas anteriores a event reescaladas por los factores."""
+    new = full.iloc[start:].reset_index(drop=True)
+    head = slice(0, event - start - 1)
+    new.loc[head, 'Adj Close AVAL'] *= adj_factor
+    for col in ['Open AVAL', 'High AVAL', 'Low AVAL', 'Close AVAL']:
+        new.loc[head, col] *= price_factor
+    if column:
+        new.loc[event - start, column] = 1.0
+    return new
+
+def test_unchanged_or_disjoint_download_is_not_an_event():
+    full = history()
+    assert detect_adjustment(full.iloc[:10], full.iloc[5:]) is None
+    assert detect_adjustment(full.iloc[:5], full.iloc[5:]) is None
+
+def test_dividend_rescales_rows_before_event():
+    full = history()
+    old = full.iloc[:10]
+    new = download(full, 5, 8, 0.95, column='Dividends AVAL')
+    event = detect_adjustment(old, new)
+    assert event['motivo'] == 'dividendo'
+    assert event['desde'] == full['Date'][8]
+    assert event['factores'] == pytest.approx({'ajustado': 0.95, 'precio': 1.0})
+    # Las cinco filas guardadas antes de la descarga se corrigen localmente
+    assert event['filas_previas'] == 5
+
+def test_split_in_new_rows_is_detected():
+    full = history()
+    old = full.iloc[:10]
+    # El cambio llega hasta la última fila guardada: el evento está entre las filas nuevas
+    new = download(full, 5, 11, 0.5, 0.5, column='Stock Splits AVAL')
+    event = detect_adjustment(old, new)
+    assert event['motivo'] == 'split'
+    assert event['desde'] == full['Date'][10]
+    assert event['factores'] == pytest.approx({'ajustado': 0.5, 'precio': 0.5})
+
+def test_non_uniform_change_is_a_revision():
+    full = history()
+    old = full.iloc[:10]
+    new = full.iloc[5:].reset_index(drop=True)
+    new.loc[1, 'Close AVAL'] *= 1.01
+    new.loc[3, 'Close AVAL'] *= 1.02
+    event = detect_adjustment(old, new)
+    assert event['motivo'] == 'revision' and event['factores'] is None
+    assert event['desde'] == full['Date'][6]
+
+def test_rescale_prefix_matches_event_factors():
+    full = history()
+    split = rescale_prefix(full, 4, {'ajustado': 0.5, 'precio': 0.5})
+    np.testing.assert_allclose(split['Adj Close AVAL'][:4], full['Adj Close AVAL'][:4] * 0.5)
+    np.testing.assert_allclose(split['Close AVAL'][:4], full['Close AVAL'][:4] * 0.5)
+    assert list(split['Volume AVAL'][:4]) == [2000] * 4
+    assert split['Volume AVAL'].dtype == full['Volume AVAL'].dtype
+    pd.testing.assert_frame_equal(split.iloc[4:], full.iloc[4:])
+
+    # Un dividendo solo cambia el precio ajustado; la entrada no se modifica
+    dividend = rescale_prefix(full, 4, {'ajustado': 0.95, 'precio': 1.0})
+    pd.testing.assert_frame_equal(dividend.drop(columns='Adj Close AVAL'), full.drop(columns='Adj Close AVAL'))
+    assert full['Adj Close AVAL'][0] == pytest.approx(270.0)
+    assert rescale_prefix(full, 0, {'ajustado': 0.5, 'precio': 0.5}) is full
+
+def test_detected_event_reproduces_download():
+    """Reescalar el histórico guardado con los factores detectados reproduce las filas descargadas."""
+    full = history()
+    old = full.iloc[:10]
+    new = download(full, 5, 8, 0.95, column='Dividends AVAL')
+    event = detect_adjustment(old, new)
+    n_rows = int(np.searchsorted(old['Date'], event['desde']))
+    rescaled = rescale_prefix(old, n_rows, event['factores'])
+    np.testing.assert_allclose(rescaled['Adj Close AVAL'][5:], new['Adj Close AVAL'][:5])
+
+def test_marked_ranges_round_trip(tmp_path):
+    path = str(tmp_path / 'recompute_ranges.json')
+    assert pending_ranges(path) == []
+    mark_range('2024-01-10', {'ajustado': 0.95, 'precio': 1.0}, 'dividendo', path=path)
+    mark_range(pd.Timestamp('2024-01-03'), path=path)
+    ranges = pending_ranges(path)
+    assert [entry['desde'] for entry in ranges] == [pd.Timestamp('2024-01-10'), pd.Timestamp('2024-01-03')]
+    assert [entry['motivo'] for entry in ranges] == ['dividendo', 'revision']
+    clear_ranges(path)
+    assert pending_ranges(path) == []
\ No newline at end of file
@@ -0,0 +1,71 @@
+import os
+
+import joblib
+import pandas as pd
+import pytest
+
+import artifacts
+
+def write_model(paths, tag):
+    for name in ('model', 'scaler', 'selector'):
+        joblib.dump({'artefacto': name, 'entrenamiento': tag}, paths[name])
+    pd.Series(['f1', 'f2']).to_csv(paths['features'], index=False)
+
+def versions(model_dir):
+    return sorted(os.listdir(os.path.join(model_dir, artifacts.VERSIONS_DIR)))
+
+def test_fresh_directory_is_not_trained(tmp_path):
+    with pytest.raises(artifacts.ModelNotTrainedError, match="aval-tracker entrenar"):
+        artifacts.load_artifacts(str(tmp_path))
+    # Los llamadores que ya capturaban FileNotFoundError siguen funcionando
+    assert issubclass(artifacts.ModelNotTrainedError, FileNotFoundError)
+
+def test_publish_switches_current_version(tmp_path):
+    model_dir = str(tmp_path)
+    with artifacts.publish(model_dir) as paths:
+        write_model(paths, 1)
+        # Mientras se prepara, la versión nueva no es visible
+        assert artifacts.current_version(model_dir) is None
+    loaded = artifacts.load_artifacts(model_dir)
+    assert loaded['version'] == artifacts.current_version(model_dir) == versions(model_dir)[0]
+    assert loaded['model'] == {'artefacto': 'model', 'entrenamiento': 1}
+    assert loaded['features'] == ['f1', 'f2'] and loaded['metrics'] is None
+
+def test_failed_publish_rolls_back(tmp_path):
+    model_dir = str(tmp_path)
+    with artifacts.publish(model_dir) as paths:
+        write_model(paths, 1)
+    published = artifacts.current_version(model_dir)
+
+    with pytest.raises(RuntimeError):
+        with artifacts.publish(model_dir) as paths:
+            write_model(paths, 2)
+            raise RuntimeError("entrenamiento interrumpido")
+    # Sin carpeta de preparación huérfana y con la versión anterior vigente e intacta
+    assert versions(model_dir) == [published]
+    assert artifacts.current_version(model_dir) == published
+    assert artifacts.load_artifacts(model_dir)['model']['entrenamiento'] == 1
+
+def test_publish_prunes_old_versions(tmp_path):
+    model_dir = str(tmp_path)
+    published = []
+    for tag in range(5):
+        with artifacts.publish(model_dir) as paths:
+            write_model(paths, tag)
+        published.append(artifacts.current_version(model_dir))
+    assert versions(model_dir) == published[-artifacts.KEEP_VERSIONS:]
+    assert artifacts.load_artifacts(model_dir)['model']['entrenamiento'] == 4
+
+def test_prune_never_removes_current(tmp_path):
+    model_dir = str(tmp_path)
+    for tag in range(2):
+        with artifacts.publish(model_dir) as paths:
+            write_model(paths, tag)
+    first, second = versions(model_dir)
+    # Puntero devuelto a una versión antigua (p.ej. a mano): la poda la conserva
+    with open(os.path.join(model_dir, artifacts.CURRENT_FILE), 'w', encoding='utf-8') as file:
+        file.write(first)
+    artifacts.prune(model_dir, keep=1)
+    assert versions(model_dir) == [first, second]
+    artifacts.prune(model_dir, keep=0)
+    assert versions(model_dir) == [first]
\ No newline at end of file
@@ -0,0 +1,74 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import backtester
+
+def naive_backtest(pct, returns, buy, sell, cost, fraction=1.0, scale=None, allow_short=False,
+                   periods=backtester.PERIODS_PER_YEAR):
+    """Referencia día a día: decide la posición, cobra el costo del cambio y acumula la equity."""
+    position, peak, equity = 0.0, 1.0, 1.0
+    strategy, drawdowns = [], []
+    trades = days_in_market = hits = 0
+    for change, ret in zip(pct, returns):
+        size = fraction if scale is None else fraction * min(abs(change) / scale, 1.0)
+        previous = position
+        if change > buy:
+            position = size
+        elif change < -sell:
+            position = -size if allow_short else 0.0
+        day = position * ret - cost / 100 * abs(position - previous)
+        trades += position != previous
+        if position != 0:
+            days_in_market += 1
+            hits += position * ret > 0
+        equity *= 1 + day
+        peak = max(peak, equity)
+        strategy.append(day)
+        drawdowns.append(equity / peak - 1)
+    strategy = np.array(strategy)
+    std = strategy.std(ddof=1)
+    return {
+        'Retorno total': equity - 1,
+        'Máx. drawdown': min(drawdowns),
+        'Tasa de acierto': hits / days_in_market if days_in_market else np.nan,
+        'Sharpe': strategy.mean() / std * np.sqrt(periods) if std > 0 else np.nan,
+        'Operaciones': trades,
+        'Días en mercado': days_in_market
+    }
+
+@pytest.fixture
+def series():
+    rng = np.random.default_rng(7)
+    prices = 100 * np.cumprod(1 + rng.normal(0, 0.01, 300))
+    pct = rng.normal(0, 1.0, len(prices))
+    return pct, backtester.next_day_returns(prices)
+
+@pytest.mark.parametrize('scale', [None, 1.5])
+@pytest.mark.parametrize('allow_short', [False, True])
+def test_simulate_matches_daily_loop(series, scale, allow_short):
+    pct, returns = series
+    grid = backtester.parameter_grid([0.0, 0.5], [0.0, 0.8], [0.0, 0.1], [1.0, 0.5])
+    params = grid.to_numpy()
+    result = backtester.simulate(pct, returns, params[:, 0], params[:, 1], params[:, 2], params[:, 3],
+                                 scale, allow_short)
+    for i, (buy, sell, cost, fraction) in enumerate(params):
+        expected = naive_backtest(pct[:len(returns)], returns, buy, sell, cost, fraction, scale, allow_short)
+        for name in backtester.METRIC_COLUMNS:
+            np.testing.assert_allclose(result[name][i], expected[name], rtol=1e-9, atol=1e-12, err_msg=name)
+
+def test_sweep_matches_single_backtest(series):
+    """El barrido por bloques da las mismas métricas que cada backtest por separado."""
+    pct, returns = series
+    prices = np.concatenate([[100.0], 100 * np.cumprod(1 + returns)])
+    history = pd.DataFrame({
+        'Date': pd.date_range('2024-01-01', periods=len(prices), freq='B'),
+        'Último valor conocido': prices,
+        'Cambio porcentual': np.append(pct[:len(returns)], 0.0)
+    })
+    grid = backtester.parameter_grid([0.0, 0.3], [0.2], [0.1], [1.0])
+    swept = backtester.sweep(history, grid, workers=1, block=1)
+    for i, row in grid.iterrows():
+        _, metrics = backtester.backtest(history, row['Umbral compra'], row['Umbral venta'], row['Costo %'], row['Fracción'])
+        for name in backtester.METRIC_COLUMNS:
+            np.testing.assert_allclose(swept.loc[i, name], metrics[name], rtol=1e-12, err_msg=name)
\ No newline at end of file
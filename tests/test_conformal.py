@@ -0,0 +1,29 @@
+import math
+
+import numpy as np
+import pytest
+
+from conformal import ResidualRing
+
+@pytest.mark.parametrize('size', [1, 5, 50])
+def test_ring_matches_sorted_window(size):
+    rng = np.random.default_rng(size)
+    # Valores repetidos a propósito: la búsqueda binaria debe quitar una sola copia del que sale
+    values = rng.integers(0, 20, 300).astype('float64')
+    ring = ResidualRing(size)
+    for n, value in enumerate(values, start=1):
+        ring.push(value)
+        window = values[max(n - size, 0):n]
+        np.testing.assert_array_equal(ring.sorted, np.sort(window))
+        np.testing.assert_array_equal(ring.chronological(), window)
+        for level in (0.5, 0.8, 0.95):
+            rank = math.ceil((len(window) + 1) * level)
+            expected = np.sort(window)[rank - 1] if rank <= len(window) else np.inf
+            assert ring.quantile(level) == expected
+
+def test_ring_restores_from_chronological():
+    """Reconstruir el búfer desde su orden cronológico (como al cargar el estado) da el mismo anillo."""
+    ring = ResidualRing(10, np.random.default_rng(0).random(37))
+    restored = ResidualRing(10, ring.chronological())
+    np.testing.assert_array_equal(restored.sorted, ring.sorted)
+    np.testing.assert_array_equal(restored.chronological(), ring.chronological())
\ No newline at end of file
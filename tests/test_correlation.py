@@ -0,0 +1,48 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from correlation import CorrelationStore, RollingCovariance, tri_index, unpack
+
+@pytest.mark.parametrize('refresh', [None, 7])
+def test_rolling_covariance_matches_np_cov(refresh):
+    rng = np.random.default_rng(3)
+    returns = rng.normal(0, 0.02, (200, 4))
+    window = 20
+    engine = RollingCovariance(4, window, refresh=refresh)
+    upper = np.triu_indices(4)
+    for t, row in enumerate(returns):
+        engine.push(row)
+        if t >= 1:
+            expected = np.cov(returns[max(t - window + 1, 0):t + 1], rowvar=False)[upper]
+            np.testing.assert_allclose(engine.covariance(), expected, rtol=1e-9, atol=1e-15)
+
+def test_unpack_and_tri_index_agree():
+    rng = np.random.default_rng(5)
+    matrix = np.cov(rng.normal(size=(30, 5)), rowvar=False)
+    tri = matrix[np.triu_indices(5)]
+    np.testing.assert_allclose(unpack(tri, 5), matrix)
+    for i in range(5):
+        for j in range(5):
+            assert tri[tri_index(i, j, 5)] == matrix[i, j]
+
+def test_incremental_update_matches_full_recompute(tmp_path):
+    """Anexar los días nuevos deja el mismo archivo que recalcular todo desde cero."""
+    rng = np.random.default_rng(11)
+    returns = rng.normal(0, 0.01, (150, 3))
+    timestamps = pd.bdate_range('2024-01-01', periods=len(returns)).as_unit('ns').asi8
+    symbols = ['AVAL', 'CIB', 'SPY']
+
+    incremental = CorrelationStore(window=30, root=str(tmp_path / 'incremental'))
+    incremental.update(symbols, 'SPY', timestamps[:100], returns[:100])
+    added = incremental.update(symbols, 'SPY', timestamps, returns)
+    full = CorrelationStore(window=30, root=str(tmp_path / 'full'))
+    full.update(symbols, 'SPY', timestamps, returns, full=True)
+
+    assert added == 50
+    _, appended = incremental.records()
+    _, recomputed = full.records()
+    np.testing.assert_array_equal(appended['ts'], recomputed['ts'])
+    # float32 en disco: las sumas móviles y el recálculo difieren solo en el redondeo
+    np.testing.assert_allclose(appended['tri'], recomputed['tri'], rtol=1e-5)
+    np.testing.assert_allclose(full.betas()['AVAL'], recomputed['tri'][:, tri_index(0, 2, 3)] / recomputed['tri'][:, tri_index(2, 2, 3)], rtol=1e-6)
\ No newline at end of file
@@ -0,0 +1,67 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import data_service
+from data_service import DataService
+
+@pytest.fixture
+def service(tmp_path):
+    dates = pd.bdate_range('2019-11-01', '2023-02-28')
+    rng = np.random.default_rng(1)
+    df = pd.DataFrame({
+        'Date': dates,
+        'Adj Close AVAL': rng.normal(2.5, 0.1, len(dates)),
+        'Volume AVAL': rng.integers(1000, 9000, len(dates)),
+        'Year': dates.year
+    })
+    # Filas desordenadas en el CSV: la vista las publica ordenadas por fecha
+    csv_path = tmp_path / 'enriched.csv'
+    df.sample(frac=1, random_state=0).to_csv(csv_path, index=False)
+    service = DataService(str(csv_path), str(tmp_path / 'enriched.sqlite'))
+    service.refresh()
+    return service, df
+
+@pytest.mark.parametrize('years', [(2019, 2019), (2020, 2021), (2019, 2023), (2023, 2030), (2015, 2018)])
+def test_query_years_matches_boolean_mask(service, years):
+    service, df = service
+    result = service.query_years(['Adj Close AVAL', 'Year'], *years)
+    expected = df[(df['Year'] >= years[0]) & (df['Year'] <= years[1])][['Date', 'Adj Close AVAL', 'Year']]
+    pd.testing.assert_frame_equal(result, expected.reset_index(drop=True), check_dtype=False)
+
+def test_year_bounds(service):
+    service, _ = service
+    assert service.year_bounds() == (2019, 2023)
+def test_refresh_keeps_view_while_csv_is_unchanged(service, monkeypatch):
+    service, _ = service
+    version = service.version()
+    published = os.stat(service.db_path).st_ino
+    monkeypatch.setattr(service, '_build', lambda version: pytest.fail("la vista no debía reconstruirse"))
+    assert service.refresh() == version
+    assert os.stat(service.db_path).st_ino == published
+
+def test_refresh_rebuilds_when_csv_changes(service):
+    service, df = service
+    old_version = service.version()
+    service.columns()
+    dates = pd.bdate_range('2023-03-01', '2024-01-31')
+    extra = pd.DataFrame({'Date': dates, 'Adj Close AVAL': 3.0, 'Volume AVAL': 5000, 'Year': dates.year})
+    changed = pd.concat([df, extra], ignore_index=True).assign(RSI=50.0)
+    changed.to_csv(service.csv_path, index=False)
+
+    new_version = service.refresh()
+    assert new_version != old_version and service.version() == new_version
+    # La lista de columnas en caché se descarta junto con la versión anterior
+    assert 'RSI' in service.columns()
+    assert service.year_bounds() == (2019, 2024)
+    assert len(service.query_years(['Adj Close AVAL'], 2024, 2024)) == (dates.year == 2024).sum()
+    assert service.stats().loc['count', 'Adj Close AVAL'] == len(changed)
+
+def test_refresh_rebuilds_on_new_view_layout(service, monkeypatch):
+    service, _ = service
+    old_version = service.version()
+    monkeypatch.setattr(data_service, 'VIEW_LAYOUT', data_service.VIEW_LAYOUT + 1)
+    assert service.refresh() != old_version
+    assert service.version().endswith(f"-v{data_service.VIEW_LAYOUT}")
\ No newline at end of file
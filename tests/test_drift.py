@@ -0,0 +1,99 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import artifacts
+from drift import DriftMonitor, reference_profile, save_reference, welford_merge
+
+FEATURES = ['f1', 'f2', 'f3', 'f4', 'Month']
+TRAIN_ROWS = 200
+
+def dataset(new_rows, shifted=(), seed=0):
+    """Filas diarias iid; las posteriores al entrenamiento de las columnas shifted se desplazan 5σ."""
+    rng = np.random.default_rng(seed)
+    n = TRAIN_ROWS + new_rows
+    df = pd.DataFrame(rng.normal(size=(n, 4)), columns=FEATURES[:4])
+    df.insert(0, 'Date', pd.date_range('2024-01-01', periods=n, freq='D'))
+    df['Month'] = df['Date'].dt.month
+    for feature in shifted:
+        df.loc[TRAIN_ROWS:, feature] += 5.0
+    return df
+
+@pytest.fixture
+def model_dir(tmp_path):
+    """Versión publicada con la referencia de las primeras TRAIN_ROWS filas, como al entrenar."""
+    with artifacts.publish(str(tmp_path)) as paths:
+        save_reference(reference_profile(dataset(0), FEATURES), paths['reference'])
+    return str(tmp_path)
+
+def test_welford_merge_matches_numpy():
+    values = np.random.default_rng(1).normal(3.0, 2.0, 500)
+    values[::17] = np.nan
+    stats = [0, 0.0, 0.0]
+    for batch in np.array_split(values, 7):
+        stats = welford_merge(stats, batch)
+    clean = values[~np.isnan(values)]
+    assert stats[0] == len(clean)
+    assert stats[1] == pytest.approx(clean.mean())
+    assert stats[2] / (stats[0] - 1) == pytest.approx(clean.var(ddof=1))
+    assert welford_merge(stats, [np.nan]) is stats
+
+def test_reference_skips_calendar_features(model_dir):
+    monitor = DriftMonitor(model_dir)
+    assert sorted(monitor.reference['caracteristicas']) == ['f1', 'f2', 'f3', 'f4']
+    assert monitor.reference['hasta'] == str(pd.Timestamp('2024-01-01') + pd.Timedelta(days=TRAIN_ROWS - 1))
+
+def test_without_reference_retrains(tmp_path):
+    monitor = DriftMonitor(str(tmp_path))
+    assert monitor.update(dataset(10)) == 0
+    decision = monitor.decision()
+    assert decision['reentrenar'] and decision['motivo'] == "no hay referencia de entrenamiento"
+
+def test_without_new_rows_keeps_model(model_dir):
+    monitor = DriftMonitor(model_dir)
+    assert monitor.update(dataset(0)) == 0
+    decision = monitor.decision()
+    assert not decision['reentrenar'] and decision['motivo'] == "no hay filas nuevas desde el entrenamiento"
+
+def test_stable_data_keeps_model(model_dir):
+    monitor = DriftMonitor(model_dir)
+    assert monitor.update(dataset(20)) == 20
+    decision = monitor.decision()
+    assert not decision['reentrenar'] and decision['motivo'] == "sin deriva significativa"
+    assert not decision['puntajes']['Deriva'].any()
+
+def test_too_few_drifted_features_keep_model(model_dir):
+    monitor = DriftMonitor(model_dir)
+    monitor.update(dataset(25, shifted=['f1', 'f2']))
+    decision = monitor.decision()
+    scores = decision['puntajes']
+    assert sorted(scores.loc[scores['Deriva'], 'Característica']) == ['f1', 'f2']
+    assert (scores.set_index('Característica').loc[['f1', 'f2'], 'Desplazamiento (σ)'] > 3).all()
+    # Dos características por debajo de MIN_DRIFTED_FEATURES no bastan
+    assert not decision['reentrenar']
+
+def test_drift_in_enough_features_retrains(model_dir):
+    monitor = DriftMonitor(model_dir)
+    monitor.update(dataset(25, shifted=['f1', 'f2', 'f3']))
+    decision = monitor.decision()
+    assert decision['reentrenar'] and decision['motivo'].startswith("deriva en 3 características")
+
+def test_old_model_retrains_without_drift(model_dir):
+    monitor = DriftMonitor(model_dir)
+    monitor.update(dataset(40))
+    decision = monitor.decision()
+    assert decision['reentrenar'] and decision['motivo'] == "el modelo tiene 40 días de datos sin reentrenar"
+    assert not DriftMonitor(model_dir).decision(max_age_days=45)['reentrenar']
+
+def test_state_is_incremental_and_reset_by_new_version(model_dir):
+    DriftMonitor(model_dir).update(dataset(10))
+    monitor = DriftMonitor(model_dir)
+    assert monitor.state['filas_nuevas'] == 10
+    # Solo se procesan las filas posteriores a la última vista
+    assert monitor.update(dataset(15)) == 5
+    assert DriftMonitor(model_dir).state['caracteristicas']['f1']['welford'][0] == 15
+
+    with artifacts.publish(model_dir) as paths:
+        save_reference(reference_profile(dataset(15), FEATURES), paths['reference'])
+    monitor = DriftMonitor(model_dir)
+    assert monitor.state['filas_nuevas'] == 0 and monitor.state['ultima_fecha'] is None
\ No newline at end of file
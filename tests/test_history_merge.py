@@ -0,0 +1,56 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from history_merge import upsert_sorted
+
+def naive_upsert(old_df, new_df, date_col='Date'):
+    """Referencia anterior: concatenar, quedarse con la última fila por fecha y reordenar todo."""
+    merged = pd.concat([old_df, new_df], ignore_index=True)
+    merged = merged.drop_duplicates(subset=date_col, keep='last')
+    return merged.sort_values(date_col, kind='stable').reset_index(drop=True)
+
+def history(dates, rng):
+    return pd.DataFrame({
+        'Date': dates,
+        'Close': rng.normal(10, 1, len(dates)).round(4),
+        'Volume': rng.integers(1000, 5000, len(dates))
+    })
+
+@pytest.mark.parametrize('seed', range(20))
+def test_upsert_matches_concat_dedup(seed):
+    rng = np.random.default_rng(seed)
+    days = pd.bdate_range('2024-01-01', periods=120)
+    # Histórico con huecos y una descarga que se solapa, rellena huecos, revisa filas y agrega días nuevos
+    stored = np.sort(rng.choice(100, size=80, replace=False))
+    old_df = history(days[stored], rng)
+    start = int(rng.integers(0, 100))
+    downloaded = np.sort(rng.choice(np.arange(start, 120), size=min(30, 120 - start), replace=False))
+    new_df = history(days[downloaded], rng)
+    # Parte del solapamiento llega sin cambios (no cuenta como revisión)
+    same = new_df['Date'].isin(old_df['Date']) & (rng.random(len(new_df)) < 0.5)
+    new_df.loc[same, ['Close', 'Volume']] = old_df.set_index('Date').loc[new_df.loc[same, 'Date'], ['Close', 'Volume']].to_numpy()
+
+    merged, summary = upsert_sorted(old_df, new_df)
+    expected = naive_upsert(old_df, new_df)
+    pd.testing.assert_frame_equal(merged, expected, check_dtype=False)
+
+    overlap = new_df[new_df['Date'].isin(old_df['Date'])].set_index('Date')
+    revised = overlap.index[(overlap != old_df.set_index('Date').loc[overlap.index]).any(axis=1)]
+    gaps = new_df.loc[~new_df['Date'].isin(old_df['Date']) & (new_df['Date'] < old_df['Date'].iloc[-1]), 'Date']
+    assert summary['revised'] == len(revised)
+    assert summary['added'] == len(expected) - len(old_df)
+    assert summary['append_only'] == (len(revised) == 0 and len(gaps) == 0)
+    changed = list(revised) + list(gaps)
+    assert summary['changed_from'] == (min(changed) if changed else None)
+
+def test_upsert_keeps_columns_missing_from_download():
+    """Las columnas que la descarga no trae conservan el valor guardado y las nuevas se agregan al final."""
+    days = pd.bdate_range('2024-01-01', periods=4)
+    old_df = pd.DataFrame({'Date': days[:3], 'Close': [1.0, 2.0, 3.0], 'Dividend': [0.0, 0.5, 0.0]})
+    new_df = pd.DataFrame({'Date': days[2:], 'Close': [3.5, 4.0], 'Split': [1.0, 1.0]})
+    merged, summary = upsert_sorted(old_df, new_df)
+    assert list(merged.columns) == ['Date', 'Close', 'Dividend', 'Split']
+    assert merged['Dividend'].tolist()[:3] == [0.0, 0.5, 0.0]
+    assert merged['Close'].tolist() == [1.0, 2.0, 3.5, 4.0]
+    assert summary == {'revised': 1, 'added': 1, 'append_only': False, 'changed_from': days[2]}
\ No newline at end of file
@@ -0,0 +1,35 @@
+import logging
+import time
+
+from logger import BatchingFileHandler
+
+def make_record(message, level=logging.INFO):
+    return logging.LogRecord('LoggerAVAL', level, __file__, 1, message, None, None)
+
+def test_partial_batch_is_flushed_after_the_interval(tmp_path):
+    """Un registro suelto llega a disco sin esperar a que se complete el lote ni a que llegue otro."""
+    path = tmp_path / 'logs' / 'app.log'
+    handler = BatchingFileHandler(str(path), batch_size=100, flush_interval=0.2)
+    handler.setFormatter(logging.Formatter('%(message)s'))
+    try:
+        handler.handle(make_record('primero'))
+        deadline = time.monotonic() + 5
+        while time.monotonic() < deadline and 'primero' not in path.read_text(encoding='utf-8'):
+            time.sleep(0.05)
+        assert path.read_text(encoding='utf-8') == 'primero\n'
+        assert handler._timer is None and handler._pending == 0
+    finally:
+        handler.close()
+
+def test_full_batch_and_errors_flush_immediately(tmp_path):
+    path = tmp_path / 'app.log'
+    handler = BatchingFileHandler(str(path), batch_size=2, flush_interval=60)
+    handler.setFormatter(logging.Formatter('%(message)s'))
+    try:
+        handler.handle(make_record('a'))
+        handler.handle(make_record('b'))
+        assert path.read_text(encoding='utf-8') == 'a\nb\n'
+        handler.handle(make_record('falla', logging.ERROR))
+        assert path.read_text(encoding='utf-8') == 'a\nb\nfalla\n'
+    finally:
+        handler.close()
\ No newline at end of file
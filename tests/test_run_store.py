@@ -0,0 +1,52 @@
+import csv
+from datetime import datetime, timedelta
+
+from csv_logger import LOG_FIELDS
+from run_store import RunStore
+
+def write_log(path, rows):
+    with open(path, 'w', newline='') as file:
+        writer = csv.DictWriter(file, fieldnames=LOG_FIELDS)
+        writer.writeheader()
+        writer.writerows(rows)
+
+def log_row(fecha, agregados=1, estado="Éxito"):
+    return {"Fecha": fecha, "Símbolo": "AVAL", "Registros_descargados": 10, "Registros_agregados": agregados,
+            "Total_en_archivo": 100, "Estado": estado}
+
+def read_log(path):
+    with open(path, newline='') as file:
+        return list(csv.DictReader(file))
+
+def totals(store):
+    rows = store.rows_added()
+    return sum(row[2] for row in rows), sum(row[3] for row in rows)
+
+def test_rotation_imports_before_trimming(tmp_path):
+    """Un CSV nunca importado pierde sus filas antiguas solo después de pasarlas al historial."""
+    csv_path = str(tmp_path / 'log_data.csv')
+    recent = (datetime.now() - timedelta(days=1)).strftime("%Y-%m-%d %H:%M:%S")
+    write_log(csv_path, [log_row("2025-05-09 05:29:16", 2673), log_row("2025-05-10 05:29:16", 3),
+                         log_row("2025-05-10 06:00:00", 0, "Error: timeout"), log_row(recent, 1)])
+    store = RunStore(str(tmp_path / 'runs.db'))
+
+    result = store.trim_csv(csv_path, max_age_days=90)
+    assert result == {'importadas': 4, 'eliminadas': 3}
+    assert [row["Fecha"] for row in read_log(csv_path)] == [recent]
+    assert totals(store) == (4, 2677)
+
+    # Compactar y rotar de nuevo no pierde ni duplica ejecuciones
+    store.compact(90)
+    assert store.trim_csv(csv_path, max_age_days=90) == {'importadas': 0, 'eliminadas': 0}
+    assert totals(store) == (4, 2677)
+
+def test_import_skips_compacted_days(tmp_path):
+    """Las filas de días ya compactados no se vuelven a importar aunque el CSV aún las tenga."""
+    csv_path = str(tmp_path / 'log_data.csv')
+    write_log(csv_path, [log_row("2025-05-09 05:29:16", 5)])
+    store = RunStore(str(tmp_path / 'runs.db'))
+    store.record("AVAL", 10, 5, 100, "Éxito", fecha="2025-05-09 05:29:16")
+    store.compact(90)
+
+    assert store.import_csv(csv_path) == 0
+    assert totals(store) == (1, 5)
\ No newline at end of file
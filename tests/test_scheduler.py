@@ -0,0 +1,173 @@
+import threading
+from datetime import date
+
+import pandas as pd
+import pytest
+
+import logger
+import scheduler
+from scheduler import JobStore, Scheduler, backoff_delay, last_session, retry
+
+STAGES = ['colectar', 'enriquecer', 'entrenar']
+
+@pytest.fixture(autouse=True)
+def isolated(tmp_path, monkeypatch):
+    # Los perfiles de cada trabajo se escriben relativos al directorio de trabajo; los logs se descartan
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv(logger.QUIET_ENV_VAR, '1')
+
+@pytest.fixture
+def now():
+    return pd.Timestamp.now(tz='UTC').floor('min')
+
+def pipelines(now, symbols=('AVAL',)):
+    """Un pipeline por símbolo cuyo cierre fue hace tres horas: ningún cierre nuevo ocurre durante la prueba."""
+    close = (now - pd.Timedelta(hours=3)).strftime('%H:%M')
+    return {
+        symbol: {'tz': 'UTC', 'cierre': close, 'historico': f'{symbol}.csv', 'enriquecido': f'{symbol}_enr.csv',
+                 'modelos': f'models_{symbol}', 'prediccion': f'{symbol}_pred.csv', 'etapas': STAGES}
+        for symbol in symbols
+    }
+
+class StubStages:
+    """Etapas que registran sus llamadas y fallan las veces pedidas."""
+
+    def __init__(self, failures=None, on_call=None):
+        self.calls = []
+        self.failures = dict(failures or {})
+        self.on_call = on_call
+
+    def stage(self, name):
+        def run(symbol, config):
+            self.calls.append((symbol, name))
+            if self.on_call:
+                self.on_call(name)
+            if self.failures.get(name):
+                self.failures[name] -= 1
+                raise RuntimeError(f"{name} no disponible")
+        return run
+
+def make_scheduler(tmp_path, now, stubs, symbols=('AVAL',)):
+    runner = Scheduler(pipelines(now, symbols), store=JobStore(str(tmp_path / 'runs.db')))
+    runner.stages = {name: stubs.stage(name) for name in STAGES}
+    return runner
+
+def run_tick(runner, when):
+    for future in runner.tick(when):
+        future.result()
+
+def job(runner, symbol='AVAL'):
+    return runner.jobs.jobs().set_index('simbolo').loc[symbol]
+
+def test_retry_backs_off_until_success():
+    attempts, waits = [], []
+
+    def flaky():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise ConnectionError("sin red")
+        return 'ok'
+
+    result = retry(flaky, attempts=4, base=0.0, cap=0.0, on_retry=lambda n, delay, e: waits.append(n))
+    assert result == 'ok' and len(attempts) == 3 and waits == [1, 2]
+
+def test_retry_raises_last_error():
+    def broken():
+        raise ConnectionError("sin red")
+    with pytest.raises(ConnectionError):
+        retry(broken, attempts=3, base=0.0, cap=0.0)
+
+def test_retry_stops_when_asked():
+    stop = threading.Event()
+    stop.set()
+    calls = []
+
+    def broken():
+        calls.append(1)
+        raise ConnectionError("sin red")
+    with pytest.raises(ConnectionError):
+        retry(broken, attempts=5, base=60.0, cap=60.0, stop=stop)
+    assert len(calls) == 1
+
+@pytest.mark.parametrize('attempt', [0, 3, 10])
+def test_backoff_delay_is_capped(attempt):
+    delays = [backoff_delay(attempt, 5.0, 60.0) for _ in range(200)]
+    assert all(0 <= delay <= min(60.0, 5.0 * 2 ** attempt) for delay in delays)
+
+def test_last_session_skips_weekend_and_waits_for_close():
+    # Lunes antes del cierre (16:00 + 30 min en Nueva York): la última sesión es el viernes
+    monday = pd.Timestamp('2024-05-13 15:00', tz='America/New_York').tz_convert('UTC')
+    day, trigger = last_session(monday, 'America/New_York', '16:00')
+    assert day == date(2024, 5, 10)
+    assert trigger == pd.Timestamp('2024-05-10 16:30', tz='America/New_York')
+    day, _ = last_session(monday + pd.Timedelta(hours=2), 'America/New_York', '16:00')
+    assert day == date(2024, 5, 13)
+
+def test_job_store_fails_then_gives_up(tmp_path, now):
+    store = JobStore(str(tmp_path / 'runs.db'))
+    store.ensure('AVAL', '2024-05-10', 'colectar', now)
+    assert store.due(now) == [('AVAL', '2024-05-10')]
+    assert store.claim('AVAL', '2024-05-10') and not store.claim('AVAL', '2024-05-10')
+
+    for attempts in range(scheduler.JOB_ATTEMPTS - 1):
+        state, retry_at = store.fail('AVAL', '2024-05-10', RuntimeError("caída"), attempts)
+        assert state == 'pendiente' and retry_at >= now
+    state, _ = store.fail('AVAL', '2024-05-10', RuntimeError("caída"), scheduler.JOB_ATTEMPTS - 1)
+    assert state == 'fallido'
+    assert store.due(now + pd.Timedelta(days=1)) == []
+    assert store.stage('AVAL', '2024-05-10') == ('colectar', scheduler.JOB_ATTEMPTS)
+
+def test_pipelines_must_not_share_files(now):
+    shared = pipelines(now, ('AVAL', 'GRUPO'))
+    shared['GRUPO']['modelos'] = shared['AVAL']['modelos']
+    with pytest.raises(ValueError, match='modelos'):
+        Scheduler(shared, store=object())
+
+def test_tick_runs_stages_in_order(tmp_path, now):
+    stubs = StubStages()
+    runner = make_scheduler(tmp_path, now, stubs, ('AVAL', 'GRUPO'))
+    run_tick(runner, now)
+    for symbol in ('AVAL', 'GRUPO'):
+        assert [stage for name, stage in stubs.calls if name == symbol] == STAGES
+        assert job(runner, symbol)['estado'] == 'ok'
+    # Un trabajo terminado no se repite en el siguiente sondeo
+    run_tick(runner, now)
+    assert len(stubs.calls) == 6
+    # Cada trabajo escribe su propio perfil
+    assert len(list((tmp_path / 'src' / 'static' / 'models' / 'profiles').glob('profile_scheduler_*.json'))) == 2
+    runner.pool.shutdown()
+
+def test_failed_stage_retries_from_that_stage(tmp_path, now):
+    stubs = StubStages(failures={'enriquecer': 1})
+    runner = make_scheduler(tmp_path, now, stubs)
+    run_tick(runner, now)
+    failed = job(runner)
+    assert (failed['etapa'], failed['estado'], failed['intentos']) == ('enriquecer', 'pendiente', 1)
+    assert failed['ultimo_error'] == "enriquecer no disponible"
+
+    # Antes de la hora del reintento no se vuelve a lanzar; después sigue sin repetir la descarga
+    run_tick(runner, now - pd.Timedelta(minutes=1))
+    assert len(stubs.calls) == 2
+    run_tick(runner, pd.Timestamp(failed['proximo_intento'], tz='UTC'))
+    assert [stage for _, stage in stubs.calls] == ['colectar', 'enriquecer', 'enriquecer', 'entrenar']
+    assert (job(runner)['estado'], job(runner)['intentos']) == ('ok', 0)
+    runner.pool.shutdown()
+
+def test_restart_resumes_interrupted_stage(tmp_path, now):
+    # Una parada tras colectar guarda el avance: la siguiente etapa queda pendiente
+    stubs = StubStages()
+    runner = make_scheduler(tmp_path, now, stubs)
+    stubs.on_call = lambda name: runner.stop.set() if name == 'colectar' else None
+    run_tick(runner, now)
+    runner.pool.shutdown()
+    assert (job(runner)['etapa'], job(runner)['estado']) == ('enriquecer', 'pendiente')
+
+    # Un cierre abrupto deja el trabajo en curso; al reiniciar vuelve a pendiente en la misma etapa
+    runner.jobs.claim('AVAL', job(runner)['dia'])
+    restarted = make_scheduler(tmp_path, now, stubs)
+    assert restarted.jobs.resume_interrupted() == 1
+    stubs.on_call = None
+    run_tick(restarted, now)
+    assert [stage for _, stage in stubs.calls] == STAGES
+    assert job(restarted)['estado'] == 'ok'
+    restarted.pool.shutdown()
\ No newline at end of file
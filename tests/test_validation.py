@@ -0,0 +1,93 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from validation import PRICE_COLUMNS, quarantine_rows, validate
+
+def history(days=10, start='2024-01-01'):
+    dates = pd.bdate_range(start, periods=days)
+    close = np.linspace(300.0, 309.0, days)
+    return pd.DataFrame({
+        'Date': dates,
+        'Open AVAL': close, 'High AVAL': close + 2, 'Low AVAL': close - 2,
+        'Close AVAL': close, 'Adj Close AVAL': close,
+        'Volume AVAL': np.full(days, 1000.0)
+    })
+
+def test_clean_history_passes():
+    result = validate(history(), full=True)
+    assert result['revisadas'] == 10
+    assert len(result['validas']) == 10 and len(result['cuarentena']) == 0
+    assert not any(result['conteos'].values()) and not any(result['avisos'].values())
+
+@pytest.mark.parametrize('column, value, rule', [
+    ('Close AVAL', np.nan, 'precio_faltante'),
+    ('Open AVAL', -1.0, 'precio_no_positivo'),
+    ('Volume AVAL', 0.0, 'volumen_cero'),
+    ('High AVAL', 290.0, 'high_menor_que_low')
+])
+def test_rule_quarantines_row(column, value, rule):
+    frame = history()
+    frame.loc[4, column] = value
+    result = validate(frame, full=True)
+    assert result['conteos'][rule] == 1
+    assert list(result['cuarentena']['Date']) == [frame['Date'][4]]
+    assert rule in result['cuarentena']['Reglas'][0].split(';')
+    assert len(result['validas']) == 9
+
+def test_duplicate_date_keeps_last_row():
+    frame = history(5)
+    repeated = frame.iloc[[2]].assign(**{'Close AVAL': 400.0})
+    frame = pd.concat([frame, repeated], ignore_index=True)
+    result = validate(frame, full=True)
+    assert result['conteos']['fecha_duplicada'] == 1
+    # La fila descartada es la primera aparición; la última (la más reciente) queda como válida
+    assert result['cuarentena']['Close AVAL'][0] == frame['Close AVAL'][2]
+    assert result['validas'].loc[result['validas']['Date'] == frame['Date'][2], 'Close AVAL'].item() == 400.0
+
+def test_isolated_jump_is_quarantined_but_level_shift_is_not():
+    spike = history()
+    spike.loc[5, 'Adj Close AVAL'] *= 2
+    result = validate(spike, full=True)
+    assert result['conteos']['salto_de_precio'] == 1
+    assert result['cuarentena']['Date'][0] == spike['Date'][5]
+
+    # Un cambio de nivel que se mantiene no se revierte al día siguiente: no es un dato aislado
+    shift = history()
+    shift.loc[5:, 'Adj Close AVAL'] *= 2
+    assert validate(shift, full=True)['conteos']['salto_de_precio'] == 0
+
+def test_out_of_range_is_only_a_warning():
+    frame = history()
+    frame.loc[3, 'Open AVAL'] = frame.loc[3, 'High AVAL'] + 5
+    result = validate(frame, full=True)
+    assert result['avisos']['open_fuera_de_rango'] == 1
+    assert len(result['cuarentena']) == 0 and len(result['validas']) == 10
+
+def test_incremental_checks_only_new_or_changed_rows():
+    full = history(12)
+    old, new = full.iloc[:10], full.iloc[7:].reset_index(drop=True)
+    new.loc[0, 'Volume AVAL'] = 2000.0
+    result = validate(new, old)
+    # Dos fechas nuevas y una guardada con otro volumen; las otras dos coinciden y no se revisan
+    assert result['revisadas'] == 3
+
+def test_incremental_jump_uses_stored_neighbor():
+    full = history(11)
+    old, new = full.iloc[:10], full.iloc[[10]].reset_index(drop=True)
+    new.loc[0, 'Adj Close AVAL'] = old['Adj Close AVAL'].iloc[-1] * 2
+    # Sin día siguiente todavía, el salto frente al último valor guardado va a cuarentena
+    assert validate(new, old)['conteos']['salto_de_precio'] == 1
+
+def test_quarantine_file_skips_known_rows(tmp_path):
+    path = str(tmp_path / 'quarantine.csv')
+    frame = history()
+    frame.loc[[2, 6], PRICE_COLUMNS[0]] = np.nan
+    rejected = validate(frame, full=True)['cuarentena']
+
+    assert quarantine_rows(rejected, 'AVAL', path) == 2
+    assert quarantine_rows(rejected, 'AVAL', path) == 0
+    stored = pd.read_csv(path, parse_dates=['Date'])
+    assert list(stored['Date']) == list(rejected['Date'])
+    assert set(stored['Reglas']) == {'precio_faltante'}
+    assert quarantine_rows(rejected.iloc[:0], 'AVAL', path) == 0
\ No newline at end of file